@@ -0,0 +1,271 @@
+# Copyright 2020-2021 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE.
+"""
+End-to-end benchmark of the server and the client.
+
+Starts `build/wayland-embed` and the `dodo` client on a software GL stack (Mesa llvmpipe) for each combination
+of a scene, a size and a scale factor, lets the scene run for a while and prints JSON with fps, frame interval
+percentiles, stage timings, CPU time per frame and peak RSS of both processes. An Xvfb server is started
+if there is no X display.
+
+Usage:
+
+    make all
+    python3 benchmarks/e2e.py --duration 10 --sizes 800x600,1920x1080 --scales 1,2 > result.json
+    python3 benchmarks/e2e.py --compare baseline.json result.json
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+SCENES_DIR = ROOT / "benchmarks" / "scenes"
+SCENES = ["static", "css_animation", "scrolling", "canvas", "animation"]
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+SOFTWARE_GL = {
+    "LIBGL_ALWAYS_SOFTWARE": "1",
+    "GALLIUM_DRIVER": "llvmpipe",
+    "QTWEBENGINE_CHROMIUM_FLAGS": "--disable-gpu-vsync",
+}
+
+
+def parse_size(value: str) -> Tuple[int, int]:
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def get_scene(name: str) -> Tuple[str, Optional[str]]:
+    """Return the URL and the QML view of a scene."""
+    qml = SCENES_DIR / f"{name}.qml"
+    if qml.exists():
+        return "", str(qml)
+    return (SCENES_DIR / f"{name}.html").as_uri(), None
+
+
+def get_cpu_time(pids: List[int]) -> float:
+    """Return user and system CPU time of processes in seconds."""
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        # utime, stime, cutime and cstime, fields 14-17 of proc(5)
+        total += sum(int(value) for value in fields[11:15])
+    return total / CLOCK_TICKS
+
+
+def get_peak_rss(pid: int) -> int:
+    """Return peak RSS of a process in bytes."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def get_children(pid: int) -> List[int]:
+    """Return all descendants of a process, e.g. QtWebEngine processes."""
+    result = []
+    children = []
+    try:
+        tasks = os.listdir(f"/proc/{pid}/task")
+    except OSError:
+        return result
+    for task in tasks:
+        try:
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                children.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    for child in children:
+        result.append(child)
+        result.extend(get_children(child))
+    return result
+
+
+def read_stats(path: str) -> Optional[dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def wait_for_frames(path: str, timeout: float) -> Optional[dict]:
+    """Wait until the client has committed a frame."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        stats = read_stats(path)
+        if stats and any(view["frames"] for view in stats["views"]):
+            return stats
+        time.sleep(0.1)
+    return None
+
+
+def stop(process: subprocess.Popen) -> None:
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def run_case(args, scene: str, size: Tuple[int, int], scale: int, env: Dict[str, str]) -> dict:
+    url, qml = get_scene(scene)
+    name = f"bench-{os.getpid()}"
+    runtime_dir = env["XDG_RUNTIME_DIR"]
+    os.makedirs(os.path.join(runtime_dir, "dodo"), exist_ok=True)
+    interval = 250
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stats_file = os.path.join(tmp, "stats.json")
+        server_env = dict(env, DODO_DISPLAY=f"dodo/{name}", DODO_URL=url, DODO_SIZE="%dx%d" % size)
+        server_env["GDK_SCALE"] = str(scale)
+        client_env = dict(
+            env, PYTHONPATH=os.pathsep.join([str(ROOT / "build"), str(ROOT)]), DODO_STATS_FILE=stats_file,
+            DODO_STATS_INTERVAL=str(interval),
+        )
+        if qml:
+            client_env["DODO_QML_VIEW"] = qml
+
+        output = None if args.verbose else subprocess.DEVNULL
+        server = subprocess.Popen([args.server], env=server_env, stdout=output, stderr=output)
+        time.sleep(0.5)
+        client = subprocess.Popen(
+            [sys.executable, "-m", "dodo", name], env=client_env, cwd=ROOT, stdout=output, stderr=output
+        )
+        try:
+            if wait_for_frames(stats_file, args.timeout) is None:
+                return {"error": "no frame committed"}
+
+            time.sleep(args.warmup)
+            client_pids = [client.pid] + get_children(client.pid)
+            start_stats = read_stats(stats_file)
+            start_cpu = get_cpu_time(client_pids), get_cpu_time([server.pid])
+            start_time = time.monotonic()
+            time.sleep(args.duration)
+            # Stats are written every interval, make sure we get fresh ones.
+            time.sleep(interval / 1000)
+            end_stats = read_stats(stats_file)
+            elapsed = time.monotonic() - start_time
+            client_pids = [client.pid] + get_children(client.pid)
+            end_cpu = get_cpu_time(client_pids), get_cpu_time([server.pid])
+            peak_rss = sum(get_peak_rss(pid) for pid in client_pids), get_peak_rss(server.pid)
+        finally:
+            stop(client)
+            stop(server)
+
+    view = end_stats["views"][0]
+    frames = view["frames"] - start_stats["views"][0]["frames"]
+    cpu = end_cpu[0] - start_cpu[0], end_cpu[1] - start_cpu[1]
+    return {
+        "fps": frames / elapsed,
+        "frames": frames,
+        "frame_interval": view["frame_interval"],
+        "stages": view["stages"],
+        # Static scenes may not commit any frames, CPU usage tells how much an idle view costs.
+        "cpu_percent": {"client": cpu[0] * 100 / elapsed, "server": cpu[1] * 100 / elapsed},
+        "cpu_ms_per_frame": {
+            "client": cpu[0] * 1000 / frames if frames else None,
+            "server": cpu[1] * 1000 / frames if frames else None,
+        },
+        "peak_rss": {"client": peak_rss[0], "server": peak_rss[1]},
+    }
+
+
+def run(args) -> dict:
+    env = dict(os.environ, **SOFTWARE_GL)
+    env.setdefault("XDG_RUNTIME_DIR", tempfile.mkdtemp(prefix="dodo-bench-"))
+    xvfb = None
+    if args.xvfb or not env.get("DISPLAY"):
+        if not shutil.which("Xvfb"):
+            raise SystemExit("There is no X display and Xvfb is not installed.")
+        display = ":%d" % (100 + os.getpid() % 100)
+        xvfb = subprocess.Popen(["Xvfb", display, "-screen", "0", "3840x2160x24"], stderr=subprocess.DEVNULL)
+        env["DISPLAY"] = display
+        env["GDK_BACKEND"] = "x11"
+        time.sleep(1)
+
+    results = []
+    try:
+        for scene in args.scenes:
+            for size in args.sizes:
+                for scale in args.scales:
+                    print(f"Running {scene} {size[0]}x{size[1]}@{scale}...", file=sys.stderr)
+                    result = run_case(args, scene, size, scale, env)
+                    results.append({"scene": scene, "size": list(size), "scale": scale, **result})
+    finally:
+        if xvfb is not None:
+            stop(xvfb)
+
+    commit = subprocess.run(
+        ["git", "rev-parse", "HEAD"], cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    ).stdout.strip()
+    return {"commit": commit, "duration": args.duration, "results": results}
+
+
+def compare(baseline_path: str, result_path: str) -> dict:
+    """Compare fps and CPU time per frame of two results."""
+    with open(baseline_path) as f:
+        baseline = {(r["scene"], tuple(r["size"]), r["scale"]): r for r in json.load(f)["results"]}
+    with open(result_path) as f:
+        results = json.load(f)["results"]
+
+    changes = []
+    for result in results:
+        old = baseline.get((result["scene"], tuple(result["size"]), result["scale"]))
+        if old is None or "error" in old or "error" in result:
+            continue
+        change = {"scene": result["scene"], "size": result["size"], "scale": result["scale"]}
+        change["fps"] = [old["fps"], result["fps"]]
+        change["p95_frame_interval"] = [old["frame_interval"]["p95"], result["frame_interval"]["p95"]]
+        for side in ("client", "server"):
+            change[f"cpu_ms_per_frame_{side}"] = [
+                old["cpu_ms_per_frame"][side], result["cpu_ms_per_frame"][side]
+            ]
+        changes.append(change)
+    return {"changes": changes}
+
+
+def main(argv) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenes", type=lambda s: s.split(","), default=SCENES, help="comma-separated scenes")
+    parser.add_argument(
+        "--sizes", type=lambda s: [parse_size(size) for size in s.split(",")], default=[(800, 600), (1920, 1080)],
+        help="comma-separated sizes, e.g. 800x600,1920x1080",
+    )
+    parser.add_argument(
+        "--scales", type=lambda s: [int(scale) for scale in s.split(",")], default=[1, 2],
+        help="comma-separated scale factors",
+    )
+    parser.add_argument("--duration", type=float, default=10, help="measured seconds per case")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds to wait after the first frame")
+    parser.add_argument("--timeout", type=float, default=30, help="seconds to wait for the first frame")
+    parser.add_argument("--server", default=str(ROOT / "build" / "wayland-embed"), help="path to the server")
+    parser.add_argument("--xvfb", action="store_true", help="start Xvfb even if there is an X display")
+    parser.add_argument("--verbose", action="store_true", help="show output of the server and the client")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "RESULT"), help="compare two results")
+    args = parser.parse_args(argv[1:])
+
+    result = compare(*args.compare) if args.compare else run(args)
+    json.dump(result, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
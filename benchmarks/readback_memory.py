@@ -0,0 +1,143 @@
+# Copyright 2020-2021 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE.
+"""
+Memory benchmark of the readback path.
+
+Renders a long animation to an offscreen framebuffer and reads every frame back to a shared memory mapping,
+like `View` does with a `wl_shm` buffer. Python allocations, allocated blocks and RSS are sampled periodically
+and printed as JSON. With zero-copy readback, all of them should stay flat.
+
+Usage:
+
+    QT_QPA_PLATFORM=offscreen PYTHONPATH=. python3 benchmarks/readback_memory.py --frames 3000 --depth 0
+    QT_QPA_PLATFORM=offscreen PYTHONPATH=. python3 benchmarks/readback_memory.py --legacy
+"""
+import argparse
+import ctypes
+import json
+import math
+import mmap
+import os
+import sys
+import time
+import tracemalloc
+
+from PySide2.QtCore import QSize
+from PySide2.QtGui import QGuiApplication, QOpenGLContext, QOffscreenSurface
+
+from dodo.formats import ARGB8888
+from dodo.framebuffers import TextureFramebuffer
+from dodo.gl import GL, RenderContext, get_default_format
+from dodo.readback import create_readback
+
+
+def get_rss() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def parse_size(value: str) -> QSize:
+    width, height = value.lower().split("x")
+    return QSize(int(width), int(height))
+
+
+def run(args) -> dict:
+    context = QOpenGLContext()
+    context.setFormat(get_default_format(gles=False))
+    assert context.create()
+    surface = QOffscreenSurface()
+    surface.setFormat(context.format())
+    surface.create()
+    ctx = RenderContext(context, surface)
+    assert ctx.makeCurrent()
+
+    size = args.size
+    nbytes = ARGB8888.stride(size.width()) * size.height()
+    shm_data = mmap.mmap(-1, nbytes, flags=mmap.MAP_SHARED, prot=mmap.PROT_READ | mmap.PROT_WRITE)
+    shm_address = ctypes.addressof(ctypes.c_char.from_buffer(shm_data))
+    framebuffer = TextureFramebuffer(ctx, size)
+    delivered = 0
+
+    def on_frame_read(address: int, width: int, height: int) -> None:
+        nonlocal delivered
+        if address != shm_address:
+            ctypes.memmove(shm_address, address, ARGB8888.stride(width) * height)
+        delivered += 1
+
+    readback = create_readback(lambda _nbytes: shm_address, on_frame_read, args.depth)
+    mode = "legacy readback" if args.legacy else str(readback)
+
+    samples = []
+    tracemalloc.start()
+    start_rss = get_rss()
+    start_time = time.perf_counter()
+    for frame in range(1, args.frames + 1):
+        framebuffer.bind()
+        GL.glViewport(0, 0, size.width(), size.height())
+        phase = frame / 60
+        GL.glClearColor(0.5 + 0.5 * math.sin(phase), 0.5 + 0.5 * math.cos(phase), 0.5, 1.0)
+        GL.glClear(GL.GL_COLOR_BUFFER_BIT)
+        GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, 0)
+        GL.glFlush()
+
+        if args.legacy:
+            GL.glBindTexture(GL.GL_TEXTURE_2D, framebuffer.texture)
+            data = GL.glGetTexImage(GL.GL_TEXTURE_2D, 0, GL.GL_BGRA, GL.GL_UNSIGNED_BYTE)
+            shm_data.seek(0)
+            shm_data.write(data)
+            delivered += 1
+        else:
+            readback.start(framebuffer)
+            readback.collect()
+
+        if frame % args.interval == 0:
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            samples.append({
+                "frame": frame,
+                "traced_current": current,
+                "traced_peak": peak,
+                "allocated_blocks": sys.getallocatedblocks(),
+                "rss": get_rss(),
+            })
+
+    while readback.pending:
+        readback.collect(block=True)
+    elapsed = time.perf_counter() - start_time
+    tracemalloc.stop()
+    readback.release()
+    framebuffer.destroy()
+
+    return {
+        "mode": mode,
+        "size": [size.width(), size.height()],
+        "frames": args.frames,
+        "delivered": delivered,
+        "fps": args.frames / elapsed,
+        "latency_ms": readback.latency_ms,
+        "rss_start": start_rss,
+        "rss_growth": samples[-1]["rss"] - samples[0]["rss"] if samples else 0,
+        "max_traced_peak": max((s["traced_peak"] for s in samples), default=0),
+        "samples": samples,
+    }
+
+
+def main(argv) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--frames", type=int, default=3000, help="number of frames to render")
+    parser.add_argument("--interval", type=int, default=100, help="frames between memory samples")
+    parser.add_argument("--size", type=parse_size, default=QSize(1920, 1080), help="frame size, e.g. 1920x1080")
+    parser.add_argument("--depth", type=int, default=0, help="number of pixel pack buffers, 0 = synchronous")
+    parser.add_argument("--legacy", action="store_true", help="allocate a bytes object and copy it per frame")
+    args = parser.parse_args(argv[1:])
+
+    app = QGuiApplication(argv)
+    result = run(args)
+    json.dump(result, sys.stdout, indent=2)
+    print()
+    del app
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,35 @@
+import QtQuick 2.12
+import eu.tiliado.NuvolaPlayer 1.0
+
+// A plain QML scene without Chromium, to measure the pipeline overhead.
+Rectangle {
+    focus: true
+    color: "#223"
+    property string url: ""
+    property Component component: null
+    property Canvas canvas: null
+
+    Grid {
+        anchors.centerIn: parent
+        columns: 4
+        spacing: 24
+
+        Repeater {
+            model: 12
+
+            Rectangle {
+                width: 80
+                height: 80
+                radius: 12
+                color: Qt.hsla(index / 12, 0.7, 0.55, 1)
+
+                RotationAnimation on rotation {
+                    from: 0
+                    to: 360
+                    duration: 2000
+                    loops: Animation.Infinite
+                }
+            }
+        }
+    }
+}
@@ -1,5 +1,6 @@
 # Copyright 2020-2021 Jiří Janoušek <janousek.jiri@gmail.com>
 # Licensed under BSD-2-Clause license - see file LICENSE.
+import argparse
 import signal
 import sys
 from typing import List
@@ -7,14 +8,15 @@ from typing import List
 import gc
 from PySide2.QtGui import QGuiApplication
 
+from dodo.supervisor import Supervisor
 from dodo.webengine import WebEngine
 
 
-def run(argv: List[str]):
+def run(argv: List[str], name: str):
     signal.signal(signal.SIGINT, signal.SIG_DFL)
     WebEngine.initialize()
     app = QGuiApplication(argv)
-    webengine = WebEngine("dodo/" + argv[1], app)
+    webengine = WebEngine("dodo/" + name, app)
     code = app.exec_()
     # Try to make QtWebEngine to shutdown properly without SIGSEGV
     del webengine
@@ -24,4 +26,17 @@ def run(argv: List[str]):
     return code
 
 
-sys.exit(run(sys.argv))
+def main(argv: List[str]):
+    parser = argparse.ArgumentParser(prog="python -m dodo")
+    parser.add_argument("name", help="the name of the display, e.g. `default` for `dodo/default`")
+    parser.add_argument(
+        "--workers", type=int, default=1, help="the number of client processes to spread views across",
+    )
+    # Other arguments are passed to Qt.
+    args, qt_args = parser.parse_known_args(argv[1:])
+    if args.workers > 1:
+        return Supervisor(args.name, args.workers, qt_args).run()
+    return run(argv[:1] + qt_args, args.name)
+
+
+sys.exit(main(sys.argv))
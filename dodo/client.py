@@ -1,33 +1,43 @@
 from __future__ import annotations
 
-from typing import Union
+import json
+import os
+import time
+from typing import Optional, Union
 
-from PySide2.QtCore import QUrl, Slot, QSocketNotifier, QObject, Signal
+from PySide2.QtCore import QUrl, Slot, QSocketNotifier, QObject, Signal, QTimer
 from PySide2.QtGui import QOpenGLContext, QOffscreenSurface
 from pywayland.client import Display
 
+from dodo.config import Config
+from dodo.connection import Connection
+from dodo.formats import FORMATS
+from dodo.framebuffers import FramebufferPool
 from dodo.qml import Engine, Component
+from dodo.renderers import RenderManager
+from dodo.resources import ResourceManager
 from dodo.view import View
-from wl_protocols.wayland import WlShm, WlCompositor
+from wl_protocols.wayland import WlShm, WlCompositor, WlSubcompositor
 from wl_protocols.dodo import DodoProtoEmbedder
 
-SHM_FORMAT = {
-    WlShm.format.argb8888.value: "ARGB8888",
-    WlShm.format.xrgb8888.value: "XRGB8888",
-    WlShm.format.rgb565.value: "RGB565",
-}
+SHM_FORMAT = {fmt.shm_format: fmt.name for fmt in FORMATS.values()}
 
 
 class Client(QObject):
     disconnected = Signal()
 
-    def __init__(self, display: Union[str, int], qml_view: QUrl, gl_context: QOpenGLContext):
+    def __init__(self, display: Union[str, int], qml_view: QUrl, gl_context: QOpenGLContext, config: Config):
         super().__init__()
+        self.config = config
         self.qml_view = qml_view
         self.display = display
         self.wl_display = Display(display)
+        self.connection = None
         self.wl_compositor = None
+        self.wl_subcompositor = None
         self.wl_shm = None
+        # argb8888 and xrgb8888 are always supported.
+        self.shm_formats = {FORMATS["argb8888"].shm_format, FORMATS["xrgb8888"].shm_format}
         self.wl_embedder = None
         self.views = {}
         self.fd_notifier = None
@@ -36,6 +46,24 @@ class Client(QObject):
         self.qml_view = qml_view
         self.connected = False
         self.gl_context = gl_context
+        self.stats_timer = None
+        # Startup milestones in milliseconds since the client was created.
+        self.started_at = time.perf_counter()
+        self.startup = {}
+        # View requests received before QML has been loaded: (serial, width, height, scale, url, time)
+        self.pending_requests = []
+        # A root item created ahead of time in the prewarm mode.
+        self.spare_item = None
+        self.prewarming = False
+        # Views rendering in their own threads have their own contexts.
+        self.render_manager = None if config.render_thread else RenderManager(config.render_budget)
+        if self.render_manager is not None:
+            # QML objects are incubated in the time left until the next frame.
+            self.render_manager.passFinished.connect(self.engine.incubation.frameRendered)
+        # Framebuffers are reused across resizes and, with the shared context, across views.
+        self.framebuffer_pool = FramebufferPool(config.framebuffer_budget * 1024 * 1024)
+        # Keeps memory of views within the budget.
+        self.resources = ResourceManager(config.memory_budget * 1024 * 1024)
 
         assert gl_context.isOpenGLES()
         surface = QOffscreenSurface()
@@ -50,13 +78,17 @@ class Client(QObject):
 
     def start(self) -> None:
         assert not self.connected
+        # In the prewarm mode, QML is compiled while connecting.
+        self.component = Component(self.engine, self.qml_view)
+        self.component.relatedCreated.connect(self.on_related_created)
+        self.component.ready.connect(self.on_component_ready)
+        self.component.load(asynchronous=self.config.prewarm)
+
         print("Connecting to", self.display)
         self.wl_display.connect()
         self.connected = True
-
-        self.component = Component(self.engine, self.qml_view)
-        self.component.load()
-        self.component.relatedCreated.connect(self.on_related_created)
+        self.connection = Connection(self.wl_display)
+        self.mark_startup("connected")
 
         registry = self.wl_display.get_registry()
         registry.dispatcher["global"] = self.on_global_object_added
@@ -68,6 +100,12 @@ class Client(QObject):
         self.fd_notifier = QSocketNotifier(self.wl_display.get_fd(), QSocketNotifier.Read)
         self.fd_notifier.activated.connect(self.on_can_read_wl_data)
 
+        if self.config.stats_file and self.config.stats_interval:
+            self.stats_timer = QTimer()
+            self.stats_timer.setInterval(self.config.stats_interval)
+            self.stats_timer.timeout.connect(self.on_stats_timer)
+            self.stats_timer.start()
+
         self.wl_display.dispatch()
 
     def stop(self) -> None:
@@ -75,7 +113,17 @@ class Client(QObject):
         self.connected = False
 
         self.component.relatedCreated.disconnect(self.on_related_created)
+        self.component.ready.disconnect(self.on_component_ready)
         self.fd_notifier.activated.disconnect(self.on_can_read_wl_data)
+        if self.stats_timer is not None:
+            self.stats_timer.stop()
+            self.stats_timer = None
+
+        self.resources.stop()
+        for view in self.views.values():
+            view.release()
+        self.views.clear()
+        self.connection.stop()
 
         registry = self.wl_display.get_registry()
         registry.dispatcher["global"] = None
@@ -88,24 +136,27 @@ class Client(QObject):
             self.wl_embedder.dispatcher["view_requested"] = None
 
         self.wl_compositor = None
+        self.wl_subcompositor = None
         self.wl_shm = None
         self.wl_embedder = None
 
         self.wl_display.disconnect()
+        self.connection = None
         self.disconnected.emit()
 
-        # TODO: clear views
-
         self.fd_notifier = None
+        self.spare_item = None
+        self.pending_requests.clear()
         self.component = None
         self.engine = None
 
     @Slot()
     def on_can_read_wl_data(self, *args):
         try:
-            self.wl_display.read()
-            self.wl_display.dispatch()
-            self.wl_display.flush()
+            self.connection.read_events()
+            # Input events are coalesced within a dispatch.
+            for view in self.views.values():
+                view.deliver_events()
         except RuntimeError:
             self.stop()
 
@@ -115,6 +166,8 @@ class Client(QObject):
         if interface == "wl_compositor":
             print("got compositor")
             self.wl_compositor = registry.bind(object_id, WlCompositor, version)
+        elif interface == "wl_subcompositor":
+            self.wl_subcompositor = registry.bind(object_id, WlSubcompositor, version)
         elif interface == "wl_shm":
             print("got shm")
             self.wl_shm = registry.bind(object_id, WlShm, version)
@@ -130,25 +183,121 @@ class Client(QObject):
 
     def on_shm_format(self, shm, shm_format):
         print("Possible shmem format: {}".format(SHM_FORMAT.get(shm_format, shm_format)))
+        self.shm_formats.add(shm_format)
 
     def on_ping(self, embeder, serial):
         embeder.pong(serial)
-        self.wl_display.flush()
+        self.connection.schedule_flush()
 
-    def create_view(self, serial: int, width: int, height: int, scale: int, rootItem):
+    def mark_startup(self, milestone: str) -> None:
+        """Record a startup milestone."""
+        self.startup[milestone] = ms = (time.perf_counter() - self.started_at) * 1000
+        print(f"Startup: {milestone} after {ms:.1f} ms.")
+
+    @Slot()
+    def on_component_ready(self):
+        self.mark_startup("qml_loaded")
+        if self.config.prewarm:
+            QTimer.singleShot(0, self.prewarm)
+        requests, self.pending_requests = self.pending_requests, []
+        for serial, width, height, scale, url, requested_at in requests:
+            self.serve_view_request(serial, width, height, scale, url, requested_at)
+
+    @Slot()
+    def prewarm(self):
+        """Create a spare root item for the next view request."""
+        if self.spare_item is None and not self.prewarming and self.connected:
+            self.prewarming = True
+            self.component.incubate(self.on_spare_item_created)
+
+    def on_spare_item_created(self, item):
+        self.prewarming = False
+        if not self.connected:
+            return
+        self.spare_item = item
+        if item is not None and "prewarmed" not in self.startup:
+            self.mark_startup("prewarmed")
+
+    def create_view(
+        self, serial: int, width: int, height: int, scale: int, rootItem, requested_at: Optional[float] = None,
+    ):
         surface = self.wl_compositor.create_surface()
         wl_view = self.wl_embedder.create_view(serial, surface, width, height, scale)
-        self.views[wl_view] = View(
-            self.wl_display, self.gl_context, self.wl_shm, rootItem, wl_view, surface, width, height, scale
+        self.views[wl_view] = view = View(
+            self.connection, self.gl_context, self.wl_shm, rootItem, wl_view, surface, width, height, scale,
+            self.config, self.render_manager, self.framebuffer_pool, self.shm_formats, requested_at,
+            self.create_subsurface,
         )
-        self.wl_display.flush()
+        self.resources.add(view)
+        self.connection.schedule_flush(2)
+
+    def create_subsurface(self, parent):
+        """
+        Create a surface with the subsurface role, e.g. for a `Layer` item of a view.
+
+        Returns:
+            The surface and the subsurface, or None if the compositor doesn't support subsurfaces.
+        """
+        if self.wl_subcompositor is None:
+            return None
+        surface = self.wl_compositor.create_surface()
+        subsurface = self.wl_subcompositor.get_subsurface(surface, parent)
+        self.connection.schedule_flush(2)
+        return surface, subsurface
 
     def on_view_requested(self, embedder, serial, width, height, scale, url):
         print("Request new view", serial, width, height, scale)
-        item = self.component.create()
-        if url:
-            item.setProperty("url", url)
-        self.create_view(serial, width, height, scale, item)
+        requested_at = time.perf_counter()
+        if not self.component.isLoaded:
+            self.pending_requests.append((serial, width, height, scale, url, requested_at))
+        else:
+            self.serve_view_request(serial, width, height, scale, url, requested_at)
+
+    def serve_view_request(self, serial, width, height, scale, url, requested_at: float) -> None:
+        def created(item):
+            if item is None or not self.connected:
+                return
+            if url:
+                item.setProperty("url", url)
+            self.create_view(serial, width, height, scale, item, requested_at)
+
+        item, self.spare_item = self.spare_item, None
+        if item is None:
+            # Created in slices between frames of other views.
+            self.component.incubate(created)
+        else:
+            created(item)
+            # Replace the spare item once the new view is set up.
+            QTimer.singleShot(0, self.prewarm)
+
+    def write_stats(self, path: str) -> None:
+        """
+        Write statistics of all views to a JSON file.
+
+        The file is replaced atomically, so that readers never see a partial file.
+
+        Args:
+            path: The path of the file.
+        """
+        self.resources.account()
+        stats = {
+            "time": time.monotonic(),
+            "memory": self.resources.get_stats(),
+            "views": [view.get_stats() for view in self.views.values()],
+            "wire": self.connection.rates,
+            "startup": self.startup,
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(stats, f)
+        os.replace(tmp_path, path)
+
+    @Slot()
+    def on_stats_timer(self):
+        try:
+            self.write_stats(self.config.stats_file)
+        except OSError as e:
+            print(f"Failed to write stats to {self.config.stats_file}: {e}")
 
     @Slot()
     def on_related_created(self, view, item):
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import os
+
+
+def _get_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        print(f"Invalid value of {name}: {value!r}, using {default}.")
+        return default
+
+
+class Config:
+    """
+    Client configuration.
+
+    Attributes:
+        readback_depth: The number of pixel pack buffers used for asynchronous readback.
+            Zero means synchronous readback with `glReadPixels`.
+        swapchain_length: The maximal number of shm buffers per view.
+        damage_tile_size: The size of tiles for damage detection in pixels, zero to damage whole frames.
+        frame_callbacks: Whether to render only when the compositor asks for a frame with a frame callback.
+        render_thread: Whether each view renders and reads back frames in a dedicated render thread.
+        render_budget: The time budget in milliseconds of a render pass shared by all views, unless each view
+            renders in its own render thread.
+        resize_settle: How long the size of a view must not change before it is resized, in milliseconds.
+            The server stretches the last frame meanwhile. Zero resizes on every size change.
+        resize_interval: The minimal interval between resizes while the size keeps changing, in milliseconds.
+            Zero resizes only once the size settles.
+        shm_format: The pixel format of shm buffers: `auto` uses `xrgb8888` for opaque views and `argb8888`
+            otherwise, `rgb565` halves memory traffic at the cost of color depth if the compositor supports it.
+        frame_budget: The budget of client stages per frame in milliseconds for dynamic resolution, which renders
+            at a lower scale under load and lets the server upscale frames. Zero disables dynamic resolution.
+        framebuffer_budget: The maximal size of pooled framebuffers of all views in MiB.
+        release_hidden: Whether to release framebuffers and shm buffers of hidden views.
+        memory_budget: The memory of all views in MiB above which hidden views are frozen and then discarded, least
+            recently visible first. Zero disables the budget.
+        prewarm: Whether to load QML in the background while connecting and keep a spare root item ready, so that
+            a new view doesn't wait for QML to be compiled and instantiated.
+        scroll_hints: Whether to detect scrolled content and let the compositor move pixels it already has instead of
+            uploading them again. Requires damage tracking.
+        stats_interval: How often frame statistics are exchanged with the server in milliseconds, zero to never.
+        stats_file: A JSON file to which statistics of all views are written every `stats_interval`. A worker of
+            the supervisor inserts its index before the extension, e.g. `stats.1.json`.
+        worker: The index of the worker process set by the supervisor, empty for a single client.
+        qml_view: A QML file to use instead of the default web view, e.g. a benchmark scene.
+    """
+
+    readback_depth: int = 0
+    swapchain_length: int = 2
+    damage_tile_size: int = 64
+    frame_callbacks: bool = True
+    render_thread: bool = False
+    render_budget: int = 12
+    resize_settle: int = 100
+    resize_interval: int = 250
+    shm_format: str = "auto"
+    frame_budget: int = 0
+    framebuffer_budget: int = 256
+    release_hidden: bool = False
+    memory_budget: int = 0
+    prewarm: bool = False
+    scroll_hints: bool = True
+    stats_interval: int = 0
+    stats_file: str = ""
+    worker: str = ""
+    qml_view: str = ""
+
+    @classmethod
+    def from_environ(cls) -> Config:
+        """Create configuration from `DODO_*` environment variables."""
+        config = cls()
+        config.readback_depth = max(0, _get_int("DODO_READBACK_DEPTH", cls.readback_depth))
+        config.swapchain_length = max(1, _get_int("DODO_SWAPCHAIN_LENGTH", cls.swapchain_length))
+        config.damage_tile_size = max(0, _get_int("DODO_DAMAGE_TILE_SIZE", cls.damage_tile_size))
+        config.frame_callbacks = _get_int("DODO_FRAME_CALLBACKS", cls.frame_callbacks) != 0
+        config.render_thread = _get_int("DODO_RENDER_THREAD", cls.render_thread) != 0
+        config.render_budget = max(0, _get_int("DODO_RENDER_BUDGET", cls.render_budget))
+        config.resize_settle = max(0, _get_int("DODO_RESIZE_SETTLE", cls.resize_settle))
+        config.resize_interval = max(0, _get_int("DODO_RESIZE_INTERVAL", cls.resize_interval))
+        config.shm_format = os.environ.get("DODO_SHM_FORMAT", cls.shm_format).lower()
+        config.frame_budget = max(0, _get_int("DODO_FRAME_BUDGET", cls.frame_budget))
+        config.framebuffer_budget = max(0, _get_int("DODO_FRAMEBUFFER_BUDGET", cls.framebuffer_budget))
+        config.release_hidden = _get_int("DODO_RELEASE_HIDDEN", cls.release_hidden) != 0
+        config.memory_budget = max(0, _get_int("DODO_MEMORY_BUDGET", cls.memory_budget))
+        config.prewarm = _get_int("DODO_PREWARM", cls.prewarm) != 0
+        config.scroll_hints = _get_int("DODO_SCROLL_HINTS", cls.scroll_hints) != 0
+        config.stats_interval = max(0, _get_int("DODO_STATS_INTERVAL", cls.stats_interval))
+        config.worker = os.environ.get("DODO_WORKER", cls.worker)
+        config.stats_file = os.environ.get("DODO_STATS_FILE", cls.stats_file)
+        if config.stats_file and config.worker:
+            root, ext = os.path.splitext(config.stats_file)
+            config.stats_file = f"{root}.{config.worker}{ext}"
+        config.qml_view = os.environ.get("DODO_QML_VIEW", cls.qml_view)
+        return config
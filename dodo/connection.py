@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+from typing import Optional
+
+from PySide2.QtCore import QObject, QSocketNotifier, QTimer, Slot
+from pywayland.client import Display
+
+
+class Connection(QObject):
+    """
+    Batches the traffic of a Wayland connection.
+
+    Requests are queued by libwayland and flushed once per iteration of the Qt event loop instead of with a syscall
+    per message. Incoming events are read and dispatched in one batch as well.
+
+    Args:
+        wl_display: The connected Wayland display.
+
+    Attributes:
+        requests: The number of requests queued in the current second, as reported to `schedule_flush`.
+        events: The number of events dispatched in the current second.
+        flushes: The number of flushes in the current second.
+        rates: The numbers of requests, events and flushes in the last second.
+    """
+    RATE_INTERVAL = 1000
+
+    def __init__(self, wl_display: Display):
+        super().__init__()
+        self.wl_display = wl_display
+        self.requests = 0
+        self.events = 0
+        self.flushes = 0
+        self.rates = {"requests": 0, "events": 0, "flushes": 0}
+        # A zero timer fires once the events of the current iteration have been processed.
+        self.flush_timer = QTimer()
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(0)
+        self.flush_timer.timeout.connect(self.flush)
+        self.rate_timer = QTimer()
+        self.rate_timer.setInterval(self.RATE_INTERVAL)
+        self.rate_timer.timeout.connect(self.on_rate_timer)
+        self.rate_timer.start()
+        # Watches the socket when it was full during the last flush.
+        self.write_notifier: Optional[QSocketNotifier] = None
+
+    def stop(self) -> None:
+        """Stop flushing, e.g. before the display is disconnected."""
+        self.flush_timer.stop()
+        self.rate_timer.stop()
+        if self.write_notifier is not None:
+            self.write_notifier.setEnabled(False)
+            self.write_notifier = None
+
+    def read_events(self) -> int:
+        """
+        Read events from the socket and dispatch them.
+
+        Returns:
+            The number of dispatched events.
+        """
+        # pywayland's read() does prepare_read, dispatching events queued earlier, and read_events.
+        self.wl_display.read()
+        count = self.wl_display.dispatch()  # dispatch_pending
+        self.events += count
+        return count
+
+    def schedule_flush(self, requests: int = 1) -> None:
+        """
+        Flush queued requests at the end of the current iteration of the event loop.
+
+        Args:
+            requests: The number of requests queued by the caller, for statistics.
+        """
+        self.requests += requests
+        if not self.flush_timer.isActive() and self.write_notifier is None:
+            self.flush_timer.start()
+
+    @Slot()
+    def flush(self) -> None:
+        """Flush queued requests now."""
+        self.flush_timer.stop()
+        self.flushes += 1
+        if self.wl_display.flush() < 0:
+            # The socket is full (EAGAIN), try again once it is writable.
+            if self.write_notifier is None:
+                self.write_notifier = QSocketNotifier(self.wl_display.get_fd(), QSocketNotifier.Write)
+                self.write_notifier.activated.connect(self.on_can_write)
+        elif self.write_notifier is not None:
+            self.write_notifier.setEnabled(False)
+            self.write_notifier = None
+
+    @Slot()
+    def on_can_write(self, *args):
+        self.flush()
+
+    @Slot()
+    def on_rate_timer(self):
+        self.rates = {"requests": self.requests, "events": self.events, "flushes": self.flushes}
+        self.requests = self.events = self.flushes = 0
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import ctypes
+import zlib
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+BYTES_PER_PIXEL = 4
+
+
+class Rect(NamedTuple):
+    """A rectangle in buffer coordinates."""
+    x: int
+    y: int
+    width: int
+    height: int
+
+
+class Scroll(NamedTuple):
+    """The content of `rect` is the content of the previous frame moved by `dy` rows, in buffer coordinates."""
+    rect: Rect
+    dy: int
+
+
+class DamageTracker:
+    """
+    Detection of changed regions between consecutive frames.
+
+    Each row of a frame is hashed first. Rows that differ from the previous frame are grouped into bands
+    of `tile_size` rows, and each band is split into tiles of `tile_size` columns to find the changed columns.
+    When more than `refine_limit` of all rows change, bands are not split and whole rows are damaged,
+    because hashing tiles would cost more than it saves.
+
+    When scrolling is expected, changed rows are also looked up among rows of the previous frame. If most of them
+    moved by the same number of rows, the longest band of moved rows is reported in `scroll` and left out of damage,
+    so that the compositor can move pixels it already has instead of uploading them again.
+
+    Args:
+        tile_size: The width and the height of a tile in pixels.
+        refine_limit: The fraction of changed rows up to which bands are split into tiles.
+        scroll_limit: The minimal fraction of all rows a scrolled band must cover to be reported.
+
+    Attributes:
+        bytes_per_pixel: The number of bytes per pixel of frames, call `reset()` when it changes.
+        scroll: The scrolled band of the last frame, or None.
+    """
+
+    def __init__(self, tile_size: int = 64, refine_limit: float = 0.25, scroll_limit: float = 0.125):
+        assert tile_size > 0
+        self.bytes_per_pixel = BYTES_PER_PIXEL
+        self.tile_size = tile_size
+        self.refine_limit = refine_limit
+        self.scroll_limit = scroll_limit
+        self.scroll: Optional[Scroll] = None
+        self._size = (0, 0)
+        self._rows: Optional[List[int]] = None
+        self._tiles: List[Optional[List[int]]] = []
+
+    def reset(self) -> None:
+        """Forget the previous frame, so that the next frame is damaged as a whole."""
+        self._rows = None
+        self._tiles = []
+
+    def update(self, address: int, width: int, height: int, stride: int, detect_scroll: bool = False) -> List[Rect]:
+        """
+        Compare a frame with the previous one.
+
+        Args:
+            address: The address of the first pixel.
+            width: The width of the frame in pixels.
+            height: The height of the frame in pixels.
+            stride: The number of bytes between rows.
+            detect_scroll: Whether to look for a scrolled band, e.g. after a wheel event.
+
+        Returns:
+            Changed regions except the scrolled band in `scroll`, an empty list if nothing has changed.
+        """
+        self.scroll = None
+        if not width or not height:
+            return []
+
+        pixels = memoryview((ctypes.c_char * (stride * height)).from_address(address)).cast("B")
+        row_bytes = width * self.bytes_per_pixel
+        rows = [zlib.crc32(pixels[y * stride:y * stride + row_bytes]) for y in range(height)]
+        previous = self._rows
+        self._rows = rows
+
+        if previous is None or self._size != (width, height):
+            self._size = (width, height)
+            self._tiles = [None] * ((height + self.tile_size - 1) // self.tile_size)
+            return [Rect(0, 0, width, height)]
+
+        changed = [y for y, (new, old) in enumerate(zip(rows, previous)) if new != old]
+        if not changed:
+            return []
+
+        if detect_scroll and len(changed) >= self.scroll_limit * height:
+            self.scroll = self._detect_scroll(rows, previous, changed, width)
+            if self.scroll is not None:
+                top = self.scroll.rect.y
+                bottom = top + self.scroll.rect.height
+                changed = [y for y in changed if not top <= y < bottom]
+                # Tiles of moved bands don't match their new content.
+                for band in range(top // self.tile_size, (bottom - 1) // self.tile_size + 1):
+                    self._tiles[band] = None
+                if not changed:
+                    return []
+
+        refine = len(changed) <= self.refine_limit * height
+        rects = []
+        band_changed: List[int] = []
+        for y in changed + [-1]:
+            if band_changed and (y < 0 or y // self.tile_size != band_changed[0] // self.tile_size):
+                rects.extend(self._damage_band(pixels, band_changed, width, height, stride, refine))
+                band_changed = []
+            band_changed.append(y)
+        return merge_rects(rects)
+
+    def _detect_scroll(self, rows: List[int], previous: List[int], changed: List[int], width: int) -> Optional[Scroll]:
+        # Rows which occur only once in the previous frame, e.g. not blank rows, and their positions.
+        positions: Dict[int, int] = {}
+        for y, value in enumerate(previous):
+            positions[value] = -1 if value in positions else y
+        votes: Counter = Counter()
+        for y in changed:
+            old = positions.get(rows[y], -1)
+            if old >= 0:
+                votes[y - old] += 1
+        if not votes:
+            return None
+
+        dy = votes.most_common(1)[0][0]
+        height = len(rows)
+        # The longest band of rows which hold the rows of the previous frame moved by dy.
+        best_top = best_bottom = top = max(0, dy)
+        for y in range(max(0, dy), min(height, height + dy) + 1):
+            if y == min(height, height + dy) or rows[y] != previous[y - dy]:
+                if y - top > best_bottom - best_top:
+                    best_top, best_bottom = top, y
+                top = y + 1
+        if best_bottom - best_top < self.scroll_limit * height:
+            return None
+        return Scroll(Rect(0, best_top, width, best_bottom - best_top), dy)
+
+    def _damage_band(
+        self, pixels: memoryview, changed: List[int], width: int, height: int, stride: int, refine: bool
+    ) -> List[Rect]:
+        band = changed[0] // self.tile_size
+        top, bottom = changed[0], changed[-1] + 1
+        previous = self._tiles[band]
+        if not refine:
+            self._tiles[band] = None
+            return [Rect(0, top, width, bottom - top)]
+
+        tiles = self._hash_tiles(pixels, band, width, height, stride)
+        self._tiles[band] = tiles
+        if previous is None:
+            return [Rect(0, top, width, bottom - top)]
+
+        rects = []
+        start = -1
+        for column, (new, old) in enumerate(zip(tiles + [None], previous + [None])):
+            if new != old and start < 0:
+                start = column
+            elif new == old and start >= 0:
+                x = start * self.tile_size
+                rects.append(Rect(x, top, min(column * self.tile_size, width) - x, bottom - top))
+                start = -1
+        return rects
+
+    def _hash_tiles(self, pixels: memoryview, band: int, width: int, height: int, stride: int) -> List[int]:
+        tile_bytes = self.tile_size * self.bytes_per_pixel
+        row_bytes = width * self.bytes_per_pixel
+        top = band * self.tile_size
+        bottom = min(top + self.tile_size, height)
+        tiles = [0] * ((width + self.tile_size - 1) // self.tile_size)
+        for y in range(top, bottom):
+            offset = y * stride
+            for column, start in enumerate(range(0, row_bytes, tile_bytes)):
+                end = min(start + tile_bytes, row_bytes)
+                tiles[column] = zlib.crc32(pixels[offset + start:offset + end], tiles[column])
+        return tiles
+
+
+def merge_rects(rects: Sequence[Rect]) -> List[Rect]:
+    """Merge vertically adjacent rectangles of the same horizontal extent."""
+    result: List[Rect] = []
+    for rect in sorted(rects, key=lambda r: (r.x, r.width, r.y)):
+        if result:
+            last = result[-1]
+            if last.x == rect.x and last.width == rect.width and last.y + last.height >= rect.y:
+                bottom = max(last.y + last.height, rect.y + rect.height)
+                result[-1] = Rect(last.x, last.y, last.width, bottom - last.y)
+                continue
+        result.append(rect)
+    return result
+
+
+def clip_rects(rects: Sequence[Rect], width: int, height: int) -> List[Rect]:
+    """Clip rectangles to the area of the given size."""
+    result = []
+    for x, y, w, h in rects:
+        w = min(x + w, width) - x
+        h = min(y + h, height) - y
+        if w > 0 and h > 0:
+            result.append(Rect(x, y, w, h))
+    return result
+
+
+def copy_rects(
+    dst: int, dst_stride: int, src: int, src_stride: int, rects: Sequence[Rect], bytes_per_pixel: int = BYTES_PER_PIXEL
+) -> None:
+    """
+    Copy regions between two pixel buffers.
+
+    Args:
+        dst: The address of the first pixel of the destination.
+        dst_stride: The number of bytes between rows of the destination.
+        src: The address of the first pixel of the source.
+        src_stride: The number of bytes between rows of the source.
+        rects: Regions to copy.
+        bytes_per_pixel: The number of bytes per pixel.
+    """
+    for x, y, width, height in rects:
+        offset = x * bytes_per_pixel
+        row_bytes = width * bytes_per_pixel
+        if offset == 0 and row_bytes == dst_stride == src_stride:
+            ctypes.memmove(dst + y * dst_stride, src + y * src_stride, row_bytes * height)
+        else:
+            for row in range(y, y + height):
+                ctypes.memmove(dst + row * dst_stride + offset, src + row * src_stride + offset, row_bytes)
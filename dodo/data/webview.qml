@@ -7,7 +7,12 @@ WebEngineView {
     property Canvas canvas: null
 
     onNewViewRequested: function (request) {
-        request.openIn(component.createRelated(canvas));
+        // The view is created asynchronously, so that views on screen keep rendering.
+        component.createRelated(canvas, function (view) {
+            if (view) {
+                request.openIn(view);
+            }
+        });
     }
 
     onContextMenuRequested: function (request) {
@@ -6,6 +6,7 @@ from wl_protocols.dodo import DodoProtoView
 
 EventType = DodoProtoView.event_type
 MouseButton = DodoProtoView.mouse_button
+Visibility = DodoProtoView.visibility
 
 FOCUS_EVENTS = {
     EventType.focus_in: QEvent.FocusIn,
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from typing import NamedTuple, Optional
+
+from dodo.gl import GL
+
+from wl_protocols.wayland import WlShm
+
+
+class PixelFormat(NamedTuple):
+    """
+    A `wl_shm` pixel format and how to read it back from OpenGL.
+
+    Attributes:
+        name: The name of the format, e.g. for configuration.
+        shm_format: The `wl_shm` format.
+        bytes_per_pixel: The number of bytes per pixel.
+        gl_format: The format of pixel data for `glReadPixels`.
+        gl_type: The data type of pixel data for `glReadPixels`.
+        gl_internal_format: The format of a renderbuffer to convert frames to before readback, None if rendered
+            frames can be read back as they are.
+        opaque: Whether the format has no alpha channel.
+    """
+    name: str
+    shm_format: int
+    bytes_per_pixel: int
+    gl_format: int
+    gl_type: int
+    gl_internal_format: Optional[int]
+    opaque: bool
+
+    def stride(self, width: int) -> int:
+        """Return the number of bytes per row, aligned to four bytes like `GL_PACK_ALIGNMENT`."""
+        return (width * self.bytes_per_pixel + 3) // 4 * 4
+
+
+# Little-endian wl_shm formats, i.e. BGRA bytes and 16-bit words with red in the most significant bits.
+ARGB8888 = PixelFormat("argb8888", WlShm.format.argb8888.value, 4, GL.GL_BGRA, GL.GL_UNSIGNED_BYTE, None, False)
+XRGB8888 = PixelFormat("xrgb8888", WlShm.format.xrgb8888.value, 4, GL.GL_BGRA, GL.GL_UNSIGNED_BYTE, None, True)
+RGB565 = PixelFormat("rgb565", WlShm.format.rgb565.value, 2, GL.GL_RGB, GL.GL_UNSIGNED_SHORT_5_6_5, GL.GL_RGB565, True)
+
+FORMATS = {fmt.name: fmt for fmt in (ARGB8888, XRGB8888, RGB565)}
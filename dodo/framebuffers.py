@@ -1,5 +1,8 @@
 from __future__ import annotations
+
+import threading
 from abc import ABC, abstractmethod
+from typing import List, Optional
 
 from PySide2.QtCore import QSize, QObject, Signal
 
@@ -44,11 +47,29 @@ class FramebufferController:
     def framebuffer_rendered(self, framebuffer: Framebuffer) -> None:
         pass
 
+    def clear(self, ctx: RenderContext) -> None:
+        """Destroy unused framebuffers of a context which is going to be destroyed."""
+
 
 class TextureFramebuffer(Framebuffer):
-    def __init__(self, ctx: RenderContext, size: QSize):
+    """
+    Framebuffer rendering to a texture.
+
+    The storage may be larger than the size of the framebuffer, so that it can be reused for other sizes.
+    The content is then in the bottom left corner, as with `glViewport(0, 0, width, height)`.
+
+    GL objects must be released explicitly with `destroy()`.
+
+    Args:
+        ctx: The context to create the framebuffer in.
+        size: The size of the framebuffer.
+        storageSize: The size of the texture and the render buffer, the size of the framebuffer by default.
+    """
+
+    def __init__(self, ctx: RenderContext, size: QSize, storageSize: Optional[QSize] = None):
         self.ctx = ctx
         self._size = size
+        self.storageSize = storage = storageSize or size
         self._handle = self._texture = self._rbo = 0
 
         self.ctx.makeCurrent()
@@ -59,7 +80,8 @@ class TextureFramebuffer(Framebuffer):
         self._texture = GL.glGenTextures(1)
         GL.glBindTexture(GL.GL_TEXTURE_2D, self._texture)
         GL.glTexImage2D(
-            GL.GL_TEXTURE_2D, 0, GL.GL_RGBA, size.width(), size.height(), 0, GL.GL_RGBA, GL.GL_UNSIGNED_BYTE, None
+            GL.GL_TEXTURE_2D, 0, GL.GL_RGBA, storage.width(), storage.height(), 0, GL.GL_RGBA, GL.GL_UNSIGNED_BYTE,
+            None
         )
         GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MIN_FILTER, GL.GL_LINEAR)
         GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MAG_FILTER, GL.GL_LINEAR)
@@ -68,7 +90,7 @@ class TextureFramebuffer(Framebuffer):
         # But use render buffer for depth and stencil buffers
         self._rbo = GL.glGenRenderbuffers(1)
         GL.glBindRenderbuffer(GL.GL_RENDERBUFFER, self._rbo)
-        GL.glRenderbufferStorage(GL.GL_RENDERBUFFER, GL.GL_DEPTH24_STENCIL8, size.width(), size.height())
+        GL.glRenderbufferStorage(GL.GL_RENDERBUFFER, GL.GL_DEPTH24_STENCIL8, storage.width(), storage.height())
         GL.glBindRenderbuffer(GL.GL_RENDERBUFFER, 0)
         GL.glFramebufferRenderbuffer(GL.GL_FRAMEBUFFER, GL.GL_DEPTH_STENCIL_ATTACHMENT, GL.GL_RENDERBUFFER, self._rbo)
 
@@ -81,16 +103,24 @@ class TextureFramebuffer(Framebuffer):
     def bind(self) -> None:
         GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, self._handle)
 
-    def __del__(self):
-        self.ctx.makeCurrent()
+    def destroy(self) -> None:
+        """Delete GL objects. Must be called in the thread of the GL context."""
+        if not self.ctx.makeCurrent():
+            return
 
         if self._texture:
-            GL.glDeleteTextures([self.texture])
+            GL.glDeleteTextures([self._texture])
         if self._rbo:
             GL.glDeleteRenderbuffers(1, [self._rbo])
         if self._handle:
-            GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, self._handle)
             GL.glDeleteFramebuffers(1, [self._handle])
+        self._handle = self._texture = self._rbo = 0
+
+    @property
+    def nbytes(self) -> int:
+        """Return the size of the color texture and the depth & stencil buffer in bytes."""
+        # RGBA8 + DEPTH24_STENCIL8
+        return self.storageSize.width() * self.storageSize.height() * 8
 
     @property
     def id(self) -> int:
@@ -100,22 +130,117 @@ class TextureFramebuffer(Framebuffer):
     def size(self) -> QSize:
         return self._size
 
+    @size.setter
+    def size(self, size: QSize) -> None:
+        assert size.width() <= self.storageSize.width() and size.height() <= self.storageSize.height()
+        self._size = size
+
     @property
     def texture(self) -> int:
         return self._texture
 
 
+class FramebufferPool:
+    """
+    Pool of texture framebuffers reused across resizes and views.
+
+    Sizes are rounded up to multiples of `BUCKET` pixels, so that a framebuffer can be reused for any size
+    of the same bucket. Framebuffers can only be reused in the context they were created in, but all views
+    rendered by a `RenderManager` share one context.
+
+    Released framebuffers are kept for reuse until the pool exceeds its budget, then the least recently released
+    ones are destroyed. Framebuffers in use count against the budget too but are never evicted. The pool may be
+    used from multiple render threads, but GL objects are only destroyed in the context of the calling thread.
+
+    Args:
+        budget: The maximal size of all framebuffers in bytes.
+    """
+
+    BUCKET = 128
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.nbytes = 0
+        # Released framebuffers, the least recently released first.
+        self._free: List[TextureFramebuffer] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get_bucket(cls, size: QSize) -> QSize:
+        """Round a size up to the bucket size."""
+        return QSize(
+            -(-max(1, size.width()) // cls.BUCKET) * cls.BUCKET, -(-max(1, size.height()) // cls.BUCKET) * cls.BUCKET
+        )
+
+    def acquire(self, ctx: RenderContext, size: QSize) -> TextureFramebuffer:
+        """
+        Return a released framebuffer of the same bucket or create a new one.
+
+        Args:
+            ctx: The current context.
+            size: The size of the framebuffer.
+        """
+        bucket = self.get_bucket(size)
+        with self._lock:
+            for index, framebuffer in enumerate(reversed(self._free)):
+                if framebuffer.ctx is ctx and framebuffer.storageSize == bucket:
+                    del self._free[len(self._free) - 1 - index]
+                    framebuffer.size = size
+                    return framebuffer
+
+            # Make room for the new framebuffer first.
+            framebuffer_bytes = bucket.width() * bucket.height() * 8
+            self._evict(ctx, self.budget - framebuffer_bytes)
+            self.nbytes += framebuffer_bytes
+
+        print("create_framebuffer", size, bucket)
+        return TextureFramebuffer(ctx, size, bucket)
+
+    def release(self, framebuffer: TextureFramebuffer) -> None:
+        """Return a framebuffer to the pool for reuse."""
+        with self._lock:
+            self._free.append(framebuffer)
+            self._evict(framebuffer.ctx, self.budget)
+
+    def clear(self, ctx: RenderContext) -> None:
+        """Destroy all released framebuffers of a context, e.g. before the context is destroyed."""
+        with self._lock:
+            self._evict(ctx, 0)
+
+    def _evict(self, ctx: RenderContext, budget: int) -> None:
+        """Destroy the least recently released framebuffers of the context until the pool fits into the budget."""
+        for framebuffer in list(self._free):
+            if self.nbytes <= budget:
+                break
+            if framebuffer.ctx is ctx:
+                self._free.remove(framebuffer)
+                self.nbytes -= framebuffer.nbytes
+                framebuffer.destroy()
+
+
 class TextureFramebufferController(QObject, FramebufferController):
     """
     Controller for QtFramebuffer.
 
+    Args:
+        pool: The pool to take framebuffers from, a private one if not set.
+
     Signals:
         rendered(textureId: int): Emitted when the renderer rendered the content to an OpenGL texture.
     """
 
+    def __init__(self, pool: Optional[FramebufferPool] = None):
+        super().__init__()
+        self.pool = pool if pool is not None else FramebufferPool(0)
+
     def create_framebuffer(self, ctx: RenderContext, size: QSize) -> TextureFramebuffer:
-        print("create_framebuffer", size)
-        return TextureFramebuffer(ctx, size)
+        return self.pool.acquire(ctx, size)
+
+    def release_framebuffer(self, framebuffer: TextureFramebuffer) -> None:
+        self.pool.release(framebuffer)
+
+    def clear(self, ctx: RenderContext) -> None:
+        self.pool.clear(ctx)
 
     def framebuffer_rendered(self, framebuffer: TextureFramebuffer) -> None:
         self.texture_rendered.emit(framebuffer)
@@ -1,6 +1,9 @@
-from PySide2.QtGui import QOpenGLContext, QSurface, QSurfaceFormat, QGuiApplication, Qt
+import ctypes
+
+from PySide2.QtGui import QOpenGLContext, QSurface, QSurfaceFormat, QGuiApplication, Qt, QOffscreenSurface
 
 from OpenGL import GL
+from OpenGL.raw.GL.VERSION.GL_1_0 import glReadPixels as _glReadPixels
 
 
 def get_default_format(*, gles: bool):
@@ -20,13 +23,58 @@ def initialize_gl():
     QGuiApplication.setAttribute(Qt.AA_ShareOpenGLContexts, True)
 
 
+def read_pixels(width: int, height: int, fmt: int, type_: int, pixels: int) -> None:
+    """
+    Read the bottom left corner of the bound framebuffer without allocating a Python buffer.
+
+    Unlike `glGetTexImage`, this works with textures larger than the rendered frame.
+
+    Args:
+        width: The width of the area to read.
+        height: The height of the area to read.
+        fmt: Format of the pixel data, e.g. `GL_BGRA`.
+        type_: Data type of the pixel data, e.g. `GL_UNSIGNED_BYTE`.
+        pixels: Memory address to write to, or an offset if a `GL_PIXEL_PACK_BUFFER` is bound.
+    """
+    _glReadPixels(0, 0, width, height, fmt, type_, ctypes.c_void_p(pixels))
+
+
+def has_sync_objects() -> bool:
+    """Return whether fences and mappable pixel pack buffers are available in the current context."""
+    return bool(GL.glFenceSync) and bool(GL.glClientWaitSync) and bool(GL.glMapBufferRange)
+
+
 class RenderContext:
     def __init__(self, glContext: QOpenGLContext, surface: QSurface):
         self.glContext = glContext
         self.surface = surface
 
     def makeCurrent(self) -> bool:
+        # The context may be shared by many renderers, avoid needless context switches.
+        if QOpenGLContext.currentContext() is self.glContext and self.glContext.surface() is self.surface:
+            return True
         return self.glContext.makeCurrent(self.surface)
 
 
-__all__ = ["GL", "get_default_format", "initialize_gl", "RenderContext"]
+def create_render_context(shareContext: QOpenGLContext) -> RenderContext:
+    """
+    Create a desktop OpenGL context with an offscreen surface for rendering of QML.
+
+    Args:
+        shareContext: OpenGL context used as a share context.
+    """
+    context = QOpenGLContext()
+    context.setShareContext(shareContext)
+    context.setFormat(get_default_format(gles=False))
+    context.create()
+    assert not context.isOpenGLES(), "We need BGRA readback from OpenGL"
+
+    # Create offscreen surface with initialized format
+    surface = QOffscreenSurface()
+    surface.setFormat(context.format())
+    surface.create()
+    return RenderContext(context, surface)
+
+
+__all__ = ["GL", "get_default_format", "initialize_gl", "read_pixels", "has_sync_objects", "RenderContext",
+           "create_render_context"]
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from typing import Tuple
+
+from dodo.stats import FrameStats, Stage
+
+# Stages which scale with the number of rendered pixels.
+COST_STAGES = (Stage.sync, Stage.render, Stage.readback, Stage.shm_write)
+
+
+class ResolutionGovernor:
+    """
+    Dynamic resolution: lowers the render scale when frames take longer than a budget.
+
+    The mean cost of client stages per frame is sampled from frame stats. When it exceeds the budget, the render
+    scale factor is lowered by a step, down to `MIN_FACTOR`. It is raised again when the cost estimated for the higher
+    factor fits into `HEADROOM` of the budget, assuming the cost is proportional to the number of pixels.
+
+    Args:
+        budget: The budget of client stages per frame in milliseconds.
+    """
+
+    MIN_FACTOR = 0.5
+    STEP = 0.125
+    HEADROOM = 0.8
+    MIN_FRAMES = 10
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.factor = 1.0
+        self._last: Tuple[int, float] = (0, 0.0)
+
+    def update(self, stats: FrameStats) -> bool:
+        """
+        Adjust the factor according to the frames rendered since the last update.
+
+        Args:
+            stats: Frame stats of the view.
+
+        Returns:
+            True if the factor has changed.
+        """
+        frames = stats.histograms[Stage.render].count
+        total = sum(stats.histograms[stage].total for stage in COST_STAGES)
+        last_frames, last_total = self._last
+        if frames < last_frames:
+            # Stats have been reset.
+            last_frames, last_total = 0, 0.0
+        if frames - last_frames < self.MIN_FRAMES:
+            return False
+
+        self._last = frames, total
+        cost = (total - last_total) / (frames - last_frames)
+        factor = self.factor
+        if cost > self.budget:
+            factor = max(self.MIN_FACTOR, factor - self.STEP)
+        elif factor < 1.0:
+            higher = min(1.0, factor + self.STEP)
+            if cost * (higher / factor) ** 2 <= self.budget * self.HEADROOM:
+                factor = higher
+
+        if factor == self.factor:
+            return False
+        print(f"Render scale factor {self.factor} → {factor}, {cost:.1f} ms per frame.")
+        self.factor = factor
+        return True
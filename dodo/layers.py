@@ -0,0 +1,75 @@
+from typing import Optional
+
+from PySide2.QtCore import Signal, Property, QObject, Slot
+from PySide2.QtQuick import QQuickItem
+
+
+class Layer(QQuickItem):
+    """
+    A QML item whose content is rendered into its own subsurface, e.g. a video output.
+
+    The content is rendered, read back and committed on its own, so that a playing video updates only the rectangle
+    of the layer rather than the whole page. The subsurface is placed above the page at the position of the layer.
+    Input events are not delivered to the content.
+
+    Example:
+
+        Layer {
+            canvas: root.canvas
+            anchors.fill: parent
+            content: VideoOutput { source: player }
+        }
+    """
+    canvasChanged = Signal()
+    contentChanged = Signal()
+
+    def __init__(self, parent: QQuickItem = None):
+        super().__init__(parent)
+        self._canvas: Optional[QObject] = None
+        self._content: Optional[QQuickItem] = None
+        self._completed = False
+        self.xChanged.connect(self._onGeometryChanged)
+        self.yChanged.connect(self._onGeometryChanged)
+        self.widthChanged.connect(self._onGeometryChanged)
+        self.heightChanged.connect(self._onGeometryChanged)
+
+    def _getCanvas(self) -> Optional[QObject]:
+        return self._canvas
+
+    def _setCanvas(self, canvas: Optional[QObject]) -> None:
+        if canvas is not self._canvas:
+            self._detach()
+            self._canvas = canvas
+            self.canvasChanged.emit()
+            self._attach()
+
+    def _getContent(self) -> Optional[QQuickItem]:
+        return self._content
+
+    def _setContent(self, content: Optional[QQuickItem]) -> None:
+        if content is not self._content:
+            self._detach()
+            self._content = content
+            self.contentChanged.emit()
+            self._attach()
+
+    canvas = Property(QObject, _getCanvas, _setCanvas, notify=canvasChanged)
+    content = Property(QQuickItem, _getContent, _setContent, notify=contentChanged)
+
+    def componentComplete(self) -> None:
+        super().componentComplete()
+        self._completed = True
+        self._attach()
+
+    def _attach(self) -> None:
+        if self._completed and self._canvas is not None and self._content is not None:
+            self._canvas.add_layer(self)
+
+    def _detach(self) -> None:
+        if self._canvas is not None and self._content is not None:
+            self._canvas.remove_layer(self)
+
+    @Slot()
+    def _onGeometryChanged(self):
+        if self._canvas is not None:
+            self._canvas.update_layer(self)
@@ -1,22 +1,85 @@
+import time
+from typing import Callable, Optional, Set
+
 from PySide2.QtCore import QTimer, Slot, Signal, QObject, QUrl
-from PySide2.QtQml import QQmlComponent, QQmlIncubationController, QQmlEngine, qmlRegisterType
+from PySide2.QtQml import QQmlComponent, QQmlIncubationController, QQmlEngine, QQmlIncubator, QJSValue, \
+    qmlRegisterType
 from PySide2.QtQuick import QQuickItem
 
+from dodo.layers import Layer
 from dodo.view import View
 
 
 class IncubationController(QQmlIncubationController):
-    def __init__(self):
+    """
+    Incubates QML objects between frames.
+
+    The timer runs only while objects are incubating. Each slice gets the time left until the next frame is due,
+    minus the cost of the last frame, so that creating new items doesn't delay frames of the views on screen.
+
+    Args:
+        frameInterval: The expected interval between frames in milliseconds.
+    """
+    INTERVAL = 4
+    MIN_BUDGET = 1
+    MAX_BUDGET = 12
+
+    def __init__(self, frameInterval: float = 1000 / 60):
         super().__init__()
+        self.frameInterval = frameInterval
+        self._frameStart = 0.0
+        self._frameCost = 0.0
         self._timer = timer = QTimer()
         timer.setSingleShot(False)
-        timer.setInterval(10)
+        timer.setInterval(self.INTERVAL)
         timer.timeout.connect(self._onTimer)
-        timer.start()
+
+    def incubatingObjectCountChanged(self, count: int) -> None:
+        if not count:
+            self._timer.stop()
+        elif not self._timer.isActive():
+            self._timer.start()
+
+    @Slot(float, float)
+    def frameRendered(self, start: float, cost: float) -> None:
+        """
+        Record the timing of a rendered frame.
+
+        Args:
+            start: The start of the frame as returned by `time.perf_counter`.
+            cost: The duration of the frame in milliseconds.
+        """
+        self._frameStart = start
+        self._frameCost = cost
+
+    def budget(self) -> int:
+        """Return the number of milliseconds which can be spent incubating before the next frame is due."""
+        elapsed = (time.perf_counter() - self._frameStart) * 1000
+        if elapsed > 2 * self.frameInterval:
+            # Nothing is being rendered.
+            return self.MAX_BUDGET
+        remaining = self.frameInterval - elapsed % self.frameInterval - self._frameCost
+        return int(max(self.MIN_BUDGET, min(self.MAX_BUDGET, remaining)))
 
     @Slot()
     def _onTimer(self):
-        self.incubateFor(5)
+        self.incubateFor(self.budget())
+
+
+class Incubator(QQmlIncubator):
+    """Asynchronous creation of an object, `callback` is called with the object or None once it is finished."""
+
+    def __init__(self, callback: Callable[[Optional[QObject]], None]):
+        super().__init__(QQmlIncubator.Asynchronous)
+        self.callback = callback
+
+    def statusChanged(self, status) -> None:
+        if status == QQmlIncubator.Ready:
+            self.callback(self.object())
+        elif status == QQmlIncubator.Error:
+            for err in self.errors():
+                print("Error:", err.url(), err.line(), err)
+            self.callback(None)
 
 
 class Engine(QObject):
@@ -29,25 +92,79 @@ class Engine(QObject):
 
 class Component(QObject):
     relatedCreated = Signal((View, QQuickItem,))
+    # Emitted when the component has been loaded, successfully or not.
+    ready = Signal()
 
     def __init__(self, engine: Engine, qmlUrl: QUrl):
         super().__init__()
         self.engine = engine
         self.qmlUrl = qmlUrl
         self.component = None
+        self._incubators: Set[Incubator] = set()
+
+    def load(self, asynchronous: bool = False):
+        """
+        Load the component.
+
+        Local QML files are compiled into the QML disk cache, so that later loads are faster.
+
+        Args:
+            asynchronous: Whether to load the component in the background, `ready` is emitted once it is loaded.
+                Otherwise, the component is loaded before this method returns.
+        """
+        mode = QQmlComponent.Asynchronous if asynchronous else QQmlComponent.PreferSynchronous
+        self.component = component = QQmlComponent(self.engine.engine, self.qmlUrl, mode)
+        component.statusChanged.connect(self._onStatusChanged)
+        if not component.isLoading():
+            self._onStatusChanged(component.status())
 
-    def load(self):
-        self.component = component = QQmlComponent(self.engine.engine, self.qmlUrl, QQmlComponent.PreferSynchronous)
-        assert not component.isLoading()
+    @property
+    def isLoaded(self) -> bool:
+        return self.component is not None and not self.component.isLoading()
+
+    @Slot(QQmlComponent.Status)
+    def _onStatusChanged(self, status):
+        if status == QQmlComponent.Loading:
+            return
+        component = self.component
+        component.statusChanged.disconnect(self._onStatusChanged)
         if component.isError():
             for err in component.errors():
                 print("Error:", err.url(), err.line(), err)
+        self.ready.emit()
 
-    @Slot(View, result=QObject)
-    def createRelated(self, view):
-        item = self.create()
-        self.relatedCreated.emit(view, item)
-        return item
+    @Slot(View, QJSValue)
+    def createRelated(self, view: View, callback: QJSValue):
+        """
+        Create an item for a view requested by the page of another view, e.g. a pop-up.
+
+        The item is created asynchronously, so that views on screen keep rendering. The callback is called with
+        the new item, or with null on failure.
+        """
+        def created(item: Optional[QQuickItem]):
+            if item is not None:
+                self.relatedCreated.emit(view, item)
+                callback.call([self.engine.engine.newQObject(item)])
+            else:
+                callback.call([QJSValue(QJSValue.NullValue)])
+
+        self.incubate(created)
+
+    def incubate(self, callback: Callable[[Optional[QQuickItem]], None]) -> None:
+        """
+        Create an item asynchronously, in slices between frames.
+
+        Args:
+            callback: Called with the new item, or with None on failure.
+        """
+        def created(item: Optional[QObject]):
+            # The incubator must not be destroyed from its own callback.
+            QTimer.singleShot(0, lambda: self._incubators.discard(incubator))
+            callback(self._setUp(item) if item is not None else None)
+
+        incubator = Incubator(created)
+        self._incubators.add(incubator)
+        self.component.create(incubator)
 
     def create(self):
         component = self.component
@@ -57,11 +174,17 @@ class Component(QObject):
                 print("Error:", err.url(), err.line(), err)
             return None
 
+        return self._setUp(item)
+
+    def _setUp(self, item: QObject) -> QQuickItem:
         if not isinstance(item, QQuickItem):
             raise TypeError(f'Unexpected QML type {type(item)}.')
 
+        # Items are owned by views, even when they are passed to JavaScript.
+        QQmlEngine.setObjectOwnership(item, QQmlEngine.CppOwnership)
         item.setProperty("component", self)
         return item
 
 qmlRegisterType(Component, "eu.tiliado.NuvolaPlayer", 1, 0, "Component")
 qmlRegisterType(View, "eu.tiliado.NuvolaPlayer", 1, 0, "Canvas")
+qmlRegisterType(Layer, "eu.tiliado.NuvolaPlayer", 1, 0, "Layer")
@@ -0,0 +1,340 @@
+from __future__ import annotations
+
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, List, Optional
+
+from dodo.formats import PixelFormat, ARGB8888
+from dodo.framebuffers import Framebuffer
+from dodo.gl import GL, RenderContext, read_pixels, has_sync_objects
+from dodo.stats import FrameStats, Stage
+
+# Returns the address of writable memory for the given number of bytes, or zero if there is none.
+Destination = Callable[[int], int]
+# Receives the address, the width and the height of a frame that has been read back.
+Sink = Callable[[int, int, int], None]
+# Called when a started frame won't be delivered to the sink.
+Dropped = Callable[[], None]
+
+
+class Readback(ABC):
+    """
+    Transfer of rendered textures from GPU to client memory.
+
+    No intermediate Python buffer is allocated. Synchronous readback writes pixels straight to the memory
+    provided by the destination, e.g. a `wl_shm` mapping. Asynchronous readback passes the mapped pixel
+    pack buffer to the sink, which copies what it needs.
+
+    Frames are read back in `format`, with rows aligned to four bytes. Formats with fewer bits per pixel are
+    converted on the GPU by blitting the frame to a renderbuffer of that format, so that only the compact frame
+    is transferred.
+
+    Args:
+        destination: Provides memory for each frame.
+        sink: Receives each frame that has been read back.
+        stats: Records durations of the readback stage, excluding the sink.
+        dropped: Called when a frame cannot be delivered, e.g. because its format has changed, so that the caller
+            doesn't wait for it.
+
+    Attributes:
+        format: The pixel format of frames, frames started with another format are not delivered.
+        latency_frames: How many frames were rendered since the last delivered frame was started.
+        latency_ms: Moving average of the time between starting and delivering a frame.
+    """
+
+    format: PixelFormat = ARGB8888
+    latency_frames: int = 0
+    latency_ms: float = 0.0
+
+    def __init__(
+        self, destination: Destination, sink: Sink, stats: Optional[FrameStats] = None,
+        dropped: Optional[Dropped] = None,
+    ):
+        self._destination = destination
+        self._sink = sink
+        self._dropped = dropped
+        self._stats = stats if stats is not None else FrameStats()
+        self._ctx: Optional[RenderContext] = None
+        self._converter: Optional[_FormatConverter] = None
+
+    @property
+    def pending(self) -> int:
+        """Return the number of frames being read back."""
+        return 0
+
+    @property
+    def nbytes(self) -> int:
+        """Return the size of GPU buffers used for readback in bytes."""
+        if self._converter is None:
+            return 0
+        width, height = self._converter.size
+        return width * height * self.format.bytes_per_pixel
+
+    @abstractmethod
+    def start(self, framebuffer: Framebuffer) -> None:
+        """
+        Start reading back the texture of a rendered framebuffer.
+
+        The context of the framebuffer must be current.
+        """
+
+    def collect(self, block: bool = False) -> bool:
+        """
+        Deliver frames that have been read back.
+
+        Args:
+            block: Wait for the oldest pending frame if no frame is ready.
+
+        Returns:
+            True if a frame has been delivered to the sink.
+        """
+        return False
+
+    def release(self) -> None:
+        """Release GL resources."""
+        if self._converter is not None and self._ctx.makeCurrent():
+            self._converter.delete()
+        self._converter = None
+
+    def _read_pixels(self, framebuffer: Framebuffer, pixels: int) -> None:
+        """Read the frame in `format` to memory or to the bound pixel pack buffer."""
+        fmt = self.format
+        width, height = framebuffer.size.toTuple()
+        self._ctx = framebuffer.ctx
+        if fmt.gl_internal_format is None:
+            framebuffer.bind()
+        else:
+            if self._converter is None or self._converter.internal_format != fmt.gl_internal_format:
+                if self._converter is not None:
+                    self._converter.delete()
+                self._converter = _FormatConverter(fmt.gl_internal_format)
+            self._converter.convert(framebuffer)
+        read_pixels(width, height, fmt.gl_format, fmt.gl_type, pixels)
+        GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, 0)
+
+    def _update_latency(self, frames: int, started: float) -> None:
+        self.latency_frames = frames
+        elapsed = (time.monotonic() - started) * 1000
+        self.latency_ms = elapsed if not self.latency_ms else 0.9 * self.latency_ms + 0.1 * elapsed
+
+
+class SyncReadback(Readback):
+    """Blocking readback with `glReadPixels`."""
+
+    def start(self, framebuffer: Framebuffer) -> None:
+        width, height = framebuffer.size.toTuple()
+        nbytes = self.format.stride(width) * height
+        address = self._destination(nbytes)
+        if address:
+            with self._stats.measure(Stage.readback):
+                self._read_pixels(framebuffer, address)
+            self._sink(address, width, height)
+
+    def __str__(self):
+        return "synchronous readback"
+
+
+class _FormatConverter:
+    """
+    Conversion of frames to another pixel format on the GPU.
+
+    Args:
+        internal_format: The format of the renderbuffer, e.g. `GL_RGB565`.
+    """
+
+    def __init__(self, internal_format: int):
+        self.internal_format = internal_format
+        self.fbo = GL.glGenFramebuffers(1)
+        self.rbo = GL.glGenRenderbuffers(1)
+        self.size = (0, 0)
+
+    def convert(self, framebuffer: Framebuffer) -> None:
+        """Blit a framebuffer to the renderbuffer and bind it for reading."""
+        width, height = size = framebuffer.size.toTuple()
+        GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, self.fbo)
+        if self.size != size:
+            GL.glBindRenderbuffer(GL.GL_RENDERBUFFER, self.rbo)
+            GL.glRenderbufferStorage(GL.GL_RENDERBUFFER, self.internal_format, width, height)
+            GL.glBindRenderbuffer(GL.GL_RENDERBUFFER, 0)
+            GL.glFramebufferRenderbuffer(GL.GL_FRAMEBUFFER, GL.GL_COLOR_ATTACHMENT0, GL.GL_RENDERBUFFER, self.rbo)
+            self.size = size
+
+        GL.glBindFramebuffer(GL.GL_READ_FRAMEBUFFER, framebuffer.id)
+        GL.glBlitFramebuffer(0, 0, width, height, 0, 0, width, height, GL.GL_COLOR_BUFFER_BIT, GL.GL_NEAREST)
+        GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, self.fbo)
+
+    def delete(self) -> None:
+        GL.glDeleteRenderbuffers(1, [self.rbo])
+        GL.glDeleteFramebuffers(1, [self.fbo])
+        self.fbo = self.rbo = 0
+
+
+class _PixelPackBuffer:
+    def __init__(self):
+        self.id = GL.glGenBuffers(1)
+        self.format = ARGB8888
+        self.capacity = 0
+        self.nbytes = 0
+        self.fence = None
+        self.width = self.height = 0
+        self.frame = 0
+        self.started = 0.0
+
+    @property
+    def busy(self) -> bool:
+        return self.fence is not None
+
+    def is_ready(self, block: bool) -> bool:
+        timeout = 1_000_000_000 if block else 0
+        status = GL.glClientWaitSync(self.fence, GL.GL_SYNC_FLUSH_COMMANDS_BIT, timeout)
+        return status in (GL.GL_ALREADY_SIGNALED, GL.GL_CONDITION_SATISFIED)
+
+    def finish(self) -> None:
+        GL.glDeleteSync(self.fence)
+        self.fence = None
+
+    def delete(self) -> None:
+        if self.fence is not None:
+            self.finish()
+        GL.glDeleteBuffers(1, [self.id])
+        self.id = 0
+
+
+class PboReadback(Readback):
+    """
+    Asynchronous readback with a ring of pixel pack buffers.
+
+    A frame is copied to a pixel pack buffer right after it has been rendered, and it is mapped a frame or two
+    later when a fence says the copy has finished. Only the newest finished frame is delivered, older ones
+    are dropped.
+
+    Args:
+        destination: Provides memory for each frame.
+        sink: Receives each frame that has been read back.
+        depth: The number of pixel pack buffers in the ring.
+        stats: Records durations of the readback stage, i.e. issuing the copy and mapping the buffer.
+        dropped: Called when the newest finished frame cannot be delivered.
+    """
+
+    def __init__(
+        self, destination: Destination, sink: Sink, depth: int, stats: Optional[FrameStats] = None,
+        dropped: Optional[Dropped] = None,
+    ):
+        super().__init__(destination, sink, stats, dropped)
+        assert depth > 0
+        self.depth = depth
+        self._buffers: List[_PixelPackBuffer] = []
+        self._next = 0
+        self._frame = 0
+
+    def __str__(self):
+        return f"asynchronous readback (depth={self.depth})"
+
+    @property
+    def pending(self) -> int:
+        return sum(1 for pbo in self._buffers if pbo.busy)
+
+    @property
+    def nbytes(self) -> int:
+        return super().nbytes + sum(pbo.capacity for pbo in self._buffers)
+
+    def start(self, framebuffer: Framebuffer) -> None:
+        start = time.perf_counter()
+        self._ctx = framebuffer.ctx
+        if not self._buffers:
+            self._buffers = [_PixelPackBuffer() for _ in range(self.depth)]
+
+        pbo = self._buffers[self._next]
+        if pbo.busy:
+            # The ring is full, the oldest frame must be finished first.
+            self.collect(block=True)
+            start = time.perf_counter()
+        if pbo.busy:
+            # The GPU hasn't finished the copy in time: give up the old frame and orphan its storage,
+            # so that the new frame isn't read into memory the GPU may still be writing.
+            pbo.finish()
+            pbo.capacity = 0
+
+        pbo.width, pbo.height = framebuffer.size.toTuple()
+        pbo.format = self.format
+        pbo.nbytes = pbo.format.stride(pbo.width) * pbo.height
+        GL.glBindBuffer(GL.GL_PIXEL_PACK_BUFFER, pbo.id)
+        if pbo.capacity != pbo.nbytes:
+            GL.glBufferData(GL.GL_PIXEL_PACK_BUFFER, pbo.nbytes, None, GL.GL_STREAM_READ)
+            pbo.capacity = pbo.nbytes
+        self._read_pixels(framebuffer, 0)
+        GL.glBindBuffer(GL.GL_PIXEL_PACK_BUFFER, 0)
+        pbo.fence = GL.glFenceSync(GL.GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+        self._frame += 1
+        pbo.frame = self._frame
+        pbo.started = time.monotonic()
+        self._next = (self._next + 1) % self.depth
+        self._stats.add(Stage.readback, (time.perf_counter() - start) * 1000)
+
+    def collect(self, block: bool = False) -> bool:
+        busy = sorted((pbo for pbo in self._buffers if pbo.busy), key=lambda pbo: pbo.frame)
+        if not busy or not self._ctx.makeCurrent():
+            return False
+
+        # Fences are signalled in order, so look for the newest finished frame.
+        ready = None
+        for pbo in busy:
+            if pbo.is_ready(block and pbo is busy[0]):
+                ready = pbo
+            else:
+                break
+        if ready is None:
+            return False
+
+        for pbo in busy:
+            pbo.finish()
+            if pbo is ready:
+                break
+
+        with self._stats.measure(Stage.readback):
+            GL.glBindBuffer(GL.GL_PIXEL_PACK_BUFFER, ready.id)
+            mapped = GL.glMapBufferRange(GL.GL_PIXEL_PACK_BUFFER, 0, ready.nbytes, GL.GL_MAP_READ_BIT)
+        delivered = False
+        try:
+            if mapped and ready.format == self.format:
+                self._update_latency(self._frame - ready.frame + 1, ready.started)
+                self._sink(mapped, ready.width, ready.height)
+                delivered = True
+        finally:
+            if mapped:
+                GL.glUnmapBuffer(GL.GL_PIXEL_PACK_BUFFER)
+            GL.glBindBuffer(GL.GL_PIXEL_PACK_BUFFER, 0)
+        if not delivered:
+            if not mapped:
+                print("Failed to map the pixel pack buffer, the frame is dropped.")
+            if self._dropped is not None:
+                self._dropped()
+        return delivered
+
+    def release(self) -> None:
+        if self._buffers and self._ctx.makeCurrent():
+            for pbo in self._buffers:
+                pbo.delete()
+        self._buffers = []
+        super().release()
+
+
+def create_readback(
+    destination: Destination, sink: Sink, depth: int, stats: Optional[FrameStats] = None,
+    dropped: Optional[Dropped] = None,
+) -> Readback:
+    """
+    Create readback for the current context.
+
+    Args:
+        destination: Provides memory for each frame.
+        sink: Receives each frame that has been read back.
+        depth: The number of pixel pack buffers, zero for synchronous readback.
+        stats: Records durations of the readback stage.
+        dropped: Called when a frame cannot be delivered.
+    """
+    if depth > 0:
+        if has_sync_objects():
+            return PboReadback(destination, sink, depth, stats, dropped)
+        print("Fences are not supported, falling back to synchronous readback.")
+    return SyncReadback(destination, sink, stats, dropped)
@@ -1,54 +1,164 @@
 from __future__ import annotations
-from typing import Optional, Tuple
+import time
+from typing import Callable, List, Optional, Tuple
 
-from PySide2.QtCore import QSize, QTimer, QCoreApplication, Slot, QEvent, Signal, QObject
+from PySide2.QtCore import QSize, QTimer, QCoreApplication, Slot, QEvent, Signal, QObject, QThread, QMutex, \
+    QWaitCondition, Qt
 from PySide2.QtGui import QOpenGLFramebufferObject, QOpenGLContext, QOffscreenSurface, QCursor
 from PySide2.QtQml import QQmlComponent
 from PySide2.QtQuick import QQuickItem, QQuickRenderControl, QQuickWindow
 
 from dodo.events import get_cursor_name
 from dodo.framebuffers import FramebufferController, Framebuffer
-from dodo.gl import RenderContext, get_default_format
+from dodo.gl import RenderContext, create_render_context
+from dodo.stats import FrameStats, Stage
 
 
 class QmlOffscreenRenderer(QObject):
     """
     Offscreen rendering of a QML component.
 
+    Polish, sync and render operations are scheduled with a short timer, so that multiple scene changes result
+    in a single frame. A throttled renderer additionally renders at most one frame per frame callback: once
+    a frame has been rendered, scene changes are only collected until `frameDone()` is called.
+
+    A threaded renderer does all GL work in a dedicated render thread with its own context, following
+    the threaded `QQuickRenderControl` example of Qt: The main thread polishes items and then blocks while
+    the render thread synchronizes the scene graph. Rendering itself doesn't block the main thread.
+    `FramebufferController.framebuffer_rendered` is called from the render thread in that case.
+
+    The scene is rendered at `scale` device pixels per logical pixel, which may be fractional. A `WebEngineView`
+    root item is sized in device pixels and zoomed with `zoomFactor`, so that Chromium rasterizes at full
+    resolution. Other root items are sized in logical pixels and the content item is scaled. Either way, positions
+    of input events must be in device pixels.
+
+    A managed renderer uses the GL context of a `RenderManager` shared with other renderers and doesn't schedule
+    frames itself; the manager renders them with `renderFrame()` in its own pass. Threaded renderers can't be managed.
+
     Args:
         rootItem: The root  item of a QML component to render.
         controller: The controller of a framebuffer life cycle.
+        throttled: Whether to wait for `frameDone()` after each rendered frame.
+        threaded: Whether to render in a dedicated render thread.
+        stats: Records durations of the sync and render stages.
+        manager: The render manager to schedule frames with, ignored by a threaded renderer.
+
+    Attributes:
+        focused: Whether the view has keyboard focus, focused renderers are rendered first by the manager.
+        visible: Whether the view is visible, hidden renderers are rendered last by the manager.
+        lastFrameTime: When a frame was last rendered by the manager, in seconds of `time.perf_counter()`.
+        releaseHook: Called in the thread of the GL context when the renderer is released, before the scene graph,
+            to release other GL resources living there, e.g. readback buffers.
+        nextVblank: Predicts the next vblank in seconds of `time.monotonic()`, or returns None, e.g. from presentation
+            feedback. Frames are then started late enough to be committed just before the vblank, rather than as soon
+            as possible, which shortens the time from rendering to the screen.
     """
 
     cursor_changed = Signal((QCursor, str))
 
+    # Requests handled by `_RenderWorker` in the render thread.
+    _initializeRequested = Signal()
+    _framebuffersRequested = Signal(bool)
+    _callRequested = Signal(object)
+    _syncRequested = Signal()
+    _renderRequested = Signal()
+    _resizeRequested = Signal()
+    _releaseRequested = Signal()
+    # Emitted from the render thread when a requested frame is done.
+    _renderFinished = Signal()
+    _frameDoneRequested = Signal()
+
+    SCHEDULE_DELAY = 5
+    # How long before the predicted vblank a frame should be committed, in milliseconds.
+    VBLANK_MARGIN = 2.0
+    # Stages from the start of a frame to its commit.
+    FRAME_STAGES = (Stage.sync, Stage.render, Stage.readback, Stage.shm_write)
+
     size: QSize = QSize(0, 0)
+    scale: float = 1.0
     initialized: bool = False
     ctx: RenderContext = None
+    focused: bool = False
+    visible: bool = True
+    lastFrameTime: float = 0.0
+    releaseHook: Optional[Callable[[], None]] = None
+    nextVblank: Optional[Callable[[], Optional[float]]] = None
 
     _surface: QOffscreenSurface = None
     _control: QQuickRenderControl = None
     _window: QQuickWindow = None
+    _manager: Optional[RenderManager] = None
     _renderTimer: QTimer = None
     _syncTimer: Optional[QTimer] = None
+    _throttled: bool = False
+    _frameInFlight: bool = False
+    _suspended: bool = False
+    _syncPending: bool = False
+    _renderPending: bool = False
+    _renderThread: Optional[QThread] = None
+    _worker: Optional[_RenderWorker] = None
+    _renderBusy: bool = False
+    _mutex: Optional[QMutex] = None
+    _condition: Optional[QWaitCondition] = None
     _controller: FramebufferController
+    _stats: FrameStats
     _framebuffers: Optional[Tuple[Framebuffer, Framebuffer]] = None
     _component: QQmlComponent = None
     rootItem: QQuickItem = None
     _cursor: QCursor = None
+    _zoom: bool = False
 
-    def __init__(self, rootItem: QQuickItem, controller: FramebufferController):
+    def __init__(
+        self, rootItem: QQuickItem, controller: FramebufferController, throttled: bool = False, threaded: bool = False,
+        stats: Optional[FrameStats] = None, manager: Optional[RenderManager] = None,
+    ):
         super().__init__()
         self._controller = controller
+        self._stats = stats if stats is not None else FrameStats()
+        self._throttled = throttled
         self.rootItem = rootItem
+        self._zoom = rootItem.metaObject().indexOfProperty("zoomFactor") >= 0
+        if threaded:
+            self._renderThread = QThread()
+            self._renderThread.setObjectName("QmlOffscreenRenderer")
+            self._mutex = QMutex()
+            self._condition = QWaitCondition()
+        else:
+            self._manager = manager
+        # Called from the render thread or the main thread.
+        self._frameDoneRequested.connect(self._onFrameDone)
+
+    @property
+    def renderThread(self) -> Optional[QThread]:
+        """Return the render thread or None if rendering happens in the main thread."""
+        return self._renderThread
+
+    @property
+    def opaque(self) -> bool:
+        """Return whether rendered frames are opaque, i.e. the window is cleared with an opaque color."""
+        return self._window is not None and self._window.color().alpha() == 255
+
+    @property
+    def pixelSize(self) -> QSize:
+        """Return the size of rendered frames in device pixels."""
+        return QSize(max(1, round(self.size.width() * self.scale)), max(1, round(self.size.height() * self.scale)))
+
+    @property
+    def framePending(self) -> bool:
+        """Return whether there is a frame to render and nothing prevents rendering it."""
+        return (
+            (self._syncPending or self._renderPending) and not self._frameInFlight and not self._renderBusy
+            and not self._suspended
+        )
 
-    def initialize(self, size: QSize, shareContext: QOpenGLContext) -> None:
+    def initialize(self, size: QSize, shareContext: QOpenGLContext, scale: float = 1.0) -> None:
         """
         Initialize offscreen renderer.
 
         Args:
-            size: The size of the area available for rendering.
+            size: The size of the area available for rendering in logical pixels.
             shareContext: OpenGL context used as a share context.
+            scale: The number of device pixels per logical pixel.
 
         Raises:
             RuntimeError: If the renderer has already been initialized.
@@ -57,19 +167,12 @@ class QmlOffscreenRenderer(QObject):
         if self.initialized:
             raise RuntimeError('Already initialized')
 
-        context = QOpenGLContext()
-        context.setShareContext(shareContext)
-        context.setFormat(get_default_format(gles=False))
-        context.create()
-        assert not context.isOpenGLES(), "We need glGetTexImage from OpenGL"
-
         self.size = size
-
-        # Create offscreen surface with initialized format
-        surface = QOffscreenSurface()
-        surface.setFormat(context.format())
-        surface.create()
-        self.ctx = RenderContext(context, surface)
+        self.scale = scale
+        if self._manager is not None:
+            self.ctx = self._manager.getContext(shareContext)
+        else:
+            self.ctx = create_render_context(shareContext)
 
         # Set up quick rendering
         self._control = control = QQuickRenderControl()
@@ -77,51 +180,152 @@ class QmlOffscreenRenderer(QObject):
         self._cursor = self._window.cursor()
 
         # Don't polish/sync/render immediately for better performance, use a timer
-        self._renderTimer = renderTimer = QTimer()
-        renderTimer.setSingleShot(True)
-        renderTimer.setInterval(5)
-        renderTimer.timeout.connect(self._onRenderTimer)
-        self._syncTimer = syncTimer = QTimer()
-        syncTimer.setSingleShot(True)
-        syncTimer.setInterval(5)
-        syncTimer.timeout.connect(self._onSyncTimer)
-        syncTimer.destroyed.connect(self._onSyncTimerDestroyed)
-
-        # Request to create frame buffer
-        window.sceneGraphInitialized.connect(self._onSceneGraphInitialized)
-        # Request to release frame buffer
-        window.sceneGraphInvalidated.connect(self._onSceneGraphInvalidated)
+        if self._manager is None:
+            self._renderTimer = renderTimer = QTimer()
+            renderTimer.setSingleShot(True)
+            renderTimer.timeout.connect(self._onRenderTimer)
+            self._syncTimer = syncTimer = QTimer()
+            syncTimer.setSingleShot(True)
+            syncTimer.timeout.connect(self._onSyncTimer)
+            syncTimer.destroyed.connect(self._onSyncTimerDestroyed)
+
+        # Request to create frame buffer, in the thread of the GL context
+        window.sceneGraphInitialized.connect(self._onSceneGraphInitialized, Qt.DirectConnection)
+        # Request to release frame buffer, in the thread of the GL context
+        window.sceneGraphInvalidated.connect(self._onSceneGraphInvalidated, Qt.DirectConnection)
         # Only render is needed
         control.renderRequested.connect(self._onRenderRequested)
         # Polish, sync & render
         control.sceneChanged.connect(self._onSceneChanged)
 
+        if self._renderThread is not None:
+            self._startRenderThread()
+
         self.initialized = True
 
         # Attach root item
         self.rootItem.setParentItem(self._window.contentItem())
         self._window.contentItem().forceActiveFocus()
         self._updateSizes()
-        self.ctx.makeCurrent()
-        self._control.initialize(self.ctx.glContext)
+        if self._renderThread is not None:
+            self._initializeRequested.emit()
+        else:
+            self._initializeControl()
+
+    def release(self) -> None:
+        """Release the scene graph and stop the render thread."""
+        if self._manager is not None:
+            self._manager.unregister(self)
+        if self._renderThread is not None:
+            if self._renderThread.isRunning():
+                self._releaseRequested.emit()
+                self._renderThread.quit()
+                self._renderThread.wait()
+        elif self.releaseHook is not None:
+            self.releaseHook()
+
+    def callInRenderThread(self, callback: Callable[[], None]) -> None:
+        """
+        Call a function in the thread of the GL context and wait for it, e.g. to release GL resources.
 
-    def resize(self, size: QSize) -> None:
+        Without a render thread, the function is called right away.
+        """
+        if self._renderThread is not None:
+            if self._renderThread.isRunning():
+                self._callRequested.emit(callback)
+        else:
+            callback()
+
+    def resize(self, size: QSize, scale: Optional[float] = None) -> None:
         """
         Resize the area for rendering.
 
         Args:
-             size: New size.
+             size: New size in logical pixels.
+             scale: New number of device pixels per logical pixel, unchanged if not set.
         """
-        print(f'QmlOffscreenRenderer.resize: {self.size} → {size}, {self.initialized}')
-        if not self.initialized or self.size == size:
+        if scale is None:
+            scale = self.scale
+        print(f'QmlOffscreenRenderer.resize: {self.size}@{self.scale} → {size}@{scale}, {self.initialized}')
+        if not self.initialized or (self.size == size and self.scale == scale):
             return
 
         self.size = size
+        self.scale = scale
 
-        if self.rootItem and self.ctx.makeCurrent():
-            self._destroyFrameBuffer()
-            self._createFrameBuffer()
-            self._updateSizes()
+        if self.rootItem:
+            if self._renderThread is not None:
+                self._resizeRequested.emit()
+                self._updateSizes()
+            elif self.ctx.makeCurrent():
+                self._recreateFrameBuffer()
+                self._updateSizes()
+
+    def suspend(self, releaseFramebuffers: bool = False) -> None:
+        """
+        Stop rendering, e.g. when the view is hidden.
+
+        Scene changes are still collected and rendered after `resume()`.
+
+        Args:
+            releaseFramebuffers: Whether to release framebuffers to save memory, also when already suspended.
+        """
+        if not self.initialized:
+            return
+
+        if not self._suspended:
+            self._suspended = True
+            if self._manager is not None:
+                self._manager.unregister(self)
+            else:
+                for timer in (self._syncTimer, self._renderTimer):
+                    if timer is not None:
+                        timer.stop()
+        if releaseFramebuffers:
+            self._setFramebuffers(False)
+
+    @property
+    def framebufferBytes(self) -> int:
+        """Return the size of textures and renderbuffers of the framebuffers in bytes."""
+        framebuffers = self._framebuffers
+        return sum(fb.nbytes for fb in framebuffers) if framebuffers is not None else 0
+
+    def resume(self) -> None:
+        """Resume rendering and render the current scene."""
+        if not self.initialized or not self._suspended:
+            return
+
+        self._suspended = False
+        self._setFramebuffers(True)
+        self._syncPending = True
+        self._scheduleFrame(0)
+
+    def requestRender(self) -> None:
+        """Schedule rendering of the current scene."""
+        if self.initialized:
+            self._onRenderRequested()
+
+    def renderFrame(self) -> None:
+        """
+        Polish, sync & render, or only render, whatever is pending.
+
+        Called by the render manager with the shared context current.
+        """
+        self.lastFrameTime = time.perf_counter()
+        if self._syncPending:
+            self._polishSyncRender()
+        elif self._renderPending:
+            self._render()
+
+    def frameDone(self) -> None:
+        """
+        Allow rendering of the next frame.
+
+        Called when the compositor asks for a new frame, or when the last frame has not been presented at all.
+        Scene changes collected in the meantime are rendered right away. It is safe to call this method
+        from the render thread.
+        """
+        self._frameDoneRequested.emit()
 
     def sendEvent(self, event: QEvent) -> None:
         """
@@ -130,19 +334,55 @@ class QmlOffscreenRenderer(QObject):
         Args:
             event: The event to send.
         """
-        QCoreApplication.sendEvent(self._window, event)
+        self.sendEvents([event])
+
+    def sendEvents(self, events: List[QEvent]) -> None:
+        """
+        Send a batch of events.
+
+        The cursor is checked only once, after all events have been delivered.
+
+        Args:
+            events: The events to send.
+        """
+        for event in events:
+            QCoreApplication.sendEvent(self._window, event)
         cursor = self._window.cursor()
         if cursor != self._cursor:
             self.cursor_changed.emit(cursor, get_cursor_name(cursor.shape()))
             self._cursor = cursor
 
+    def _startRenderThread(self) -> None:
+        """Move the GL context to the render thread and start it."""
+        thread = self._renderThread
+        self.ctx.glContext.moveToThread(thread)
+        self._control.prepareThread(thread)
+        self._worker = worker = _RenderWorker(self)
+        worker.moveToThread(thread)
+        self._initializeRequested.connect(worker.initialize, Qt.BlockingQueuedConnection)
+        self._framebuffersRequested.connect(worker.framebuffers, Qt.BlockingQueuedConnection)
+        self._callRequested.connect(worker.call, Qt.BlockingQueuedConnection)
+        self._syncRequested.connect(worker.sync)
+        self._renderRequested.connect(worker.render)
+        self._resizeRequested.connect(worker.resize, Qt.BlockingQueuedConnection)
+        self._releaseRequested.connect(worker.release, Qt.BlockingQueuedConnection)
+        self._renderFinished.connect(self._onRenderFinished)
+        QCoreApplication.instance().aboutToQuit.connect(self.release)
+        thread.start()
+
+    def _initializeControl(self) -> None:
+        """Initialize the scene graph. Called in the thread of the GL context."""
+        self.ctx.makeCurrent()
+        self._control.initialize(self.ctx.glContext)
+
     def _createFrameBuffer(self):
         """Create framebuffer for quick window."""
-        print(f'QmlOffscreenRenderer._createFrameBufferObject: {self.size}')
+        size = self.pixelSize
+        print(f'QmlOffscreenRenderer._createFrameBufferObject: {size}')
         self.ctx.makeCurrent()
         self._framebuffers = (
-            self._controller.create_framebuffer(self.ctx, self.size),
-            self._controller.create_framebuffer(self.ctx, self.size),
+            self._controller.create_framebuffer(self.ctx, size),
+            self._controller.create_framebuffer(self.ctx, size),
         )
         fb = self._framebuffers[0]
         self._window.setRenderTarget(fb.id, fb.size)
@@ -154,37 +394,139 @@ class QmlOffscreenRenderer(QObject):
             self._controller.release_framebuffer(fb)
         self._framebuffers = None
 
+    def _setFramebuffers(self, create: bool) -> None:
+        """Create framebuffers unless they exist, or release them."""
+        if self._renderThread is not None:
+            self._framebuffersRequested.emit(create)
+        elif self.ctx.makeCurrent():
+            self._createOrReleaseFramebuffers(create)
+
+    def _createOrReleaseFramebuffers(self, create: bool) -> None:
+        """Create framebuffers unless they exist, or release them. Called in the thread of the GL context."""
+        if create:
+            if self._framebuffers is None:
+                self._createFrameBuffer()
+        elif self._framebuffers is not None:
+            self._destroyFrameBuffer()
+
+    def _recreateFrameBuffer(self):
+        """Replace framebuffer with one of the current size. Called in the thread of the GL context."""
+        if self._framebuffers is not None:
+            self._destroyFrameBuffer()
+        elif self._suspended:
+            # Released while suspended, created on resume.
+            return
+        self._createFrameBuffer()
+
     def _updateSizes(self) -> None:
         """Update size of the quick window and QML root item."""
-        print(f'QmlOffscreenRenderer._updateSizes: {self.size}')
+        print(f'QmlOffscreenRenderer._updateSizes: {self.size}@{self.scale}')
         width, height = self.size.toTuple()
-        self._window.setGeometry(0, 0, width, height)
-        self.rootItem.setWidth(width)
-        self.rootItem.setHeight(height)
+        pixelWidth, pixelHeight = self.pixelSize.toTuple()
+        self._window.setGeometry(0, 0, pixelWidth, pixelHeight)
+        if self._zoom:
+            # Chromium rasterizes at the zoomed size, scaling the item would only magnify the texture.
+            self.rootItem.setWidth(pixelWidth)
+            self.rootItem.setHeight(pixelHeight)
+            self.rootItem.setProperty("zoomFactor", self.scale)
+        else:
+            contentItem = self._window.contentItem()
+            contentItem.setTransformOrigin(QQuickItem.TopLeft)
+            contentItem.setScale(self.scale)
+            self.rootItem.setWidth(width)
+            self.rootItem.setHeight(height)
+
+    def _scheduleFrame(self, delay: int) -> None:
+        """
+        Schedule pending operations unless a frame is in flight.
+
+        Args:
+            delay: The delay in milliseconds.
+        """
+        if self._frameInFlight or self._renderBusy or self._suspended:
+            return
+
+        delay = self._alignToVblank(delay)
+        if self._manager is not None:
+            if self._syncPending or self._renderPending:
+                self._manager.schedule(self, delay)
+            return
+
+        if self._syncPending:
+            timer = self._syncTimer
+        elif self._renderPending:
+            timer = self._renderTimer
+        else:
+            return
+
+        if timer is not None and not timer.isActive():
+            timer.start(delay)
+
+    def _alignToVblank(self, delay: int) -> int:
+        """Return the delay of the next frame, so that it is committed just before the predicted vblank."""
+        vblank = self.nextVblank() if self.nextVblank is not None else None
+        if vblank is None:
+            return delay
+
+        # The 95th percentiles of frames so far, the predicted vblank is missed otherwise.
+        histograms = self._stats.histograms
+        lead = sum(histograms[stage].percentile(95) for stage in self.FRAME_STAGES) + self.VBLANK_MARGIN
+        wait = (vblank - time.monotonic()) * 1000 - lead
+        # Too late for this vblank: start right away and hit the next one.
+        return max(delay, int(wait))
 
     def _polishSyncRender(self):
         """Polish, sync & render."""
-        if not self.initialized or not self.ctx.makeCurrent():
+        self._syncPending = self._renderPending = False
+        if not self.initialized:
+            return
+
+        if self._renderThread is not None:
+            self._control.polishItems()
+            # Block until the render thread has synchronized the scene graph, then let it render.
+            self._renderBusy = True
+            self._mutex.lock()
+            self._syncRequested.emit()
+            self._condition.wait(self._mutex)
+            self._mutex.unlock()
+            return
+
+        if not self.ctx.makeCurrent():
             return
 
         control = self._control
         control.polishItems()
-        if control.sync():
+        with self._stats.measure(Stage.sync):
+            changed = control.sync()
+        if changed:
+            self._render()
+
+    def _syncInRenderThread(self):
+        """Synchronize the scene graph while the main thread is blocked, then render it."""
+        self._mutex.lock()
+        with self._stats.measure(Stage.sync):
+            changed = self.ctx.makeCurrent() and self._control.sync()
+        self._condition.wakeOne()
+        self._mutex.unlock()
+        if changed:
             self._render()
 
     def _render(self):
         """Render QML component to a texture."""
+        self._renderPending = False
         if not self.initialized or self._framebuffers is None or not self.ctx.makeCurrent():
             return
 
-        self._control.render()
-        self._window.resetOpenGLState()
-        QOpenGLFramebufferObject.bindDefault()
-        self.ctx.glContext.functions().glFlush()
+        with self._stats.measure(Stage.render):
+            self._control.render()
+            self._window.resetOpenGLState()
+            QOpenGLFramebufferObject.bindDefault()
+            self.ctx.glContext.functions().glFlush()
         current_fb, next_fb = self._framebuffers
-        self._controller.framebuffer_rendered(current_fb)
         self._framebuffers = next_fb, current_fb
         self._window.setRenderTarget(next_fb.id, next_fb.size)
+        self._frameInFlight = self._throttled
+        self._controller.framebuffer_rendered(current_fb)
 
     @Slot()
     def _onComponentStatusChanged(self):
@@ -195,11 +537,22 @@ class QmlOffscreenRenderer(QObject):
     @Slot()
     def _onRenderTimer(self):
         """Rendering scheduled."""
-        self._render()
+        if self._renderThread is not None:
+            if self._renderBusy:
+                # Rescheduled when the current frame is finished.
+                return
+            self._renderPending = False
+            self._renderBusy = True
+            self._renderRequested.emit()
+        else:
+            self._render()
 
     @Slot()
     def _onSyncTimer(self):
         """Polish, sync & render scheduled."""
+        if self._renderBusy:
+            # Rescheduled when the current frame is finished.
+            return
         self._polishSyncRender()
 
     @Slot()
@@ -208,17 +561,30 @@ class QmlOffscreenRenderer(QObject):
         # Python wrapper is still alive though!
         self._syncTimer = None
 
+    @Slot()
+    def _onRenderFinished(self):
+        """The render thread has finished a frame."""
+        self._renderBusy = False
+        self._scheduleFrame(0)
+
+    @Slot()
+    def _onFrameDone(self):
+        """The next frame may be rendered."""
+        self._frameInFlight = False
+        if self.initialized:
+            self._scheduleFrame(0)
+
     @Slot()
     def _onRenderRequested(self):
         """Schedule rendering."""
-        if not self._renderTimer.isActive():
-            self._renderTimer.start()
+        self._renderPending = True
+        self._scheduleFrame(self.SCHEDULE_DELAY)
 
     @Slot()
     def _onSceneChanged(self):
         """Schedule polish, sync & render operations."""
-        if self._syncTimer is not None and not self._syncTimer.isActive():
-            self._syncTimer.start()
+        self._syncPending = True
+        self._scheduleFrame(self.SCHEDULE_DELAY)
 
     @Slot()
     def _onSceneGraphInitialized(self):
@@ -229,3 +595,135 @@ class QmlOffscreenRenderer(QObject):
     def _onSceneGraphInvalidated(self):
         """Quick window's scene graph was invalidated."""
         self._destroyFrameBuffer()
+
+
+class _RenderWorker(QObject):
+    """
+    GL work of a threaded `QmlOffscreenRenderer`.
+
+    Lives in the render thread, so that its slots are invoked there.
+
+    Args:
+        renderer: The renderer to do the work for.
+    """
+
+    def __init__(self, renderer: QmlOffscreenRenderer):
+        super().__init__()
+        self._renderer = renderer
+
+    @Slot()
+    def initialize(self):
+        self._renderer._initializeControl()
+
+    @Slot()
+    def sync(self):
+        self._renderer._syncInRenderThread()
+        self._renderer._renderFinished.emit()
+
+    @Slot()
+    def render(self):
+        self._renderer._render()
+        self._renderer._renderFinished.emit()
+
+    @Slot()
+    def resize(self):
+        if self._renderer.ctx.makeCurrent():
+            self._renderer._recreateFrameBuffer()
+
+    @Slot(bool)
+    def framebuffers(self, create: bool):
+        if self._renderer.ctx.makeCurrent():
+            self._renderer._createOrReleaseFramebuffers(create)
+
+    @Slot(object)
+    def call(self, callback: Callable[[], None]):
+        callback()
+
+    @Slot()
+    def release(self):
+        renderer = self._renderer
+        renderer.ctx.makeCurrent()
+        if renderer.releaseHook is not None:
+            renderer.releaseHook()
+        renderer._control.invalidate()
+        renderer._controller.clear(renderer.ctx)
+        renderer.ctx.glContext.doneCurrent()
+        # Hand the context back to the main thread for destruction.
+        renderer.ctx.glContext.moveToThread(QCoreApplication.instance().thread())
+
+
+class RenderManager(QObject):
+    """
+    Single render scheduler of all managed renderers of a client.
+
+    The renderers share one GL context, so that switching between views is cheap, and their pending frames are
+    polished, synchronized and rendered in a single pass. Each pass has a time budget: focused renderers go first,
+    then visible ones, then the least recently rendered ones. Frames which don't fit into the budget are left for
+    the next pass, but at least one frame is rendered in each pass, so that a slow view cannot starve the others.
+
+    Args:
+        budget: The time budget of a pass in milliseconds.
+    """
+
+    ctx: Optional[RenderContext] = None
+    # The start of a pass as returned by `time.perf_counter` and its duration in milliseconds.
+    passFinished = Signal(float, float)
+
+    def __init__(self, budget: int):
+        super().__init__()
+        self.budget = budget
+        self._pending: List[QmlOffscreenRenderer] = []
+        self._timer = QTimer()
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._onTimer)
+
+    def getContext(self, shareContext: QOpenGLContext) -> RenderContext:
+        """
+        Return the shared context, create it on the first call.
+
+        Args:
+            shareContext: OpenGL context used as a share context.
+        """
+        if self.ctx is None:
+            self.ctx = create_render_context(shareContext)
+        return self.ctx
+
+    def schedule(self, renderer: QmlOffscreenRenderer, delay: int) -> None:
+        """
+        Render a frame of the renderer in the next pass.
+
+        Args:
+            renderer: The renderer with a pending frame.
+            delay: The maximal delay of the next pass in milliseconds.
+        """
+        if renderer not in self._pending:
+            self._pending.append(renderer)
+        if not self._timer.isActive() or self._timer.remainingTime() > delay:
+            self._timer.start(delay)
+
+    def unregister(self, renderer: QmlOffscreenRenderer) -> None:
+        """Forget a renderer which is going to be destroyed."""
+        if renderer in self._pending:
+            self._pending.remove(renderer)
+
+    @Slot()
+    def _onTimer(self):
+        """Render pending frames within the time budget."""
+        pending, self._pending = self._pending, []
+        if not pending or not self.ctx.makeCurrent():
+            return
+
+        pending.sort(key=lambda renderer: (not renderer.focused, not renderer.visible, renderer.lastFrameTime))
+        start = time.perf_counter()
+        for index, renderer in enumerate(pending):
+            if index and (time.perf_counter() - start) * 1000 >= self.budget:
+                for deferred in pending[index:]:
+                    if deferred.framePending and deferred not in self._pending:
+                        self._pending.append(deferred)
+                break
+            if renderer.framePending:
+                renderer.renderFrame()
+        self.passFinished.emit(start, (time.perf_counter() - start) * 1000)
+
+        if self._pending and not self._timer.isActive():
+            self._timer.start(QmlOffscreenRenderer.SCHEDULE_DELAY)
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import os
+import time
+from enum import IntEnum
+from typing import Dict, TYPE_CHECKING
+
+from PySide2.QtCore import QObject, QTimer, Slot
+
+from dodo.events import Visibility
+
+if TYPE_CHECKING:
+    from dodo.view import View
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+class LifecycleState(IntEnum):
+    """The values of `WebEngineView.LifecycleState`."""
+    active = 0
+    frozen = 1
+    discarded = 2
+
+
+def get_process_rss(pid: int) -> int:
+    """Return the resident set size of a process in bytes, zero if it is not known."""
+    if not pid:
+        return 0
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class ResourceManager(QObject):
+    """
+    Keeps memory of views within a budget.
+
+    Memory of each view is accounted every `INTERVAL`: framebuffers, readback buffers and shm buffers of the view
+    and its layers, and the resident memory of the Chromium renderer process, which is split among views sharing it.
+    When the total exceeds the budget, hidden views are frozen, which releases their buffers, and then discarded,
+    which releases their renderer process, the least recently visible ones first. A view is made active again as soon
+    as the server shows it, and Chromium reloads a discarded page.
+
+    Args:
+        budget: The memory budget of all views in bytes, zero to only account memory.
+
+    Attributes:
+        total: The memory of all views in bytes at the last accounting.
+    """
+    INTERVAL = 1000
+
+    def __init__(self, budget: int):
+        super().__init__()
+        self.budget = budget
+        self.total = 0
+        # Views and the time they were last visible (`time.monotonic`).
+        self.views: Dict[View, float] = {}
+        self.timer = QTimer()
+        self.timer.setInterval(self.INTERVAL)
+        self.timer.timeout.connect(self.on_timer)
+        if budget:
+            self.timer.start()
+
+    def add(self, view: View) -> None:
+        self.views[view] = time.monotonic()
+
+    def remove(self, view: View) -> None:
+        self.views.pop(view, None)
+
+    def stop(self) -> None:
+        self.timer.stop()
+        self.views.clear()
+
+    def account(self) -> int:
+        """
+        Update `View.memory` of all views.
+
+        Returns:
+            The memory of all views in bytes.
+        """
+        now = time.monotonic()
+        sharing: Dict[int, int] = {}
+        for view in self.views:
+            if view.visibility != Visibility.hidden:
+                self.views[view] = now
+            pid = view.renderer_pid
+            sharing[pid] = sharing.get(pid, 0) + 1
+
+        rss = {pid: get_process_rss(pid) // count for pid, count in sharing.items()}
+        total = 0
+        for view in self.views:
+            memory = view.get_memory()
+            memory["renderer_rss"] = rss[view.renderer_pid]
+            view.memory = memory
+            total += sum(memory.values())
+        self.total = total
+        return total
+
+    def enforce(self) -> None:
+        """Freeze and then discard the least recently visible hidden views until memory fits into the budget."""
+        total = self.account()
+        if total <= self.budget:
+            return
+
+        hidden = sorted(
+            (view for view in self.views if view.visibility == Visibility.hidden), key=self.views.__getitem__
+        )
+        # Freezing is cheap to undo, discarding loses the state of the page which is not saved.
+        for state in (LifecycleState.frozen, LifecycleState.discarded):
+            for view in hidden:
+                if total <= self.budget:
+                    return
+                if view.lifecycle_state >= state:
+                    continue
+                print(f"Views take {total >> 20} MiB, over the budget: {state.name} view {view.width}x{view.height}.")
+                if view.set_lifecycle_state(state) or state == LifecycleState.frozen:
+                    memory = view.memory
+                    # Savings are estimated now and measured at the next accounting.
+                    if state == LifecycleState.frozen:
+                        total -= memory.get("framebuffers", 0) + memory.get("readback", 0) + memory.get("shm", 0)
+                    else:
+                        total -= memory.get("renderer_rss", 0)
+
+    def get_stats(self) -> dict:
+        """Return statistics of memory, e.g. for JSON output."""
+        return {
+            "budget": self.budget,
+            "total": self.total,
+            "frozen": sum(1 for view in self.views if view.lifecycle_state == LifecycleState.frozen),
+            "discarded": sum(1 for view in self.views if view.lifecycle_state == LifecycleState.discarded),
+        }
+
+    @Slot()
+    def on_timer(self):
+        self.enforce()
@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import ctypes
+import mmap
+import os
+import threading
+from typing import Callable, List, Optional, Sequence
+
+from pywayland.utils import AnonymousFile
+
+from dodo.damage import Rect
+from dodo.formats import PixelFormat, ARGB8888
+
+MAX_DAMAGE_RECTS = 32
+
+
+class ShmPool:
+    """
+    Grow-only `wl_shm_pool` backed by an anonymous file.
+
+    Args:
+        shm: The `wl_shm` global.
+        size: Initial size of the pool in bytes.
+    """
+
+    def __init__(self, shm, size: int):
+        with AnonymousFile(size) as fd:
+            self.fd = os.dup(fd)
+        self.size = size
+        self.wl_pool = shm.create_pool(self.fd, size)
+        self.data = None
+        self.address = 0
+        self._map()
+
+    def _map(self) -> None:
+        self.data = mmap.mmap(self.fd, self.size, prot=mmap.PROT_READ | mmap.PROT_WRITE, flags=mmap.MAP_SHARED)
+        self.address = ctypes.addressof(ctypes.c_char.from_buffer(self.data))
+
+    def reserve(self, size: int) -> None:
+        """
+        Make sure the pool is at least `size` bytes large.
+
+        The pool never shrinks so that interactive resizes don't reallocate it over and over.
+        """
+        if size <= self.size:
+            return
+
+        print(f"ShmPool.reserve: {self.size} → {size}")
+        os.ftruncate(self.fd, size)
+        self.wl_pool.resize(size)
+        self.size = size
+        # The old mapping is unmapped once nothing refers to it.
+        self._map()
+
+    def destroy(self) -> None:
+        if self.wl_pool is not None:
+            self.wl_pool.destroy()
+            self.wl_pool = None
+            os.close(self.fd)
+            self.fd = -1
+            self.data = None
+            self.address = 0
+
+
+class ShmBuffer:
+    """
+    A `wl_buffer` carved from a `ShmPool`.
+
+    Attributes:
+        released: The compositor doesn't use the buffer.
+        acquired: The client is writing to the buffer.
+        dropped: The buffer doesn't match the current size and will be destroyed when released.
+        damage: Regions that changed since the content of the buffer was last updated, None if all of them.
+        committed_at: When the buffer was last committed, in `time.perf_counter()` seconds.
+    """
+
+    def __init__(
+        self, pool: ShmPool, offset: int, width: int, height: int, fmt: PixelFormat,
+        on_released: Optional[Callable[[ShmBuffer], None]] = None,
+    ):
+        self.pool = pool
+        self.offset = offset
+        self.width = width
+        self.height = height
+        self.format = fmt
+        self.stride = fmt.stride(width)
+        self.size = self.stride * height
+        self.released = True
+        self.acquired = False
+        self.dropped = False
+        self.damage: Optional[List[Rect]] = None
+        self.committed_at = 0.0
+        self._on_released_callback = on_released
+        self.wl_buffer = pool.wl_pool.create_buffer(offset, width, height, self.stride, fmt.shm_format)
+        self.wl_buffer.dispatcher["release"] = self._on_released
+
+    @property
+    def address(self) -> int:
+        """Return the address of the first pixel in the mapped pool."""
+        return self.pool.address + self.offset
+
+    @property
+    def free(self) -> bool:
+        return self.released and not self.acquired and not self.dropped
+
+    def drop(self) -> None:
+        """Destroy the buffer now or as soon as the compositor releases it."""
+        self.dropped = True
+        if self.released:
+            self.destroy()
+
+    def destroy(self) -> None:
+        if self.wl_buffer is not None:
+            self.wl_buffer.dispatcher["release"] = None
+            self.wl_buffer.destroy()
+            self.wl_buffer = None
+
+    def _on_released(self, wl_buffer) -> None:
+        self.released = True
+        if self.dropped:
+            self.destroy()
+        elif self._on_released_callback is not None:
+            self._on_released_callback(self)
+
+
+class ShmSwapchain:
+    """
+    A small set of shm buffers of the same size picked by their release state.
+
+    Rendering of a new frame can overlap with the compositor reading the previous one without tearing.
+    All buffers are carved from a single grow-only pool.
+
+    Frames may be written from a render thread while the main thread talks to the compositor. The swapchain
+    methods hold `lock`, and writers must hold it too while they write to a buffer, so that the pool is not
+    remapped under their hands.
+
+    Args:
+        shm: The `wl_shm` global.
+        length: The maximal number of buffers.
+        fmt: The pixel format of buffers.
+        on_released: Called when the compositor releases a current buffer.
+    """
+
+    def __init__(
+        self, shm, length: int = 3, fmt: PixelFormat = ARGB8888,
+        on_released: Optional[Callable[[ShmBuffer], None]] = None,
+    ):
+        assert length > 0
+        self.shm = shm
+        self.on_released = on_released
+        self.length = length
+        self.format = fmt
+        self.width = self.height = 0
+        self.pool: Optional[ShmPool] = None
+        self.buffers: List[ShmBuffer] = []
+        # Dropped buffers which the compositor may still read, their memory is not reused until they are released.
+        self.retired: List[ShmBuffer] = []
+        self.lock = threading.RLock()
+
+    @property
+    def buffer_size(self) -> int:
+        return self.format.stride(self.width) * self.height
+
+    @property
+    def nbytes(self) -> int:
+        """Return the size of the shm pool in bytes."""
+        return self.pool.size if self.pool is not None else 0
+
+    def resize(self, width: int, height: int, fmt: Optional[PixelFormat] = None) -> None:
+        """
+        Set the size and the format of buffers.
+
+        Current buffers are dropped. Those still held by the compositor are destroyed when released.
+        """
+        with self.lock:
+            fmt = fmt or self.format
+            if (width, height, fmt) == (self.width, self.height, self.format):
+                return
+
+            for buffer in self.buffers:
+                buffer.drop()
+                if not buffer.released:
+                    self.retired.append(buffer)
+            self.buffers = []
+            self.width = width
+            self.height = height
+            self.format = fmt
+
+            # New buffers are placed past retired ones in `acquire()`, which grows the pool if needed.
+            size = max(1, self.length * self.buffer_size)
+            if self.pool is None:
+                self.pool = ShmPool(self.shm, size)
+            else:
+                self.pool.reserve(size)
+
+    def acquire(self) -> Optional[ShmBuffer]:
+        """
+        Acquire a free buffer for writing.
+
+        Returns:
+            A free buffer or None if all buffers are used by the compositor.
+        """
+        with self.lock:
+            for buffer in self.buffers:
+                if buffer.free:
+                    buffer.acquired = True
+                    return buffer
+
+            if len(self.buffers) < self.length and self.buffer_size:
+                offset = self._find_free_range(self.buffer_size)
+                self.pool.reserve(offset + self.buffer_size)
+                buffer = ShmBuffer(self.pool, offset, self.width, self.height, self.format, self.on_released)
+                buffer.acquired = True
+                self.buffers.append(buffer)
+                return buffer
+            return None
+
+    def _find_free_range(self, size: int) -> int:
+        """Return the lowest offset of `size` bytes of the pool which no current or retired buffer uses."""
+        self.retired = [buffer for buffer in self.retired if not buffer.released]
+        used = sorted((buffer.offset, buffer.offset + buffer.size) for buffer in self.buffers + self.retired)
+        offset = 0
+        for start, end in used:
+            if offset + size <= start:
+                break
+            offset = max(offset, end)
+        return offset
+
+    def get_outdated(self, buffer: ShmBuffer, damage: Sequence[Rect]) -> List[Rect]:
+        """
+        Return regions of a buffer that must be updated to hold the latest frame.
+
+        Args:
+            buffer: The buffer to update.
+            damage: Regions changed by the latest frame.
+        """
+        with self.lock:
+            if buffer.damage is None:
+                return [Rect(0, 0, self.width, self.height)]
+            return buffer.damage + list(damage)
+
+    def add_damage(self, buffer: ShmBuffer, damage: Sequence[Rect]) -> None:
+        """
+        Record that a buffer holds the latest frame, which changed the given regions.
+
+        Other buffers are outdated in these regions until they are updated.
+        """
+        with self.lock:
+            buffer.damage = []
+            for other in self.buffers:
+                if other is not buffer and other.damage is not None:
+                    other.damage.extend(damage)
+                    if len(other.damage) > MAX_DAMAGE_RECTS:
+                        other.damage = None
+
+    def cancel(self, buffer: ShmBuffer) -> None:
+        """Return an acquired buffer without presenting it."""
+        with self.lock:
+            buffer.acquired = False
+
+    def present(self, buffer: ShmBuffer) -> None:
+        """Mark an acquired buffer as attached to the surface."""
+        with self.lock:
+            buffer.acquired = False
+            buffer.released = False
+
+    def destroy(self) -> None:
+        """Destroy all buffers and the pool. The swapchain can be used again after `resize()`."""
+        with self.lock:
+            for buffer in self.buffers:
+                buffer.drop()
+            self.buffers = []
+            # The compositor keeps its own mapping of the pool until it releases retired buffers.
+            self.retired = []
+            self.width = self.height = 0
+            if self.pool is not None:
+                self.pool.destroy()
+                self.pool = None
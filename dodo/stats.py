@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from enum import IntEnum
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+# Upper bounds of histogram buckets in milliseconds, the last bucket is unbounded.
+BUCKETS = (
+    0.1, 0.2, 0.5, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 8.0, 10.0, 12.0, 16.0, 20.0, 25.0, 33.0, 50.0, 75.0, 100.0,
+    150.0, 250.0, 500.0, 1000.0,
+)
+
+
+class Stage(IntEnum):
+    """
+    Stages of a frame, the values match `dodo_proto_view.stats_stage`.
+
+    The first five stages are measured by the client, the rest by the server.
+    """
+    sync = 0
+    render = 1
+    readback = 2
+    shm_write = 3
+    commit = 4
+    upload = 5
+    draw = 6
+
+
+class Summary(NamedTuple):
+    """Summary of a histogram, times in milliseconds."""
+    count: int
+    mean: float
+    p50: float
+    p95: float
+    max: float
+
+
+class Histogram:
+    """Histogram of durations with fixed buckets."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms: float) -> None:
+        """Record a duration in milliseconds."""
+        self.counts[bisect_left(BUCKETS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def reset(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percent: float) -> float:
+        """
+        Estimate a percentile.
+
+        Args:
+            percent: The percentile, e.g. 95.
+
+        Returns:
+            The upper bound of the bucket with the percentile, but at most the maximal duration.
+        """
+        if not self.count:
+            return 0.0
+
+        rank = percent / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(BUCKETS[index], self.max) if index < len(BUCKETS) else self.max
+        return self.max
+
+    def summary(self) -> Summary:
+        return Summary(self.count, self.mean, self.percentile(50), self.percentile(95), self.max)
+
+
+class FrameStats:
+    """
+    Histograms of durations of frame stages.
+
+    Stages measured by the other side of the connection are kept as summaries in `remote`.
+
+    Attributes:
+        remote: The latest summaries received from the other side.
+    """
+
+    def __init__(self):
+        self.histograms: Dict[Stage, Histogram] = {stage: Histogram() for stage in Stage}
+        self.remote: Dict[Stage, Summary] = {}
+
+    def add(self, stage: Stage, ms: float) -> None:
+        """Record the duration of a stage in milliseconds."""
+        self.histograms[stage].add(ms)
+
+    @contextmanager
+    def measure(self, stage: Stage) -> Iterator[None]:
+        """Record how long the body of the `with` statement takes."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, (time.perf_counter() - start) * 1000)
+
+    def get(self, stage: Stage) -> Optional[Summary]:
+        """
+        Return the summary of a stage.
+
+        Local measurements take precedence over the summaries received from the other side.
+
+        Returns:
+            The summary or None if the stage has not been measured.
+        """
+        histogram = self.histograms[stage]
+        if histogram.count:
+            return histogram.summary()
+        return self.remote.get(stage)
+
+    def local(self) -> List[Stage]:
+        """Return stages measured on this side."""
+        return [stage for stage, histogram in self.histograms.items() if histogram.count]
+
+    def reset(self) -> None:
+        for histogram in self.histograms.values():
+            histogram.reset()
+        self.remote.clear()
+
+    def to_dict(self) -> Dict[str, dict]:
+        """Return summaries of all measured stages, e.g. for JSON output."""
+        result = {}
+        for stage in Stage:
+            summary = self.get(stage)
+            if summary is not None:
+                result[stage.name] = summary._asdict()
+        return result
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import List, Optional
+
+
+class Supervisor:
+    """
+    Run several client processes connected to the same display.
+
+    Each worker has its own interpreter, GIL, QML engine and GL context, and the server spreads views across workers
+    with its placement policy (`DODO_PLACEMENT`). A worker which exits with an error is restarted after
+    `RESTART_DELAY`. The supervisor exits when all workers have exited normally, e.g. because the server has quit,
+    or on SIGINT and SIGTERM, which it forwards to workers.
+
+    Args:
+        name: The name of the display, e.g. `default` for `dodo/default`.
+        workers: The number of worker processes.
+        args: Extra arguments of workers.
+    """
+    RESTART_DELAY = 1.0
+    POLL_INTERVAL = 0.2
+
+    def __init__(self, name: str, workers: int, args: List[str]):
+        self.name = name
+        self.args = args
+        self.workers: List[Optional[subprocess.Popen]] = [None] * workers
+        self.restart_at = [0.0] * workers
+        self.stopping = False
+
+    def spawn(self, index: int) -> subprocess.Popen:
+        print(f"Starting worker {index}.")
+        env = dict(os.environ, DODO_WORKER=str(index))
+        return subprocess.Popen([sys.executable, "-m", "dodo", self.name, *self.args], env=env)
+
+    def stop(self, signum: int = signal.SIGTERM, frame=None) -> None:
+        self.stopping = True
+        self.restart_at = [0.0] * len(self.workers)
+        for worker in self.workers:
+            if worker is not None and worker.poll() is None:
+                worker.send_signal(signum)
+
+    def run(self) -> int:
+        """Run workers until they exit, return the exit code of the last failed worker or zero."""
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        for index in range(len(self.workers)):
+            self.workers[index] = self.spawn(index)
+
+        code = 0
+        while any(worker is not None for worker in self.workers) or (not self.stopping and any(self.restart_at)):
+            time.sleep(self.POLL_INTERVAL)
+            now = time.monotonic()
+            for index, worker in enumerate(self.workers):
+                if worker is None:
+                    if not self.stopping and now >= self.restart_at[index] > 0:
+                        self.restart_at[index] = 0.0
+                        self.workers[index] = self.spawn(index)
+                    continue
+
+                status = worker.poll()
+                if status is None:
+                    continue
+                self.workers[index] = None
+                if status != 0 and not self.stopping:
+                    print(f"Worker {index} exited with {status}, restarting.")
+                    code = status
+                    self.restart_at[index] = now + self.RESTART_DELAY
+        return code
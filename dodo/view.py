@@ -1,22 +1,62 @@
-import mmap
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
 
-from OpenGL import GL
-from PySide2.QtCore import QUrl, QSize, QPointF, QPoint, Slot, QEvent, QObject
+from PySide2.QtCore import QUrl, QSize, QPointF, QPoint, Slot, QEvent, QObject, QTimer, Signal
 from PySide2.QtGui import Qt, QMouseEvent, QKeyEvent, QWheelEvent, QCursor, QFocusEvent, QEnterEvent
 from PySide2.QtQuick import QQuickItem
-from pywayland.utils import AnonymousFile
 
+from dodo.config import Config
+from dodo.connection import Connection
+from dodo.damage import DamageTracker, Rect, Scroll, clip_rects, copy_rects
 from dodo.events import MOUSE_BUTTONS, EventType, MOUSE_EVENTS, deserialize_modifiers, KEY_EVENTS, get_qt_key, \
-    WHEEL_ANGLES, FOCUS_EVENTS
-from dodo.framebuffers import TextureFramebufferController, Framebuffer
-from dodo.renderers import QmlOffscreenRenderer
-from wl_protocols.wayland import WlShm
+    WHEEL_ANGLES, FOCUS_EVENTS, Visibility
+from dodo.formats import PixelFormat, ARGB8888, XRGB8888, FORMATS
+from dodo.governor import ResolutionGovernor
+from dodo.framebuffers import TextureFramebufferController, Framebuffer, FramebufferPool
+from dodo.layers import Layer
+from dodo.readback import create_readback
+from dodo.renderers import QmlOffscreenRenderer, RenderManager
+from dodo.resources import LifecycleState
+from dodo.shm import ShmSwapchain, ShmBuffer
+from dodo.stats import FrameStats, Histogram, Stage, Summary
 
 
 class View(QObject):
-    def __init__(self, wl_display, gl_context, shm, rootItem: QQuickItem, view, surface, width, height, scale):
+    """
+    Renders a QML item into a Wayland surface.
+
+    A view either renders a whole page for a `dodo_proto_view` of the server, or it is a layer of another view,
+    which renders the content of a `Layer` item into a subsurface of the parent view (`parent` is set, `view` is
+    None). Layers follow the render scale and the visibility of their parent.
+    """
+    READBACK_POLL_INTERVAL = 2
+    GOVERNOR_INTERVAL = 500
+    # How long after a wheel event, a key press or a change of the scroll position frames are checked for scrolling.
+    SCROLL_WINDOW = 0.5
+
+    # A buffer with a new frame, its damage and scroll, emitted from the thread which has read the frame back.
+    frame_ready = Signal(object, object, object)
+    # A frame which cannot be committed, emitted from the thread which has read the frame back.
+    frame_dropped = Signal()
+
+    def __init__(
+        self, connection: Connection, gl_context, shm, rootItem: QQuickItem, view, surface, width, height, scale, config: Config,
+        render_manager: Optional[RenderManager] = None, framebuffer_pool: Optional[FramebufferPool] = None,
+        shm_formats: Optional[Set[int]] = None, requested_at: Optional[float] = None,
+        create_subsurface: Optional[Callable[[object], Optional[Tuple[object, object]]]] = None,
+        parent: Optional["View"] = None,
+    ):
         super().__init__()
-        self.wl_display = wl_display
+        self.config = config
+        self.parent_view = parent
+        self.render_manager = render_manager
+        self.framebuffer_pool = framebuffer_pool
+        # Creates a surface and its subsurface role for a parent surface, None if not supported.
+        self.create_subsurface = create_subsurface
+        # Layer items, their views and subsurfaces, and the last position of the subsurfaces.
+        self.layers: Dict[Layer, Tuple[View, object]] = {}
+        self.layer_positions: Dict[Layer, Tuple[int, int]] = {}
+        self.connection = connection
         self.gl_context = gl_context
         self.shm = shm
         self.view = view
@@ -24,29 +64,117 @@ class View(QObject):
         self.width = width
         self.height = height
         self.scale = scale
-        self.shm_data = None
-        self.buffer = None
+        self.shm_formats = shm_formats or {ARGB8888.shm_format, XRGB8888.shm_format}
+        self.format = ARGB8888
+        self.swapchain = ShmSwapchain(shm, config.swapchain_length, on_released=self.on_buffer_released)
+        self.back_buffer = None
+        self.frame_dropped = False
+        self.frame_callback = None
+        self.damage = DamageTracker(config.damage_tile_size) if config.damage_tile_size > 0 else None
         self.last_time = 0
+        self.stats = FrameStats()
+        self.frames = 0
+        self.frame_intervals = Histogram()
+        self.last_commit_time = 0.0
+        # Time to first frame: from the request of the view (`time.perf_counter`) to the first rendered frame.
+        self.requested_at = time.perf_counter() if requested_at is None else requested_at
+        self.first_frame_ms: Optional[float] = None
+        # Scroll hints (protocol version 5) let the server move pixels instead of uploading them again.
+        self.scroll_hints = (
+            config.scroll_hints and self.damage is not None and view is not None and view.version >= 5
+        )
+        self.scrolled_at = 0.0
+        self.scroll_position = None
+        self.scrolls = 0
+        self.scrolled_rows = 0
+        self.visibility = Visibility.visible
+        # Hidden views are frozen and discarded by the resource manager when memory runs out.
+        self.lifecycle_state = LifecycleState.active
+        self.buffers_released = False
+        # Memory of the view in bytes at the last accounting of the resource manager.
+        self.memory: Dict[str, int] = {}
+        # Presentation feedback (protocol version 4), times in the CLOCK_MONOTONIC domain of `time.monotonic`.
+        self.presented = 0
+        self.discarded = 0
+        self.present_latency = Histogram()
+        self.refresh_interval = 0.0
+        self.last_presentation = 0.0
+        # Dynamic resolution, the server upscales frames rendered at a lower scale. Layers follow their parent.
+        self.governor = ResolutionGovernor(config.frame_budget) if config.frame_budget and parent is None else None
+        # Live resize: the latest size from the compositor is applied when it settles or at a capped rate.
+        self.pending_size = (width, height)
+        self.last_resize_time = 0.0
+        self.resize_timer = QTimer()
+        self.resize_timer.setSingleShot(True)
+        self.resize_timer.timeout.connect(self.apply_resize)
 
         rootItem.setProperty("canvas", self)
 
-        self.controller = TextureFramebufferController()
-        self.renderer = QmlOffscreenRenderer(rootItem, self.controller)
-        self.renderer.initialize(QSize(width, height), self.gl_context)
+        self.controller = TextureFramebufferController(framebuffer_pool)
+        self.renderer = QmlOffscreenRenderer(
+            rootItem, self.controller, config.frame_callbacks, config.render_thread, self.stats, render_manager
+        )
+        # Readback happens in the thread of the GL context, which may be the render thread.
+        self.controller.texture_rendered.connect(self.on_texture_rendered, Qt.DirectConnection)
+        # Wayland requests are sent from the main thread.
+        self.frame_ready.connect(self.on_frame_ready)
+        self.frame_dropped.connect(self.on_frame_dropped)
+        self.renderer.initialize(QSize(width, height), self.gl_context, self.render_scale)
         self.renderer.cursor_changed.connect(self.on_cursor_changed)
-        self.controller.texture_rendered.connect(self.on_texture_rendered)
         self.mouse_buttons = set()
+        # Input events received in the current dispatch: [type, arguments, the number of merged events]
+        self.pending_events = []
 
-        view.dispatcher["resized"] = self.on_resized
-        view.dispatcher["rescaled"] = self.on_rescaled
-        view.dispatcher["mouse_event"] = self.on_mouse_event
-        view.dispatcher["scroll_event"] = self.on_scroll_event
-        view.dispatcher["key_event"] = self.on_key_event
-        view.dispatcher["focus_event"] = self.on_focus_event
+        self.readback = create_readback(
+            self.get_frame_destination, self.on_frame_read, config.readback_depth, self.stats, self.frame_dropped.emit
+        )
+        # Collects frames of asynchronous readback when no other frame is rendered.
+        self.readback_timer = QTimer()
+        self.readback_timer.setSingleShot(True)
+        self.readback_timer.setInterval(self.READBACK_POLL_INTERVAL)
+        self.readback_timer.timeout.connect(self.on_readback_timer, Qt.DirectConnection)
+        if self.renderer.renderThread is not None:
+            self.readback_timer.moveToThread(self.renderer.renderThread)
+        self.renderer.releaseHook = self.release_readback
+        self.renderer.nextVblank = self.next_vblank
+
+        if view is not None:
+            view.dispatcher["resized"] = self.on_resized
+            view.dispatcher["rescaled"] = self.on_rescaled
+            view.dispatcher["mouse_event"] = self.on_mouse_event
+            view.dispatcher["scroll_event"] = self.on_scroll_event
+            view.dispatcher["key_event"] = self.on_key_event
+            view.dispatcher["focus_event"] = self.on_focus_event
+            view.dispatcher["visibility"] = self.on_visibility
+
+        # Exchange of frame statistics with the server.
+        self.stats_timer = None
+        if config.stats_interval and view is not None and view.version >= 2:
+            view.dispatcher["stats"] = self.on_stats
+            view.request_stats(config.stats_interval)
+            self.stats_timer = QTimer()
+            self.stats_timer.setInterval(config.stats_interval)
+            self.stats_timer.timeout.connect(self.on_stats_timer)
+            self.stats_timer.start()
+
+        self.governor_timer = None
+        if self.governor is not None:
+            self.governor_timer = QTimer()
+            self.governor_timer.setInterval(self.GOVERNOR_INTERVAL)
+            self.governor_timer.timeout.connect(self.on_governor_timer)
+            self.governor_timer.start()
 
         self.create_buffer()
         self.redraw()
 
+    @property
+    def render_scale(self) -> float:
+        """Return the number of rendered pixels per logical pixel, lower than `scale` under load."""
+        if self.parent_view is not None:
+            # The subsurface must match the coordinates of the parent surface.
+            return self.parent_view.render_scale
+        return self.scale * (self.governor.factor if self.governor is not None else 1.0)
+
     def redraw(self, time: int = None):
         if time is None:
             time = self.last_time
@@ -58,45 +186,102 @@ class View(QObject):
     def render(self, time):
         pass
 
+    def choose_format(self) -> PixelFormat:
+        """Choose the pixel format of shm buffers according to the configuration and the compositor."""
+        fmt = FORMATS.get(self.config.shm_format)
+        if fmt is not None and fmt.shm_format in self.shm_formats:
+            return fmt
+        # The compositor can skip blending of opaque frames.
+        return XRGB8888 if self.renderer.opaque else ARGB8888
+
     def create_buffer(self):
-        if self.buffer is not None:
-            self.buffer.dropped = True
-            if self.buffer.released:
-                self.buffer.destroy()
-            self.buffer = None
-
-        width = self.scale * self.width
-        height = self.scale * self.height
-        stride = width * 4
-        size = stride * height
-
-        with AnonymousFile(size) as fd:
-            self.shm_data = mmap.mmap(
-                fd, size, prot=mmap.PROT_READ | mmap.PROT_WRITE, flags=mmap.MAP_SHARED
-            )
-            pool = self.shm.create_pool(fd, size)
-            buffer = pool.create_buffer(0, width, height, stride, WlShm.format.argb8888.value)
-            buffer.dropped = False
-            buffer.released = True
-            buffer.dispatcher["release"] = self.on_buffer_released
-            pool.destroy()
-        self.buffer = buffer
-
-    def commit(self):
-        self.surface.damage(0, 0, self.scale * self.width, self.scale * self.height)
-        self.surface.attach(self.buffer, 0, 0)
+        with self.swapchain.lock:
+            if self.back_buffer is not None:
+                self.swapchain.cancel(self.back_buffer)
+                self.back_buffer = None
+            fmt = self.choose_format()
+            if fmt != self.format:
+                print("View uses", fmt.name)
+                self.format = fmt
+            # Frames are read back at the size of the rendered framebuffer.
+            self.swapchain.resize(*self.renderer.pixelSize.toTuple(), fmt)
+            self.readback.format = fmt
+            if self.damage is not None:
+                self.damage.bytes_per_pixel = fmt.bytes_per_pixel
+                self.damage.reset()
+
+    def commit(self, buffer: ShmBuffer = None, damage: List[Rect] = None, scroll: Optional[Scroll] = None):
+        with self.swapchain.lock:
+            self._commit(buffer, damage, scroll)
+
+    def _commit(self, buffer: ShmBuffer = None, damage: List[Rect] = None, scroll: Optional[Scroll] = None):
+        if buffer is None:
+            buffer = self.back_buffer or self.swapchain.acquire()
+            self.back_buffer = None
+        if buffer is None:
+            # All buffers are held by the compositor, render again once one is released.
+            self.frame_dropped = True
+            return
+
+        if damage is None:
+            damage = [Rect(0, 0, buffer.width, buffer.height)]
+            self.swapchain.add_damage(buffer, damage)
+        requests = len(damage) + 2
+        if scroll is not None:
+            # The server moves the band within its texture before it uploads damage.
+            self.view.scroll(*scroll.rect, 0, scroll.dy)
+            self.scrolls += 1
+            self.scrolled_rows += scroll.rect.height
+            requests += 1
+        for rect in damage:
+            self.surface.damage_buffer(*rect)
+        if self.config.frame_callbacks and self.frame_callback is None:
+            # The compositor tells us when it is a good time to render the next frame.
+            self.frame_callback = self.surface.frame()
+            self.frame_callback.dispatcher["done"] = self.on_frame_done
+            requests += 1
+        requests += self.update_layer_positions()
+        if self.view is not None and self.view.version >= 4:
+            # Feedback applies to the next commit.
+            feedback = self.view.feedback()
+            feedback.user_data = time.monotonic()
+            feedback.dispatcher["presented"] = self.on_presented
+            feedback.dispatcher["discarded"] = self.on_discarded
+            requests += 1
+        self.surface.attach(buffer.wl_buffer, 0, 0)
         self.surface.commit()
-        if self.buffer is not None:
-            self.buffer.released = False
-            self.buffer.dropped = False
-        self.wl_display.flush()
+        now = time.perf_counter()
+        buffer.committed_at = now
+        if self.last_commit_time:
+            self.frame_intervals.add((now - self.last_commit_time) * 1000)
+        self.last_commit_time = now
+        self.frames += 1
+        self.swapchain.present(buffer)
+        self.connection.schedule_flush(requests)
 
     def on_resized(self, wl_view, width, height):
-        print("resize", width, height)
+        self.pending_size = (width, height)
+        if not self.config.resize_settle:
+            self.apply_resize()
+            return
+
+        interval = self.config.resize_interval
+        if interval and (time.perf_counter() - self.last_resize_time) * 1000 >= interval:
+            self.apply_resize()
+        else:
+            # Relayout at every intermediate size is expensive, the server stretches the last frame meanwhile.
+            self.resize_timer.start(self.config.resize_settle)
+
+    @Slot()
+    def apply_resize(self):
+        self.resize_timer.stop()
+        width, height = self.pending_size
         if self.width != width or self.height != height:
+            print("resize", width, height)
+            self.last_resize_time = time.perf_counter()
             self.width = width
             self.height = height
-            self.renderer.resize(QSize(width, height))
+            self.renderer.resize(QSize(width, height), self.render_scale)
             self.create_buffer()
             self.redraw()
 
@@ -104,12 +289,165 @@ class View(QObject):
         print("rescale", scale)
         if self.scale != scale:
             self.scale = scale
-            self.create_buffer()
-            self.redraw()
+            self.apply_render_scale()
+
+    def apply_render_scale(self):
+        self.renderer.resize(QSize(self.width, self.height), self.render_scale)
+        self.create_buffer()
+        self.redraw()
+        for layer_view, subsurface in self.layers.values():
+            layer_view.apply_render_scale()
+
+    def add_layer(self, layer: Layer) -> None:
+        """Render the content of a layer item into a subsurface above this view."""
+        if layer in self.layers:
+            return
+        created = self.create_subsurface(self.surface) if self.create_subsurface is not None else None
+        if created is None:
+            print("Subsurfaces are not supported, the layer is not rendered.")
+            return
+
+        surface, subsurface = created
+        # The content is updated on its own, not with the commits of the page.
+        subsurface.set_desync()
+        width, height = max(1, round(layer.width())), max(1, round(layer.height()))
+        layer_view = View(
+            self.connection, self.gl_context, self.shm, layer.content, None, surface, width, height, self.scale,
+            self.config, self.render_manager, self.framebuffer_pool, self.shm_formats, parent=self,
+        )
+        self.layers[layer] = (layer_view, subsurface)
+        if self.visibility == Visibility.hidden:
+            layer_view.on_visibility(None, self.visibility.value)
+        self.update_layer(layer)
+
+    def remove_layer(self, layer: Layer) -> None:
+        """Stop rendering a layer into its subsurface, the subsurface disappears right away."""
+        entry = self.layers.pop(layer, None)
+        if entry is None:
+            return
+        layer_view, subsurface = entry
+        self.layer_positions.pop(layer, None)
+        layer_view.release()
+        subsurface.destroy()
+        layer_view.surface.destroy()
+        self.connection.schedule_flush(2)
+
+    def update_layer(self, layer: Layer) -> None:
+        """Apply a new size or position of a layer item."""
+        entry = self.layers.get(layer)
+        if entry is None:
+            return
+        layer_view, subsurface = entry
+        layer_view.on_resized(None, max(1, round(layer.width())), max(1, round(layer.height())))
+        if self.update_layer_positions():
+            # The position of a subsurface is applied with the next commit of the parent.
+            with self.swapchain.lock:
+                self.surface.commit()
+            self.connection.schedule_flush()
+
+    def update_layer_positions(self) -> int:
+        """
+        Set new positions of subsurfaces, which take effect with the next commit of this view.
+
+        Returns:
+            The number of queued requests.
+        """
+        requests = 0
+        scale = self.render_scale
+        for layer, (layer_view, subsurface) in self.layers.items():
+            # The surface of the view is in rendered pixels, its buffer scale is one.
+            pos = layer.mapToScene(QPointF(0, 0))
+            position = (round(pos.x() * scale), round(pos.y() * scale))
+            if self.layer_positions.get(layer) != position:
+                self.layer_positions[layer] = position
+                subsurface.set_position(*position)
+                requests += 1
+        return requests
+
+    def release(self) -> None:
+        """Stop rendering and release resources of the view, e.g. of a removed layer or when the client stops."""
+        for layer in list(self.layers):
+            self.remove_layer(layer)
+        self.resize_timer.stop()
+        if self.stats_timer is not None:
+            self.stats_timer.stop()
+        if self.governor_timer is not None:
+            self.governor_timer.stop()
+        self.renderer.release()
+        with self.swapchain.lock:
+            self.back_buffer = None
+            self.swapchain.destroy()
+        if self.parent_view is None:
+            # Layer items belong to the page, the page belongs to nobody.
+            self.renderer.rootItem.deleteLater()
+
+    def release_readback(self) -> None:
+        """Stop collecting frames and release readback buffers, called in the thread of the GL context."""
+        self.readback_timer.stop()
+        self.readback.release()
+
+    @Slot()
+    def on_governor_timer(self):
+        if self.visibility != Visibility.hidden and self.governor.update(self.stats):
+            self.apply_render_scale()
+
+    def queue_event(self, type_, *args):
+        """
+        Queue an input event until the end of the current dispatch.
+
+        A mouse move directly following another mouse move replaces it, and a scroll event directly following
+        another scroll event of the same type and modifiers is merged with it. Other events are kept as they are,
+        so the order of presses, releases and keys is intact.
+        """
+        if self.pending_events:
+            last = self.pending_events[-1]
+            if last[0] == type_ == EventType.mouse_move:
+                # Only the latest pointer position matters.
+                last[1] = args
+                return
+            if last[0] == type_ and type_ in WHEEL_ANGLES and last[1][0] == args[0]:
+                modifiers, delta_x, delta_y, *position = args
+                last[1] = (modifiers, last[1][1] + delta_x, last[1][2] + delta_y, *position)
+                last[2] += 1
+                return
+        self.pending_events.append([type_, args, 1])
+
+    def deliver_events(self):
+        """Deliver queued input events to QML, called when a dispatch is finished."""
+        if not self.pending_events:
+            return
+
+        events = []
+        for type_, args, count in self.pending_events:
+            if type_ in MOUSE_EVENTS:
+                events.append(self.create_mouse_event(type_, *args))
+            elif type_ in KEY_EVENTS:
+                events.append(self.create_key_event(type_, *args))
+            elif type_ in WHEEL_ANGLES:
+                events.append(self.create_scroll_event(type_, count, *args))
+            elif type_ in FOCUS_EVENTS:
+                events.append(QFocusEvent(FOCUS_EVENTS[type_]))
+            else:
+                events.append(self.create_crossing_event(type_, *args))
+        self.pending_events = []
+        self.renderer.sendEvents(events)
+
+    def map_to_window(self, x: float, y: float) -> QPointF:
+        """Map logical coordinates from the compositor to device pixels of the rendered window."""
+        scale = self.renderer.scale
+        return QPointF(x * scale, y * scale)
 
     def on_mouse_event(
         self, wl_view, type_, mouse, modifiers, local_x, local_y, window_x, window_y, screen_x, screen_y
     ):
+        self.queue_event(type_, mouse, modifiers, local_x, local_y, window_x, window_y, screen_x, screen_y)
+
+    def mark_scrolling(self) -> None:
+        """Look for scrolled content in the frames rendered in the next `SCROLL_WINDOW` seconds."""
+        if self.scroll_hints:
+            self.scrolled_at = time.perf_counter()
+
+    def create_mouse_event(self, type_, mouse, modifiers, local_x, local_y, window_x, window_y, screen_x, screen_y):
         #print("mouse event", type_, mouse, modifiers, local_x, local_y, window_x, window_y, screen_x, screen_y)
         button = MOUSE_BUTTONS[mouse]
         if type_ == EventType.mouse_press:
@@ -123,18 +461,23 @@ class View(QObject):
 
         event = QMouseEvent(
             MOUSE_EVENTS[type_],
-            QPointF(local_x, local_y),
-            QPointF(window_x, window_y),
+            self.map_to_window(local_x, local_y),
+            self.map_to_window(window_x, window_y),
             QPointF(screen_x, screen_y),
             button,
             buttons,
             deserialize_modifiers(modifiers),
         )
-        self.renderer.sendEvent(event)
+        return event
 
     def on_key_event(
         self, wl_view, type_, name, modifiers, keyval, keycode, native_modifiers, text
     ):
+        self.queue_event(type_, name, modifiers, keyval, keycode, native_modifiers, text)
+
+    def create_key_event(self, type_, name, modifiers, keyval, keycode, native_modifiers, text):
+        # Arrows, page keys and space scroll pages.
+        self.mark_scrolling()
         print(type_, name, modifiers, keyval, keycode, native_modifiers, text)
         print(KEY_EVENTS[type_], get_qt_key(name), deserialize_modifiers(modifiers), keycode, keyval, native_modifiers, text)
         event = QKeyEvent(
@@ -146,53 +489,326 @@ class View(QObject):
             native_modifiers,
             text
         )
-        self.renderer.sendEvent(event)
+        return event
 
     def on_scroll_event(
             self, wl_view, type_, modifiers, delta_x, delta_y, local_x, local_y, window_x, window_y, screen_x, screen_y
     ):
+        self.queue_event(type_, modifiers, delta_x, delta_y, local_x, local_y, window_x, window_y, screen_x, screen_y)
+
+    def create_scroll_event(
+            self, type_, count, modifiers, delta_x, delta_y, local_x, local_y, window_x, window_y, screen_x, screen_y
+    ):
+        self.mark_scrolling()
         pixelDelta = QPoint(int(delta_x), int(delta_y)) if delta_x or delta_y else QPoint()
         buttons = Qt.NoButton
         for button in self.mouse_buttons:
             buttons |= button
         event = QWheelEvent(
-            QPointF(local_x, local_y),
+            self.map_to_window(local_x, local_y),
             QPointF(screen_x, screen_y),
             pixelDelta,
-            WHEEL_ANGLES[type_],
+            WHEEL_ANGLES[type_] * count,
             buttons,
             deserialize_modifiers(modifiers),
             Qt.NoScrollPhase,
             False
         )
-        self.renderer.sendEvent(event)
+        return event
 
     def on_crossing_event(self, wl_view, type_, local_x, local_y, window_x, window_y, screen_x, screen_y):
-        if type_ == EventType.enter:
-            event = QEnterEvent(QPointF(local_x, local_y), QPointF(window_x, window_y), QPointF(screen_x, screen_y))
-        else:
-            event = QEvent(QEvent.Leave)
+        self.queue_event(type_, local_x, local_y, window_x, window_y, screen_x, screen_y)
 
-        self.renderer.sendEvent(event)
+    def create_crossing_event(self, type_, local_x, local_y, window_x, window_y, screen_x, screen_y):
+        if type_ == EventType.enter:
+            return QEnterEvent(
+                self.map_to_window(local_x, local_y), self.map_to_window(window_x, window_y), QPointF(screen_x, screen_y)
+            )
+        return QEvent(QEvent.Leave)
 
     def on_focus_event(self, wl_view, type_):
-        event = QFocusEvent(FOCUS_EVENTS[type_])
-        self.renderer.sendEvent(event)
+        # The focused view is rendered first.
+        self.renderer.focused = type_ == EventType.focus_in
+        self.queue_event(type_)
+
+    def on_visibility(self, wl_view, state):
+        try:
+            visibility = Visibility(state)
+        except ValueError:
+            return
+
+        was_hidden = self.visibility == Visibility.hidden
+        self.visibility = visibility
+        hidden = visibility == Visibility.hidden
+        self.renderer.visible = not hidden
+        if hidden and not was_hidden:
+            self.suspend()
+        elif was_hidden and not hidden:
+            self.set_lifecycle_state(LifecycleState.active)
+            self.resume()
+        for layer_view, subsurface in self.layers.values():
+            layer_view.on_visibility(None, state)
+
+    def suspend(self):
+        """Stop rendering of a hidden view and release its buffers if configured to do so."""
+        self.renderer.suspend()
+        if self.config.release_hidden:
+            self.release_buffers()
+
+    def resume(self):
+        """Resume rendering of a view which is visible again."""
+        if self.buffers_released:
+            self.buffers_released = False
+            self.create_buffer()
+        self.renderer.resume()
+
+    def release_buffers(self):
+        """Release framebuffers, readback buffers and shm buffers of a suspended view until `resume()`."""
+        if not self.buffers_released:
+            self.buffers_released = True
+            self.renderer.suspend(True)
+            with self.swapchain.lock:
+                self.back_buffer = None
+                self.swapchain.destroy()
+                if self.damage is not None:
+                    self.damage.reset()
+            # The readback timer and GL buffers live in the render thread, if there is one.
+            self.renderer.callInRenderThread(self.release_readback)
+        for layer_view, subsurface in self.layers.values():
+            layer_view.release_buffers()
+
+    def set_lifecycle_state(self, state: LifecycleState) -> bool:
+        """
+        Freeze or discard the page of a hidden view to save memory, or make it active again.
+
+        A frozen page keeps its renderer process but runs no tasks, a discarded page releases its renderer process
+        and is reloaded when it becomes active. Buffers of the view are released in both states.
+
+        Returns:
+            False if the root item has no lifecycle state, e.g. a benchmark scene, and only buffers are released.
+        """
+        item = self.renderer.rootItem
+        supported = item.metaObject().indexOfProperty("lifecycleState") >= 0
+        if not supported:
+            # Without a page to discard, freezing the view only releases its buffers.
+            state = min(state, LifecycleState.frozen)
+        if state == self.lifecycle_state:
+            return supported
+        self.lifecycle_state = state
+        if state == LifecycleState.active:
+            if supported:
+                item.setVisible(True)
+                item.setProperty("lifecycleState", int(state))
+            return supported
+
+        self.release_buffers()
+        if supported:
+            # Chromium keeps visible pages active.
+            item.setVisible(False)
+            item.setProperty("lifecycleState", int(state))
+        return supported
+
+    @property
+    def renderer_pid(self) -> int:
+        """Return the pid of the Chromium renderer process of the page, zero if not known."""
+        pid = self.renderer.rootItem.property("renderProcessPid")
+        return pid or 0
+
+    def get_memory(self) -> Dict[str, int]:
+        """Return memory of the view and its layers in bytes, without the renderer process."""
+        memory = {
+            "framebuffers": self.renderer.framebufferBytes,
+            "readback": self.readback.nbytes,
+            "shm": self.swapchain.nbytes,
+        }
+        for layer_view, subsurface in self.layers.values():
+            for key, value in layer_view.get_memory().items():
+                memory[key] += value
+        return memory
+
+    def on_frame_done(self, callback, time: int):
+        self.frame_callback = None
+        self.last_time = time
+        self.renderer.frameDone()
+
+    def on_presented(self, feedback, tv_sec_hi, tv_sec_lo, tv_nsec, refresh, seq_hi, seq_lo, flags):
+        presented_at = ((tv_sec_hi << 32) + tv_sec_lo) + tv_nsec / 1e9
+        self.presented += 1
+        self.present_latency.add(max(0.0, presented_at - feedback.user_data) * 1000)
+        self.last_presentation = presented_at
+        if refresh:
+            self.refresh_interval = refresh / 1e9
+        feedback.destroy()  # Destroyed by the server after the event.
+
+    def on_discarded(self, feedback):
+        self.discarded += 1
+        feedback.destroy()
+
+    def next_vblank(self) -> Optional[float]:
+        """
+        Predict the next presentation time from the last presented frame.
 
-    def on_buffer_released(self, wl_buffer):
-        wl_buffer.released = True
-        if wl_buffer.dropped:
-            wl_buffer.destroy()
+        Returns:
+            The time in the domain of `time.monotonic`, or None if the refresh interval is not known yet.
+        """
+        if not self.refresh_interval or not self.last_presentation:
+            return None
+        now = time.monotonic()
+        if now <= self.last_presentation:
+            return self.last_presentation
+        intervals = (now - self.last_presentation) // self.refresh_interval + 1
+        return self.last_presentation + intervals * self.refresh_interval
+
+    def on_buffer_released(self, buffer: ShmBuffer):
+        if buffer.committed_at:
+            # The compositor releases buffers as soon as it has imported them.
+            self.stats.add(Stage.commit, (time.perf_counter() - buffer.committed_at) * 1000)
+            buffer.committed_at = 0.0
+        if self.frame_dropped:
+            self.frame_dropped = False
+            self.renderer.frameDone()
+            self.renderer.requestRender()
 
     @Slot()
     def on_texture_rendered(self, framebuffer: Framebuffer):
+        if self.visibility == Visibility.hidden:
+            # Rendered just before the view was hidden, nobody would see it.
+            self.renderer.frameDone()
+            return
         framebuffer.ctx.makeCurrent()
-        GL.glBindTexture(GL.GL_TEXTURE_2D, framebuffer.texture)
-        data = GL.glGetTexImage(GL.GL_TEXTURE_2D, 0, GL.GL_BGRA, GL.GL_UNSIGNED_BYTE)
-        self.shm_data.seek(0)
-        self.shm_data.write(data)
-        self.commit()
+        with self.swapchain.lock:
+            self.readback.start(framebuffer)
+            self.collect_frames()
+
+    def collect_frames(self):
+        self.readback.collect()
+        if self.readback.pending:
+            self.readback_timer.start()
+
+    @Slot()
+    def on_readback_timer(self):
+        with self.swapchain.lock:
+            self.collect_frames()
+
+    def get_frame_destination(self, nbytes: int) -> int:
+        if self.visibility == Visibility.hidden:
+            self.renderer.frameDone()
+            return 0
+
+        if nbytes > self.swapchain.buffer_size:
+            print(f"Frame of {nbytes} bytes does not fit into the shm buffer.")
+            self.renderer.frameDone()
+            return 0
+
+        if self.back_buffer is None:
+            self.back_buffer = self.swapchain.acquire()
+            if self.back_buffer is None:
+                self.frame_dropped = True
+                return 0
+        return self.back_buffer.address
+
+    @Slot()
+    def on_frame_dropped(self):
+        # Render again, e.g. at the new size or in the new pixel format.
+        self.renderer.frameDone()
+        self.renderer.requestRender()
+
+    def on_frame_read(self, address: int, width: int, height: int):
+        buffer = self.back_buffer or self.swapchain.acquire()
+        self.back_buffer = None
+        if buffer is None:
+            self.frame_dropped = True
+            return
+
+        if (width, height) != (buffer.width, buffer.height):
+            # Read back before a resize, it doesn't fit into buffers of the new size.
+            self.swapchain.cancel(buffer)
+            self.frame_dropped.emit()
+            return
+
+        start = time.perf_counter()
+        stride = self.format.stride(width)
+        scroll = None
+        if self.damage is not None:
+            detect_scroll = self.scroll_hints and start - self.scrolled_at < self.SCROLL_WINDOW
+            damage = self.damage.update(address, width, height, stride, detect_scroll)
+            scroll = self.damage.scroll
+            if not damage and scroll is None:
+                # Nothing has changed, don't bother the compositor. No frame callback will come either.
+                self.swapchain.cancel(buffer)
+                self.renderer.frameDone()
+                return
+        else:
+            damage = [Rect(0, 0, width, height)]
+
+        # The scrolled band has changed too, even though the server doesn't need its pixels.
+        changed = damage + [scroll.rect] if scroll is not None else damage
+        if address != buffer.address:
+            # Asynchronous readback: copy only regions in which the buffer differs from the new frame.
+            outdated = clip_rects(self.swapchain.get_outdated(buffer, changed), width, height)
+            copy_rects(buffer.address, buffer.stride, address, stride, outdated, self.format.bytes_per_pixel)
+        self.swapchain.add_damage(buffer, changed)
+        self.stats.add(Stage.shm_write, (time.perf_counter() - start) * 1000)
+        self.frame_ready.emit(buffer, damage, scroll)
+
+    @Slot()
+    def on_frame_ready(self, buffer: ShmBuffer, damage: List[Rect], scroll: Optional[Scroll]):
+        if buffer.dropped:
+            # The view has been resized since the frame was read back.
+            self.renderer.frameDone()
+            return
+        if self.scroll_hints:
+            # Smooth and kinetic scrolling keep moving the page after the last input event.
+            position = self.renderer.rootItem.property("scrollPosition")
+            if position is not None and position != self.scroll_position:
+                self.scroll_position = position
+                self.mark_scrolling()
+        self.commit(buffer, damage, scroll)
+        if self.first_frame_ms is None:
+            self.first_frame_ms = (time.perf_counter() - self.requested_at) * 1000
+            print(f"Time to first frame: {self.first_frame_ms:.1f} ms.")
+
+    def on_stats(self, wl_view, stage, count, mean, p50, p95, max_):
+        try:
+            stage = Stage(stage)
+        except ValueError:
+            return
+        self.stats.remote[stage] = Summary(count, mean / 1000, p50 / 1000, p95 / 1000, max_ / 1000)
+
+    @Slot()
+    def on_stats_timer(self):
+        stages = self.stats.local()
+        for stage in stages:
+            count, mean, p50, p95, max_ = self.stats.histograms[stage].summary()
+            self.view.report_stats(
+                stage.value, count, int(mean * 1000), int(p50 * 1000), int(p95 * 1000), int(max_ * 1000)
+            )
+        self.connection.schedule_flush(len(stages))
+
+    def get_stats(self) -> dict:
+        """Return statistics of the view, e.g. for JSON output."""
+        return {
+            "size": [self.width, self.height],
+            "scale": self.scale,
+            "render_scale": self.render_scale,
+            "readback": str(self.readback),
+            "first_frame_ms": self.first_frame_ms,
+            "frames": self.frames,
+            "frame_interval": self.frame_intervals.summary()._asdict(),
+            "presented": self.presented,
+            "discarded": self.discarded,
+            "present_latency": self.present_latency.summary()._asdict(),
+            "scrolls": self.scrolls,
+            "scrolled_rows": self.scrolled_rows,
+            "refresh_interval_ms": self.refresh_interval * 1000,
+            "lifecycle_state": self.lifecycle_state.name,
+            "memory": self.memory,
+            "stages": self.stats.to_dict(),
+            "layers": [layer_view.get_stats() for layer_view, subsurface in self.layers.values()],
+        }
 
     @Slot()
     def on_cursor_changed(self, cursor: QCursor, name: str):
-        self.view.change_cursor(name)
+        if self.view is not None:
+            self.view.change_cursor(name)
+            self.connection.schedule_flush()
@@ -7,6 +7,7 @@ from PySide2.QtGui import QGuiApplication, QSurfaceFormat, QOpenGLContext
 from PySide2.QtWebEngine import QtWebEngine
 
 from dodo.client import Client
+from dodo.config import Config
 from dodo.gl import initialize_gl
 from dodo.utils import get_data_path
 
@@ -20,13 +21,18 @@ class WebEngine:
         assert self._initialized
         self.id = id
         self.app = app
-        self.qml_view = QUrl(os.fspath(get_data_path("webview.qml")))
+        config = Config.from_environ()
+        if config.qml_view:
+            self.qml_view = QUrl.fromLocalFile(os.path.abspath(config.qml_view))
+        else:
+            # A file URL, QML files from other URLs are not cached on disk.
+            self.qml_view = QUrl.fromLocalFile(os.fspath(get_data_path("webview.qml")))
 
         gl_context = QOpenGLContext()
         gl_context.setFormat(QSurfaceFormat.defaultFormat())
         gl_context.create()
 
-        self.client = Client(id, self.qml_view, gl_context)
+        self.client = Client(id, self.qml_view, gl_context, config)
         self.client.disconnected.connect(self.on_disconnected)
         self.client.start()
 
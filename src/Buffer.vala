@@ -2,53 +2,35 @@ using GL;
 
 namespace Dodo {
 
+/**
+ * Persistent texture with the content of a surface.
+ *
+ * The texture is sized to the attached buffer and reused across commits. Only damaged regions are uploaded
+ * unless the size or the format of the attached buffer changes.
+ */
 public class Buffer : GLib.Object {
-    private uint id;
-    private unowned Wl.Buffer? wl_buffer;
-    private bool wl_buffer_released;
     private unowned Gdk.GLContext gl_context;
-    private GLuint texture;
-    public int width;
-    public int height;
-    private Listener wl_buffer_destroyed = new Listener();
-    private unowned Display display;
-
-    public Buffer(Display display, Wl.Buffer wl_buffer, Gdk.GLContext gl_context, GLuint texture, bool released, int width, int height) {
-        this.id = wl_buffer.get_id();
-        this.display = display;
-        this.wl_buffer = wl_buffer;
+    private GLuint texture = 0;
+    /** Holds moved pixels, because a texture cannot be copied to itself. */
+    private GLuint scratch_texture = 0;
+    private int scratch_width = 0;
+    private int scratch_height = 0;
+    private GLuint framebuffer = 0;
+    public int width = 0;
+    public int height = 0;
+    public uint format = 0;
+
+    public Buffer(Gdk.GLContext gl_context) {
         this.gl_context = gl_context;
-        this.texture = texture;
-        this.wl_buffer_released = released;
-        this.width = width;
-        this.height = height;
-        wl_buffer_destroyed.connect(on_wl_buffer_destroyed);
-        wl_buffer.add_destroy_listener(ref wl_buffer_destroyed.listener);
-        ref(); // Don't destroy until wl_buffer is released
     }
 
     ~Buffer() {
-        debug("~Buffer %u", id);
-        release();
+        debug("~Buffer %u", texture);
         destroy_texture();
     }
 
-    public signal void destroyed(Wl.Buffer wl_buffer);
-
-    public void release() {
-        if (wl_buffer_released || wl_buffer == null) {
-            return;
-        }
-
-        wl_buffer_released = true;
-        wl_buffer.send_release();
-        display.dispatch();
-        wl_buffer = null;
-    }
-
     public void drop() {
         destroy_texture();
-        release();
     }
 
     /** Get texture without claiming the ownership. */
@@ -56,87 +38,133 @@ public class Buffer : GLib.Object {
         return texture;
     }
 
-    /** Take texture claiming the ownership. */
-    public GLuint take_texture() {
-        GLuint taken_texture = this.texture;
-        this.texture = 0;
-        return taken_texture;
-    }
-
     public void destroy_texture() {
-        if (texture != 0) {
+        if (texture != 0 || scratch_texture != 0 || framebuffer != 0) {
             gl_context.make_current();
+        }
+        if (texture != 0) {
             glDeleteTextures(1, {texture});
             texture = 0;
         }
+        if (scratch_texture != 0) {
+            glDeleteTextures(1, {scratch_texture});
+            scratch_texture = 0;
+            scratch_width = scratch_height = 0;
+        }
+        if (framebuffer != 0) {
+            glDeleteFramebuffers(1, {framebuffer});
+            framebuffer = 0;
+        }
     }
 
-    public void update(GLuint texture, bool released, int width, int height) {
-        destroy_texture();
-        this.texture = texture;
-        this.wl_buffer_released = released;
-        this.width = width;
-        this.height = height;
-    }
+    /**
+     * Move pixels within the texture on the GPU, e.g. when the content of a view has been scrolled.
+     *
+     * Pixels are copied to a scratch texture and back, because the source and the destination may overlap.
+     *
+     * @param rect The destination in buffer coordinates.
+     * @param dx The horizontal offset from the source to the destination.
+     * @param dy The vertical offset from the source to the destination.
+     * @return The part of the destination which has been updated, empty if nothing has been moved.
+     */
+    public Rect scroll(Rect rect, int dx, int dy) {
+        // Both the source and the destination must lie within the texture.
+        int x1 = int.max(int.max(rect.x, dx), 0);
+        int y1 = int.max(int.max(rect.y, dy), 0);
+        int x2 = int.min(int.min(rect.x + rect.w, width + dx), width);
+        int y2 = int.min(int.min(rect.y + rect.h, height + dy), height);
+        if (texture == 0 || x2 <= x1 || y2 <= y1) {
+            return Rect(0, 0, 0, 0);
+        }
+        int w = x2 - x1;
+        int h = y2 - y1;
+
+        gl_context.make_current();
+        if (scratch_texture == 0 || scratch_width < w || scratch_height < h) {
+            if (scratch_texture != 0) {
+                glDeleteTextures(1, {scratch_texture});
+            }
+            scratch_texture = Textures.create(format, width, height);
+            scratch_width = width;
+            scratch_height = height;
+        }
+        if (framebuffer == 0) {
+            GLuint framebuffers[1];
+            glGenFramebuffers(1, framebuffers);
+            framebuffer = framebuffers[0];
+        }
 
-    public static bool import(Wl.Buffer wl_buffer, out GLuint texture, out bool released, out int width, out int height) {
-        texture = 0;
-        width = height = 0;
-        released = false;
+        GLint previous_framebuffer[1];
+        glGetIntegerv(GL_FRAMEBUFFER_BINDING, previous_framebuffer);
+        glBindFramebuffer(GL_FRAMEBUFFER, framebuffer);
+        glActiveTexture(GL_TEXTURE1);
+        // Source → scratch
+        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, texture, 0);
+        glBindTexture(GL_TEXTURE_2D, scratch_texture);
+        glCopyTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, x1 - dx, y1 - dy, w, h);
+        // Scratch → destination
+        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, scratch_texture, 0);
+        glBindTexture(GL_TEXTURE_2D, texture);
+        glCopyTexSubImage2D(GL_TEXTURE_2D, 0, x1, y1, 0, 0, w, h);
+        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, 0, 0);
+        glBindFramebuffer(GL_FRAMEBUFFER, (GLuint) previous_framebuffer[0]);
+        return Rect(x1, y1, w, h);
+    }
 
+    /**
+     * Upload the content of a wl_buffer to the texture.
+     *
+     * The wl_buffer is released because all data is copied.
+     *
+     * @param wl_buffer The buffer to upload.
+     * @param damage Damaged regions in buffer coordinates.
+     * @return true on success.
+     */
+    public bool import(Wl.Buffer wl_buffer, Region damage) {
         unowned Wl.ShmBuffer? shm_buffer = Wl.ShmBuffer.from_resource(wl_buffer);
-        if (shm_buffer != null) {
-            uint fmt = shm_buffer.get_format();
-            int stride = shm_buffer.get_stride();
-            width = shm_buffer.get_width();
-            height = shm_buffer.get_height();
-
-            shm_buffer.begin_access();
-            void *data = shm_buffer.get_data();
-            texture = Textures.load_from_pixels(data, fmt, width, height, stride);
-            shm_buffer.end_access();
-
-            /* We copied all data so we don't need the wl_buffer anymore.
-             * We would need hold the wl_buffer if we shared the backing
-             * store without copying, e.g. using wl_drm.
-             */
-            wl_buffer.send_release();
-            released = true;
-        } else {
+        if (shm_buffer == null) {
             critical("Cannot upload texture: unknown buffer type");
             wl_buffer.post_error(0, "unknown buffer type"); // Disconnect the client with error.
             return false;
         }
 
-        if (texture == 0) {
-            // This is our failure, don't disconnect the client.
-            critical("Failed to upload texture");
-            wl_buffer.send_release();
-            released = true;
-            return false;
+        uint fmt = shm_buffer.get_format();
+        int stride = shm_buffer.get_stride();
+        int width = shm_buffer.get_width();
+        int height = shm_buffer.get_height();
+        gl_context.make_current();
+
+        bool full_upload = texture == 0 || this.width != width || this.height != height || this.format != fmt;
+        if (full_upload) {
+            destroy_texture();
+            texture = Textures.create(fmt, width, height);
+            this.width = width;
+            this.height = height;
+            this.format = fmt;
+        } else {
+            damage.intersect(0, 0, width, height);
         }
 
-        assert(Buffer.get_size(wl_buffer, out width, out height));
-        return true;
-    }
-
-    public static bool get_size(Wl.Buffer wl_buffer, out int width, out int height) {
-        unowned Wl.ShmBuffer? shm_buffer = Wl.ShmBuffer.from_resource(wl_buffer);
-        if (shm_buffer != null) {
-            width = shm_buffer.get_width();
-            height = shm_buffer.get_height();
-            return true;
+        bool result = false;
+        if (texture != 0 && (full_upload || !damage.is_empty())) {
+            shm_buffer.begin_access();
+            result = Textures.upload(texture, shm_buffer.get_data(), fmt, width, height, stride, full_upload ? null : damage);
+            shm_buffer.end_access();
+        } else {
+            result = texture != 0;
         }
 
-        width = height = 0;
-        return false;
-    }
+        /* We copied all data so we don't need the wl_buffer anymore.
+         * We would need hold the wl_buffer if we shared the backing
+         * store without copying, e.g. using wl_drm.
+         */
+        wl_buffer.send_release();
 
-    private void on_wl_buffer_destroyed(Listener listener, void* data) {
-        listener.disconnect();
-        destroyed(wl_buffer);
-        wl_buffer = null;
-        unref();
+        if (!result) {
+            // This is our failure, don't disconnect the client.
+            critical("Failed to upload texture");
+        }
+        return result;
     }
 }
 
@@ -40,9 +40,15 @@ void main()
 public class Canvas : Gtk.GLArea {
     private const int ICON_SIZE = 256;
     private static DodoProto.ViewInterface impl = {
-        Canvas.change_cursor
+        Canvas.change_cursor,
+        Canvas.request_stats,
+        Canvas.report_stats,
+        Canvas.feedback,
+        Canvas.scroll
     };
     public uint frames_per_second {get; private set; default = 0;}
+    /** Durations of frame stages, including those reported by the client. */
+    public FrameStats stats = new FrameStats();
     public string url {get; set; default = "";}
     public uint serial;
     public uint width;
@@ -53,6 +59,7 @@ public class Canvas : Gtk.GLArea {
     public unowned Wl.Client? client;
     public unowned DodoProto.View? view;
     private GLuint gl_program = 0;
+    private GLint gl_texture_location = -1;
     private GLuint gl_element_buffer = 0;
     private GLuint gl_vertex_buffer = 0;
     private GLuint gl_vertex_array = 0;
@@ -62,8 +69,26 @@ public class Canvas : Gtk.GLArea {
     private uint frames = 0;
     private bool crashed = false;
     private uint tick_callback_id = 0;
+    /** Damage committed since the last redraw, in buffer coordinates. */
+    private Region pending_damage = new Region();
+    private PresentationQueue presentation = new PresentationQueue();
+    /** Whether the whole canvas must be redrawn, e.g. after a resize. Otherwise, only pending damage is. */
+    private bool full_redraw = true;
+    private int drawn_width = 0;
+    private int drawn_height = 0;
     private uint frames_per_second_callback_id = 0;
+    private uint stats_callback_id = 0;
     private bool last_focus_event = false;
+    private DodoProto.Visibility visibility = DodoProto.Visibility.HIDDEN;
+    private unowned Gtk.Window? toplevel_window = null;
+    private bool motion_pending = false;
+    private uint motion_modifiers = 0;
+    private double motion_local_x;
+    private double motion_local_y;
+    private double motion_window_x;
+    private double motion_window_y;
+    private double motion_screen_x;
+    private double motion_screen_y;
 
     public Gdk.RGBA background_color {
         get; set; default = Gdk.RGBA() {red = 0.1, green = 0.1, blue = 0.1, alpha = 1.0};
@@ -75,23 +100,43 @@ public class Canvas : Gtk.GLArea {
         unrealize.connect(on_unrealize);
         size_allocate.connect_after(on_size_allocate);
         notify["scale-factor"].connect_after(on_scale_factor_changed);
-        set_auto_render(true);
+        map.connect_after(on_map);
+        unmap.connect_after(on_unmap);
+        resize.connect(on_resize);
+        draw.connect(on_draw);
+        notify["background-color"].connect(on_background_color_changed);
+        // Render only after a commit or a change of allocation, GtkGLArea keeps the last frame meanwhile.
+        set_auto_render(false);
     }
 
     ~Canvas() {
+        notify["background-color"].disconnect(on_background_color_changed);
+        draw.disconnect(on_draw);
+        resize.disconnect(on_resize);
+        unmap.disconnect(on_unmap);
+        map.disconnect(on_map);
+        set_toplevel_window(null);
         notify["scale-factor"].disconnect(on_scale_factor_changed);
         size_allocate.disconnect(on_size_allocate);
         
         if (this.surface != null) {
+            this.surface.subsurfaces_changed.disconnect(on_subsurfaces_changed);
             this.surface.state_committed.disconnect(on_surface_committed);
             this.surface.set_gl_context(null);
         }
 
         if (tick_callback_id != 0) {
             remove_tick_callback(tick_callback_id);
+        }
+        presentation.discard_all();
+        if (frames_per_second_callback_id != 0) {
             Source.remove(frames_per_second_callback_id);
         }
 
+        if (stats_callback_id != 0) {
+            Source.remove(stats_callback_id);
+        }
+
         if (view != null) {
             view.send_released();
         }
@@ -104,38 +149,63 @@ public class Canvas : Gtk.GLArea {
         this.client = client;
         this.view = view;
         this.surface = surface;
+        stats.reset();
         view.set_implementation(&Canvas.impl, this, null);
         set_surface(surface);
         view.send_focus_event(last_focus_event ? DodoProto.EventType.FOCUS_IN : DodoProto.EventType.FOCUS_OUT);
+        visibility = compute_visibility();
+        if (view.get_version() >= 3) {
+            view.send_visibility(visibility);
+        }
     }
 
     public void set_surface(Surface? surface) {
         if (this.surface != null) {
+            this.surface.subsurfaces_changed.disconnect(on_subsurfaces_changed);
             this.surface.state_committed.disconnect(on_surface_committed);
             this.surface.set_gl_context(null);
+            this.surface.stats = null;
         }
 
         this.surface = surface;
 
         if (surface != null) {
+            surface.stats = stats;
             if (get_realized()) {
                 surface.set_gl_context(this.context);
             }
 
             surface.state_committed.connect(on_surface_committed);
+            surface.subsurfaces_changed.connect(on_subsurfaces_changed);
 
-            if (tick_callback_id == 0) {
-                tick_callback_id = add_tick_callback(tick_callback);
+            if (frames_per_second_callback_id == 0) {
                 frames_per_second = frames = 0;
                 frames_per_second_callback_id = Timeout.add(1000, frames_per_second_callback);
             }
-        } else if (tick_callback_id != 0) {
-            remove_tick_callback(tick_callback_id);
-            tick_callback_id = 0;
-            Source.remove(frames_per_second_callback_id);
-            frames_per_second_callback_id = 0;
+            start_ticking();
+        } else {
+            if (tick_callback_id != 0) {
+                remove_tick_callback(tick_callback_id);
+                tick_callback_id = 0;
+            }
+            presentation.discard_all();
+            if (frames_per_second_callback_id != 0) {
+                Source.remove(frames_per_second_callback_id);
+                frames_per_second_callback_id = 0;
+            }
             frames_per_second = frames = 0;
         }
+        full_redraw = true;
+        queue_render();
+    }
+
+    /**
+     * Run the tick callback on every frame of the frame clock until there is nothing to do.
+     */
+    private void start_ticking() {
+        if (tick_callback_id == 0 && surface != null) {
+            tick_callback_id = add_tick_callback(tick_callback);
+        }
     }
 
     public void update_state() {
@@ -155,10 +225,139 @@ public class Canvas : Gtk.GLArea {
             this.scale = scale;
             view.send_rescaled(scale);
         }
-        display.dispatch();
+    }
+
+    /**
+     * Tell the client when the visibility of the view changes, so that it can stop rendering a hidden view.
+     */
+    public void update_visibility() {
+        var visibility = compute_visibility();
+        if (this.visibility == visibility) {
+            return;
+        }
+
+        debug("Visibility %d → %d.", this.visibility, visibility);
+        this.visibility = visibility;
+        if (view != null && view.get_version() >= 3) {
+            view.send_visibility(visibility);
+        }
+    }
+
+    private DodoProto.Visibility compute_visibility() {
+        if (!get_mapped()) {
+            return DodoProto.Visibility.HIDDEN;
+        }
+
+        if (toplevel_window != null) {
+            Gdk.Window? window = toplevel_window.get_window();
+            if (window != null && (window.get_state() & (Gdk.WindowState.ICONIFIED | Gdk.WindowState.WITHDRAWN)) != 0) {
+                return DodoProto.Visibility.HIDDEN;
+            }
+        }
+
+        int width = get_allocated_width();
+        int height = get_allocated_height();
+        if (width <= 0 || height <= 0) {
+            return DodoProto.Visibility.HIDDEN;
+        }
+
+        // Clip by ancestors with their own windows, e.g. the viewport of a scrolled window or the toplevel.
+        int x0 = 0;
+        int y0 = 0;
+        int x1 = width;
+        int y1 = height;
+        for (unowned Gtk.Widget? ancestor = get_parent(); ancestor != null; ancestor = ancestor.get_parent()) {
+            int x;
+            int y;
+            if (!ancestor.get_has_window() || !ancestor.translate_coordinates(this, 0, 0, out x, out y)) {
+                continue;
+            }
+            x0 = int.max(x0, x);
+            y0 = int.max(y0, y);
+            x1 = int.min(x1, x + ancestor.get_allocated_width());
+            y1 = int.min(y1, y + ancestor.get_allocated_height());
+        }
+
+        if (x0 >= x1 || y0 >= y1) {
+            return DodoProto.Visibility.HIDDEN;
+        }
+        if (x0 > 0 || y0 > 0 || x1 < width || y1 < height) {
+            return DodoProto.Visibility.PARTIALLY_OCCLUDED;
+        }
+        return DodoProto.Visibility.VISIBLE;
+    }
+
+    private void set_toplevel_window(Gtk.Window? window) {
+        if (toplevel_window != null) {
+            toplevel_window.window_state_event.disconnect(on_window_state_event);
+        }
+        toplevel_window = window;
+        if (window != null) {
+            window.window_state_event.connect_after(on_window_state_event);
+        }
+    }
+
+    private void on_map() {
+        set_toplevel_window(get_toplevel() as Gtk.Window);
+        update_visibility();
+    }
+
+    private void on_unmap() {
+        set_toplevel_window(null);
+        update_visibility();
+        // Nothing will be shown until the canvas is mapped again.
+        presentation.discard_all();
+    }
+
+    private bool on_window_state_event(Gdk.EventWindowState event) {
+        update_visibility();
+        return false;
+    }
+
+    /**
+     * Queue pointer motion to be sent with the next frame.
+     *
+     * Only the latest pointer state is sent once per frame. Pending motion is sent before any other event,
+     * so that the order of events is kept.
+     */
+    public void queue_mouse_motion(uint modifiers, double local_x, double local_y, double window_x, double window_y, double screen_x, double screen_y) {
+        motion_pending = true;
+        motion_modifiers = modifiers;
+        motion_local_x = local_x;
+        motion_local_y = local_y;
+        motion_window_x = window_x;
+        motion_window_y = window_y;
+        motion_screen_x = screen_x;
+        motion_screen_y = screen_y;
+        if (surface == null) {
+            flush_mouse_motion();
+        } else {
+            // Coalesced until the next frame.
+            start_ticking();
+        }
+    }
+
+    /**
+     * Send pending pointer motion.
+     *
+     * @return true if there was pending motion.
+     */
+    public bool flush_mouse_motion() {
+        if (!motion_pending) {
+            return false;
+        }
+        motion_pending = false;
+        if (view != null) {
+            view.send_mouse_event(
+                DodoProto.EventType.MOUSE_MOVE, DodoProto.MouseButton.NONE, motion_modifiers,
+                motion_local_x, motion_local_y, motion_window_x, motion_window_y, motion_screen_x, motion_screen_y
+            );
+        }
+        return true;
     }
 
     public bool send_key_event(DodoProto.EventType type, string name, uint modifiers, uint keyval, uint keycode, uint native_modifiers, string? text) {
+        flush_mouse_motion();
         if (view != null) {
             view.send_key_event(type, name, modifiers, keyval, keycode, native_modifiers, text);
             return true;
@@ -168,7 +367,8 @@ public class Canvas : Gtk.GLArea {
     
     public bool send_focus_event(bool has_focus) {
         last_focus_event = has_focus;
-        
+        flush_mouse_motion();
+
         if (view != null) {
             view.send_focus_event(has_focus ? DodoProto.EventType.FOCUS_IN : DodoProto.EventType.FOCUS_OUT);
             return true;
@@ -177,6 +377,7 @@ public class Canvas : Gtk.GLArea {
     }
 
     public bool send_mouse_event(DodoProto.EventType type, DodoProto.MouseButton mouse, uint modifiers, double local_x, double local_y, double window_x, double window_y, double screen_x, double screen_y) {
+        flush_mouse_motion();
         if (view != null) {
             view.send_mouse_event(type, mouse, modifiers, local_x, local_y, window_x, window_y, screen_x, screen_y);
             return true;
@@ -185,6 +386,7 @@ public class Canvas : Gtk.GLArea {
     }
 
     public bool send_scroll_event(DodoProto.EventType type, uint modifiers, double delta_x, double delta_y, double local_x, double local_y, double window_x, double window_y, double screen_x, double screen_y) {
+        flush_mouse_motion();
         if (view != null) {
             view.send_scroll_event(type, modifiers, delta_x, delta_y, local_x, local_y, window_x, window_y, screen_x, screen_y);
             return true;
@@ -194,6 +396,7 @@ public class Canvas : Gtk.GLArea {
     }
 
     public bool send_crossing_event(DodoProto.EventType type, double local_x, double local_y, double window_x, double window_y, double screen_x, double screen_y) {
+        flush_mouse_motion();
         if (view != null) {
             view.send_crossing_event(type, local_x, local_y, window_x, window_y, screen_x, screen_y);
             return true;
@@ -206,21 +409,101 @@ public class Canvas : Gtk.GLArea {
         self.cursor_changed(name);
     }
 
+    private static void request_stats(Wl.Client client, DodoProto.View wl_view, uint interval) {
+        unowned Canvas? self = (Canvas) wl_view.get_user_data();
+        if (self.stats_callback_id != 0) {
+            Source.remove(self.stats_callback_id);
+            self.stats_callback_id = 0;
+        }
+        if (interval > 0) {
+            self.stats_callback_id = Timeout.add(interval, self.stats_callback);
+        }
+    }
+
+    private static void report_stats(
+        Wl.Client client, DodoProto.View wl_view, uint stage, uint count, uint mean, uint p50, uint p95, uint max
+    ) {
+        unowned Canvas? self = (Canvas) wl_view.get_user_data();
+        if (stage >= FrameStats.N_STAGES) {
+            warning("Unknown stats stage: %u.", stage);
+            return;
+        }
+        StatsSummary summary = {count, mean / 1000.0, p50 / 1000.0, p95 / 1000.0, max / 1000.0};
+        self.stats.set_remote((DodoProto.StatsStage) stage, summary);
+    }
+
+    private static void feedback(Wl.Client client, DodoProto.View wl_view, uint callback_id) {
+        unowned Canvas? self = (Canvas) wl_view.get_user_data();
+        unowned DodoProto.PresentationFeedback resource = DodoProto.PresentationFeedback.create(
+            client, ref DodoProto.presentation_feedback_interface, 1, callback_id
+        );
+        self.presentation.add(resource);
+    }
+
+    private static void scroll(
+        Wl.Client client, DodoProto.View wl_view, int x, int y, int width, int height, int dx, int dy
+    ) {
+        unowned Canvas? self = (Canvas) wl_view.get_user_data();
+        if (self.surface != null && width > 0 && height > 0) {
+            self.surface.set_pending_scroll(Rect(x, y, width, height), dx, dy);
+        }
+    }
+
+    private bool stats_callback() {
+        if (view == null) {
+            stats_callback_id = 0;
+            return Source.REMOVE;
+        }
+
+        DodoProto.StatsStage[] stages = {DodoProto.StatsStage.UPLOAD, DodoProto.StatsStage.DRAW};
+        foreach (var stage in stages) {
+            unowned Histogram histogram = stats.get_histogram(stage);
+            if (histogram.count > 0) {
+                view.send_stats(
+                    stage, histogram.count, (uint) (histogram.mean() * 1000), (uint) (histogram.percentile(50) * 1000),
+                    (uint) (histogram.percentile(95) * 1000), (uint) (histogram.max * 1000)
+                );
+            }
+        }
+        return Source.CONTINUE;
+    }
+
     private void on_size_allocate(Gtk.Allocation alloc) {
         if (resize_timeout_id != 0) {
             Source.remove(resize_timeout_id);
         }
+        full_redraw = true;
+        queue_render();
         resize_timeout_id = Timeout.add(1, () => {
             resize_timeout_id = 0;
             update_state();
+            update_visibility();
             return false;
         });
     }
 
     private void on_scale_factor_changed(GLib.Object o, ParamSpec p) {
+        full_redraw = true;
+        queue_render();
         update_state();
     }
 
+    private void on_background_color_changed(GLib.Object o, ParamSpec p) {
+        full_redraw = true;
+        queue_render();
+    }
+
+    private void on_resize(int width, int height) {
+        // GtkGLArea has allocated new buffers.
+        full_redraw = true;
+    }
+
+    private bool on_draw(Cairo.Context cr) {
+        // The canvas is exposed, e.g. scrolled into view. Ticks don't run while idle to notice that.
+        update_visibility();
+        return false;
+    }
+
     private bool frames_per_second_callback() {
         frames_per_second = frames;
         frames = 0;
@@ -228,9 +511,18 @@ public class Canvas : Gtk.GLArea {
     }
 
     private bool tick_callback() {
+        flush_mouse_motion();
+        // Scrolling of a viewport doesn't change the allocation.
+        update_visibility();
         if (surface != null) {
             surface.queue_render_frame();
         }
+        presentation.update(get_frame_clock());
+        if (surface == null || (!surface.has_frame_callbacks() && !presentation.has_rendered())) {
+            // Idle: nothing to send until the client commits or the pointer moves.
+            tick_callback_id = 0;
+            return Source.REMOVE;
+        }
         return Source.CONTINUE;
     }
 
@@ -238,11 +530,27 @@ public class Canvas : Gtk.GLArea {
 
         if (surface != null && surface.buffer != null) {
             crashed = true;
-            draw_texture(surface.buffer.get_texture(), surface.buffer.width, surface.buffer.height);
+            int64 start = GLib.get_monotonic_time();
+            unowned Buffer buffer = surface.buffer;
+            if (buffer.width != drawn_width || buffer.height != drawn_height) {
+                full_redraw = true;
+                drawn_width = buffer.width;
+                drawn_height = buffer.height;
+            }
+            draw_texture(
+                buffer.get_texture(), buffer.width, buffer.height, true,
+                Textures.is_opaque(buffer.format) || surface.is_opaque(), full_redraw ? null : pending_damage
+            );
+            stats.add_since(DodoProto.StatsStage.DRAW, start);
             frames++;
+            presentation.render(get_frame_clock().get_frame_counter());
+            start_ticking();
         } else {
-            draw_texture(0, 0, 0);
+            draw_texture(0, 0, 0, false, false, null);
+            drawn_width = drawn_height = 0;
         }
+        pending_damage.clear();
+        full_redraw = false;
         return true; // true = stop, false = continue
     }
 
@@ -315,6 +623,7 @@ public class Canvas : Gtk.GLArea {
         glLinkProgram(gl_program);
         glDeleteShader(gl_vertex_shader);
         glDeleteShader(gl_fragment_shader);
+        full_redraw = true;
 
 
         glGetProgramiv(gl_program, GL_LINK_STATUS, status);
@@ -396,6 +705,11 @@ public class Canvas : Gtk.GLArea {
             warning("Cannot load icon: %s", e.message);
         }
 
+        // The texture unit never changes.
+        glUseProgram(gl_program);
+        gl_texture_location = glGetUniformLocation(gl_program, "texture_unit");
+        glUniform1i(gl_texture_location, 1);
+
         // Finish
         glUseProgram(0);
         glBindVertexArray(0);
@@ -441,7 +755,20 @@ public class Canvas : Gtk.GLArea {
         }
     }
 
-    private void draw_texture(GLuint texture_id, int width, int height) {
+    /**
+     * Draw a texture.
+     *
+     * @param texture_id The texture to draw, or 0 to draw an icon.
+     * @param width The width of the texture.
+     * @param height The height of the texture.
+     * @param stretch Whether to stretch the texture over the whole canvas if its size doesn't match. This is
+     *     the case during live resize, when the client hasn't rendered a frame of the new size yet, and when
+     *     the client renders at a lower resolution under load.
+     * @param opaque Whether the texture has no alpha channel, so that blending can be skipped.
+     * @param damage The regions of the texture to redraw, or null to redraw the whole canvas. Only regions
+     *     of a texture drawn 1:1 can be redrawn, the rest of the canvas keeps its content from the last redraw.
+     */
+    private void draw_texture(GLuint texture_id, int width, int height, bool stretch, bool opaque, Region? damage) {
         int alloc_width = get_allocated_width();
         int alloc_height = get_allocated_height();
         
@@ -451,7 +778,6 @@ public class Canvas : Gtk.GLArea {
             (GLfloat) background_color.blue,
             (GLfloat) background_color.alpha
         );
-        glClear(GL_COLOR_BUFFER_BIT);
 
         if (texture_id == 0) {
             texture_id = crashed ? gl_texture_crashed_icon : gl_texture_loading_icon;
@@ -466,17 +792,99 @@ public class Canvas : Gtk.GLArea {
             }
         }
 
-        // Center viewport
-        glViewport((alloc_width - width) / 2, (alloc_height - height) / 2, width, height);
+        int pixel_width = alloc_width * scale_factor;
+        int pixel_height = alloc_height * scale_factor;
+        int x = 0;
+        int y = 0;
+        if (stretch && (width != pixel_width || height != pixel_height)) {
+            // Stale frame of the old size, scaled until the client catches up.
+            width = pixel_width;
+            height = pixel_height;
+            damage = null;
+        } else {
+            // Center viewport, in device pixels like the texture
+            x = (pixel_width - width) / 2;
+            y = (pixel_height - height) / 2;
+        }
+
+        if (damage == null) {
+            glClear(GL_COLOR_BUFFER_BIT);
+        } else if (damage.is_empty()) {
+            return;
+        } else {
+            // Both texture rows and damage are bottom-up like the framebuffer.
+            glEnable(GL_SCISSOR_TEST);
+            foreach (var rect in damage.rects) {
+                glScissor(x + rect.x, y + rect.y, rect.w, rect.h);
+                if (!opaque) {
+                    glClear(GL_COLOR_BUFFER_BIT);
+                }
+                draw_layers(texture_id, opaque, x, y, width, height);
+            }
+            glDisable(GL_SCISSOR_TEST);
+            return;
+        }
+
+        draw_layers(texture_id, opaque, x, y, width, height);
+    }
+
+    /**
+     * Draw a texture to a viewport, together with subsurfaces if it is the texture of the surface.
+     */
+    private void draw_layers(GLuint texture_id, bool opaque, int x, int y, int width, int height) {
+        if (surface != null && surface.buffer != null && surface.stack.length() > 1
+        && texture_id == surface.buffer.get_texture()) {
+            draw_surface_tree(surface, opaque, x, y, width, height);
+        } else {
+            glViewport(x, y, width, height);
+            draw_quad(texture_id, opaque);
+        }
+    }
+
+    /**
+     * Draw a surface and its subsurfaces in their stacking order.
+     *
+     * @param x The left edge of the surface in device pixels.
+     * @param y The bottom edge of the surface in device pixels.
+     */
+    private void draw_surface_tree(Surface surface, bool opaque, int x, int y, int width, int height) {
+        // Device pixels per surface coordinate.
+        double scale_x = (double) width / surface.get_width();
+        double scale_y = (double) height / surface.get_height();
+        foreach (unowned Surface layer in surface.stack) {
+            if (layer == surface) {
+                glViewport(x, y, width, height);
+                draw_quad(surface.buffer.get_texture(), opaque);
+                continue;
+            }
 
+            unowned Buffer? buffer = layer.buffer;
+            if (buffer == null || layer.subsurface == null) {
+                continue;
+            }
+            int layer_width = (int) Math.round(layer.get_width() * scale_x);
+            int layer_height = (int) Math.round(layer.get_height() * scale_y);
+            // The position of a subsurface is top-down, the viewport is bottom-up.
+            int layer_x = x + (int) Math.round(layer.subsurface.x * scale_x);
+            int layer_y = y + height - (int) Math.round(layer.subsurface.y * scale_y) - layer_height;
+            draw_surface_tree(
+                layer, Textures.is_opaque(buffer.format) || layer.is_opaque(),
+                layer_x, layer_y, layer_width, layer_height
+            );
+        }
+    }
+
+    private void draw_quad(GLuint texture_id, bool opaque) {
         if (texture_id != 0) {
-            glEnable(GL_BLEND);
-            glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA);
+            if (opaque) {
+                glDisable(GL_BLEND);
+            } else {
+                glEnable(GL_BLEND);
+                glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA);
+            }
             glUseProgram(gl_program);
             glActiveTexture(GL_TEXTURE1);
             glBindTexture(GL_TEXTURE_2D, texture_id);
-            GLint texture_location = glGetUniformLocation(gl_program, "texture_unit");
-            glUniform1i(texture_location, 1);
             glBindVertexArray(gl_vertex_array);
             glDrawElements(GL_TRIANGLES, 6, GL_UNSIGNED_INT, (void*) 0);
             glUseProgram(0);
@@ -484,9 +892,32 @@ public class Canvas : Gtk.GLArea {
         }
     }
 
-    private void on_surface_committed(Surface surface) {
+    private void on_subsurfaces_changed(Region? damage) {
+        if (surface.has_frame_callbacks()) {
+            start_ticking();
+        }
+        if (damage == null) {
+            full_redraw = true;
+        } else {
+            pending_damage.add_region(damage);
+        }
         queue_render();
     }
+
+    private void on_surface_committed(Surface surface) {
+        if (surface.has_new_content()) {
+            // Feedback of the frame in flight is kept over commits which don't replace it.
+            presentation.commit();
+        }
+        if (surface.has_frame_callbacks()) {
+            start_ticking();
+        }
+        unowned Region? damage = surface.get_committed_damage();
+        if (damage != null) {
+            pending_damage.add_region(damage);
+            queue_render();
+        }
+    }
 }
 
 } // namespace Nuvola
@@ -6,7 +6,8 @@ public class Compositor : GLib.Object{
         Compositor.create_surface,
         Compositor.create_region
     };
-    private HashTable<void*, Surface> surfaces;
+    // Surface ids are allocated by clients, so they are unique only per client.
+    private HashTable<unowned Wl.Client, HashTable<void*, Surface>> surfaces;
     public Wl.Global glob;
     private unowned Display display;
     private HashTable<unowned Wl.Client, unowned Wl.Compositor> bound;
@@ -14,7 +15,7 @@ public class Compositor : GLib.Object{
     public Compositor(Display display) {
         this.display = display;
         bound = new HashTable<unowned Wl.Client, unowned Wl.Compositor>(direct_hash, direct_equal);
-        surfaces = new HashTable<void*, Surface>(direct_hash, direct_equal);
+        surfaces = new HashTable<unowned Wl.Client, HashTable<void*, Surface>>(direct_hash, direct_equal);
         glob = new Wl.Global(display.wl_display, ref Wl.compositor_interface, COMPOSITOR_VERSION, this, Compositor.bind);
         display.client_destroyed.connect(on_client_destroyed);
 
@@ -27,8 +28,9 @@ public class Compositor : GLib.Object{
     public signal void surface_created(Surface surface);
     public signal void surface_destroyed(Surface surface);
 
-    public Surface? get_surface(uint id) {
-        return surfaces[id.to_pointer()];
+    public Surface? get_surface(Wl.Client client, uint id) {
+        unowned HashTable<void*, Surface>? client_surfaces = surfaces[client];
+        return client_surfaces != null ? client_surfaces[id.to_pointer()] : null;
     }
 
     private static void bind(Wl.Client client, void *data, uint version, uint id) {
@@ -47,23 +49,34 @@ public class Compositor : GLib.Object{
         debug("%s: Create surface id=%u.", Utils.client_info(client), id);
         unowned Compositor self = (Compositor) resource.get_user_data();
         var surface = new Surface(self.display, client, resource.get_version(), id);
-        self.surfaces[surface.id.to_pointer()] = surface;
+        unowned HashTable<void*, Surface>? client_surfaces = self.surfaces[client];
+        if (client_surfaces == null) {
+            self.surfaces[client] = new HashTable<void*, Surface>(direct_hash, direct_equal);
+            client_surfaces = self.surfaces[client];
+        }
+        client_surfaces[surface.id.to_pointer()] = surface;
         self.surface_created(surface);
         surface.destroyed.connect(self.on_surface_destroyed);
     }
 
-    private static void create_region(Wl.Client client, Wl.Resource resource, uint id) {}
+    private static void create_region(Wl.Client client, Wl.Resource resource, uint id) {
+        new RegionResource(client, resource.get_version(), id);
+    }
 
     private void on_client_destroyed(Wl.Client client) {
         if (client in bound) {
             bound.remove(client);
         }
+        surfaces.remove(client);
     }
 
     private void on_surface_destroyed(Surface surface) {
         surface.destroyed.disconnect(on_surface_destroyed);
         surface_destroyed(surface);
-        surfaces.remove(surface.id.to_pointer());
+        unowned HashTable<void*, Surface>? client_surfaces = surfaces[surface.client];
+        if (client_surfaces != null) {
+            client_surfaces.remove(surface.id.to_pointer());
+        }
     }
 }
 
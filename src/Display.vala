@@ -4,14 +4,25 @@ public class Display: GLib.Object {
     public Wl.Display? wl_display;
     public Embedder? embedder;
     public Compositor? compositor;
+    public Subcompositor? subcompositor;
     private unowned Wl.EventLoop loop;
     private unowned MainContext? context;
     private uint context_source_id;
+    private uint flush_source_id = 0;
+    private uint rate_source_id = 0;
+    private Wl.ProtocolLogger? protocol_logger = null;
+    private uint requests = 0;
+    private uint events = 0;
+    private uint flushes = 0;
     private Listener display_destroyed = new Listener();
     private Listener client_created_listenet = new Listener();
 
     private HashTable<unowned Wl.Client, Listener> clients;
 
+    public uint requests_per_second {get; private set; default = 0;}
+    public uint events_per_second {get; private set; default = 0;}
+    public uint flushes_per_second {get; private set; default = 0;}
+
     public Display(owned Wl.Display wl_display) {
         clients = new HashTable<unowned Wl.Client, Listener>(direct_hash, direct_equal);
         display_destroyed.connect(on_display_destroyed);
@@ -19,6 +30,7 @@ public class Display: GLib.Object {
         client_created_listenet.connect(on_client_created);
         wl_display.add_client_created_listener(ref client_created_listenet.listener);
         this.loop = wl_display.get_event_loop();
+        protocol_logger = wl_display.add_protocol_logger(on_protocol_message);
         this.wl_display = (owned) wl_display;
     }
 
@@ -30,21 +42,76 @@ public class Display: GLib.Object {
     public signal void client_created(Wl.Client client);
     public signal void client_destroyed(Wl.Client client);
 
+    /**
+     * Dispatch requests of clients.
+     *
+     * Events sent in response are flushed later, see {@link flush}.
+     */
     public bool dispatch() {
         if (wl_display == null) {
             return false;
         }
 
         loop.dispatch(0);
-        wl_display.flush_clients();
         return true;
     }
 
+    /**
+     * Schedule a flush of queued events to clients.
+     *
+     * Events are queued and flushed once per main loop iteration rather than with a syscall per event.
+     * This is done automatically for every event sent, so it is rarely necessary to call this method.
+     */
+    public void flush() {
+        // Nothing to schedule with before attaching to a main context and after quitting.
+        if (flush_source_id == 0 && wl_display != null && context != null) {
+            var source = new IdleSource();
+            // Run before redraws and other idle callbacks of the next iteration.
+            source.set_priority(Priority.HIGH);
+            source.set_callback(flush_callback);
+            flush_source_id = source.attach(context);
+        }
+    }
+
+    private bool flush_callback() {
+        flush_source_id = 0;
+        if (wl_display != null) {
+            wl_display.flush_clients();
+            flushes++;
+        }
+        return Source.REMOVE;
+    }
+
+    private void on_protocol_message(Wl.ProtocolLoggerType direction, void* message) {
+        if (direction == Wl.ProtocolLoggerType.EVENT) {
+            events++;
+            flush();
+        } else {
+            requests++;
+        }
+    }
+
+    private bool rate_callback() {
+        if (requests > 0 || events > 0) {
+            debug("Wire: %u requests/s, %u events/s, %u flushes/s.", requests, events, flushes);
+        }
+        requests_per_second = requests;
+        events_per_second = events;
+        flushes_per_second = flushes;
+        requests = events = flushes = 0;
+        return Source.CONTINUE;
+    }
+
     public void attach(MainContext context) {
         if (this.context != null) {
             this.context.find_source_by_id(context_source_id).destroy();
         }
         this.context = context;
+        if (rate_source_id == 0) {
+            var timeout = new TimeoutSource(1000);
+            timeout.set_callback(rate_callback);
+            rate_source_id = timeout.attach(context);
+        }
 
         var source = new IOSource(
             new IOChannel.unix_new(loop.get_fd()),
@@ -60,6 +127,14 @@ public class Display: GLib.Object {
     public void quit() {
         if (context != null) {
             context.find_source_by_id(context_source_id).destroy();
+            if (rate_source_id != 0) {
+                context.find_source_by_id(rate_source_id).destroy();
+                rate_source_id = 0;
+            }
+            if (flush_source_id != 0) {
+                context.find_source_by_id(flush_source_id).destroy();
+                flush_source_id = 0;
+            }
             context = null;
         }
 
@@ -67,6 +142,8 @@ public class Display: GLib.Object {
             loop.dispatch(0);
             wl_display.flush_clients();
             wl_display.destroy_clients();
+            // Loggers are not freed with the display.
+            protocol_logger = null;
             wl_display = null;
         }
     }
@@ -81,6 +158,7 @@ public class Display: GLib.Object {
 
     public void init_compositor() {
         compositor = new Compositor(this);
+        subcompositor = new Subcompositor(this);
     }
 
     private void on_display_destroyed(Listener listener, void* data) {
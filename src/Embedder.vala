@@ -1,7 +1,7 @@
 namespace Dodo {
 
 public class Embedder : GLib.Object {
-    private const int VERSION = 1;
+    private const int VERSION = 5;
     private static DodoProto.EmbedderInterface impl = {
         Embedder.pong,
         Embedder.create_view
@@ -10,8 +10,10 @@ public class Embedder : GLib.Object {
     private unowned Display display;
     private HashTable<unowned Wl.Client, unowned DodoProto.Embedder> bound;
     private List<unowned Canvas> canvas_requests;
-    private unowned Wl.Client? client;
+    private List<unowned Canvas> canvases;
     private Compositor compositor;
+    /** Decides which client renders a new canvas. */
+    public PlacementPolicy placement = new LeastLoadedPlacement();
 
 
     public Embedder(Display display, Compositor compositor) {
@@ -42,23 +44,52 @@ public class Embedder : GLib.Object {
      * Add a new canvas for rendering.
      *
      * You must hold the reference to canvas it it will be destroyed.
+     *
+     * @param url The page to load, set before the canvas is placed, so that placement can use its origin.
      */
-    public Canvas create_canvas() {
+    public Canvas create_canvas(string url = "") {
         var canvas = new Canvas(display);
+        canvas.url = url;
         canvas.weak_ref(on_canvas_destroyed);
         canvas_requests.prepend(canvas);
-        if (client != null) {
-            request_canvas(canvas);
-        }
+        request_canvas(canvas);
         return canvas;
     }
 
     private void on_canvas_destroyed(GLib.Object object) {
         canvas_requests.remove((Canvas) object);
+        canvases.remove((Canvas) object);
+    }
+
+    /**
+     * Return bound clients and the numbers of canvases they render or have been asked to render.
+     */
+    public HashTable<unowned Wl.Client, uint> get_load() {
+        var load = new HashTable<unowned Wl.Client, uint>(direct_hash, direct_equal);
+        foreach (unowned Wl.Client client in bound.get_keys()) {
+            load[client] = 0;
+        }
+        foreach (unowned Canvas canvas in canvas_requests) {
+            if (canvas.client != null && canvas.client in load) {
+                load[canvas.client] = load[canvas.client] + 1;
+            }
+        }
+        foreach (unowned Canvas canvas in canvases) {
+            if (canvas.client != null && canvas.client in load) {
+                load[canvas.client] = load[canvas.client] + 1;
+            }
+        }
+        return load;
     }
 
     private void request_canvas(Canvas canvas) {
+        unowned Wl.Client? client = placement.place(canvas, get_load());
+        if (client == null) {
+            debug("No client for canvas yet.");
+            return;
+        }
         debug("Request canvas %s.", Utils.client_info(client));
+        canvas.client = client;
         uint width = (uint) canvas.get_allocated_width();
         uint height = (uint) canvas.get_allocated_height();
         uint scale = (uint) canvas.scale_factor;
@@ -79,12 +110,9 @@ public class Embedder : GLib.Object {
         wl_embedder.set_implementation(&Embedder.impl, self, null);
         self.bound[client] = wl_embedder;
 
-        if (self.client == null) {
-            self.client = client;
-            foreach (unowned Canvas canvas in self.canvas_requests) {
-                if (canvas.client == null) {
-                    self.request_canvas(canvas);
-                }
+        foreach (unowned Canvas canvas in self.canvas_requests) {
+            if (canvas.client == null) {
+                self.request_canvas(canvas);
             }
         }
     }
@@ -105,7 +133,7 @@ public class Embedder : GLib.Object {
             canvas = new Canvas(self.display);
         } else {
             foreach (unowned Canvas candidate in self.canvas_requests) {
-                if (candidate.serial == serial) {
+                if (candidate.serial == serial && candidate.client == client) {
                     debug("Found serial %u", serial);
                     canvas = candidate;
                     self.canvas_requests.remove(candidate);
@@ -120,8 +148,14 @@ public class Embedder : GLib.Object {
         }
 
          
-        unowned DodoProto.View wl_view = DodoProto.View.create(client, ref DodoProto.view_interface, VERSION, view_id);
-        canvas.attach_view(client, wl_view, self.compositor.get_surface(surface.get_id()));
+        unowned DodoProto.View wl_view = DodoProto.View.create(client, ref DodoProto.view_interface, wl_embedder.get_version(), view_id);
+        canvas.attach_view(client, wl_view, self.compositor.get_surface(client, surface.get_id()));
+        if (self.canvases.find(canvas) == null) {
+            if (serial == 0) {
+                canvas.weak_ref(self.on_canvas_destroyed);
+            }
+            self.canvases.prepend(canvas);
+        }
         canvas.width = width;
         canvas.height = height;
         canvas.scale = scale;
@@ -138,13 +172,17 @@ public class Embedder : GLib.Object {
     private void on_client_destroyed(Wl.Client client) {
         if (client in bound) {
             bound.remove(client);
-            if (this.client == client) {
-                List<unowned Wl.Client>? candidates =  bound.get_keys();
-                if (candidates == null) {
-                    this.client = null;
-                } else {
-                    this.client = candidates.data;
+            placement.client_removed(client);
+
+            var orphans = new List<unowned Canvas>();
+            unowned List<unowned Canvas> link = canvases;
+            while (link != null) {
+                unowned List<unowned Canvas> next = link.next;
+                if (link.data.client == client) {
+                    orphans.prepend(link.data);
+                    canvases.delete_link(link);
                 }
+                link = next;
             }
 
             foreach (unowned Canvas canvas in canvas_requests) {
@@ -152,12 +190,20 @@ public class Embedder : GLib.Object {
                     canvas.serial = 0;
                     canvas.client = null;
                     canvas.surface = null;
-
-                    if (this.client != null) {
-                        request_canvas(canvas);
-                    }
+                    request_canvas(canvas);
                 }
             }
+
+            // Canvases of a crashed client are rendered again by another client or the restarted one.
+            foreach (unowned Canvas canvas in orphans) {
+                debug("Request canvas of destroyed %s again.", Utils.client_info(client));
+                canvas.serial = 0;
+                canvas.client = null;
+                canvas.view = null; // Destroyed with the client.
+                canvas.set_surface(null);
+                canvas_requests.prepend(canvas);
+                request_canvas(canvas);
+            }
         }
     }
 
@@ -170,7 +216,6 @@ public class Embedder : GLib.Object {
             debug("Ping for %s: %u.", Utils.client_info(client), serial);
             embedder.send_ping(serial);
         }
-        display.dispatch();
     }
 }
 
@@ -5,6 +5,8 @@ void main(string[] args) {
     var wl_display = new Wl.Display();
     assert(wl_display != null);
     wl_display.init_shm();
+    // ARGB8888 and XRGB8888 are always supported, RGB565 halves the traffic of clients which ask for it.
+    wl_display.add_shm_format(Wl.ShmFormat.RGB565);
 
     unowned string? wayland_socket = Environment.get_variable("DODO_DISPLAY");
     if (wayland_socket == null) {
@@ -16,10 +18,25 @@ void main(string[] args) {
     display.attach(MainContext.ref_thread_default());
     display.init_compositor();
     display.init_embedder();
+    display.embedder.placement = PlacementPolicy.from_name(Environment.get_variable("DODO_PLACEMENT"));
+
+    int width = 400;
+    int height = 300;
+    unowned string? size = Environment.get_variable("DODO_SIZE");
+    if (size != null && size.scanf("%dx%d", out width, out height) != 2) {
+        warning("Invalid DODO_SIZE: %s", size);
+        width = 400;
+        height = 300;
+    }
+
+    unowned string? url = Environment.get_variable("DODO_URL");
+    if (url == null) {
+        url = "https://bitmovin.com/demos/drm";
+    }
 
     var window = new Gtk.Window();
     window.title = "DodoWebEngine for Nuvola Player";
-    window.set_default_size(400, 300);
+    window.set_default_size(width, height);
     window.show_all();
 
     window.delete_event.connect(() => {
@@ -35,8 +52,7 @@ void main(string[] args) {
         w.show_all();
     });
 
-    var canvas = display.embedder.create_canvas();
-    canvas.url = "https://bitmovin.com/demos/drm";
+    var canvas = display.embedder.create_canvas(url);
     var view = new View(canvas);
     view.show();
     window.add(view);
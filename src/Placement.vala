@@ -0,0 +1,111 @@
+namespace Dodo {
+
+/**
+ * Decides which of the bound clients renders a canvas.
+ */
+public interface PlacementPolicy : GLib.Object {
+    /**
+     * Choose a client for a canvas.
+     *
+     * @param canvas The canvas to place.
+     * @param load Bound clients and the numbers of canvases they render or have been asked to render.
+     * @return The client to render the canvas, null if there is no client.
+     */
+    public abstract unowned Wl.Client? place(Canvas canvas, HashTable<unowned Wl.Client, uint> load);
+
+    /**
+     * Forget a client which has been disconnected.
+     */
+    public virtual void client_removed(Wl.Client client) {
+    }
+
+    /**
+     * Create a policy from its name, e.g. from the `DODO_PLACEMENT` environment variable.
+     *
+     * @param name `least-loaded` or `origin`.
+     * @return The policy, or the least loaded policy for an unknown name.
+     */
+    public static PlacementPolicy from_name(string? name) {
+        switch (name) {
+        case null:
+        case "":
+        case "least-loaded":
+            return new LeastLoadedPlacement();
+        case "origin":
+            return new OriginPlacement();
+        default:
+            warning("Unknown placement policy: %s.", name);
+            return new LeastLoadedPlacement();
+        }
+    }
+
+    /**
+     * Return the client with the lowest number of canvases.
+     */
+    public static unowned Wl.Client? least_loaded(HashTable<unowned Wl.Client, uint> load) {
+        unowned Wl.Client? result = null;
+        uint lowest = uint.MAX;
+        var iter = HashTableIter<unowned Wl.Client, uint>(load);
+        unowned Wl.Client client;
+        uint count;
+        while (iter.next(out client, out count)) {
+            if (count < lowest) {
+                result = client;
+                lowest = count;
+            }
+        }
+        return result;
+    }
+}
+
+/**
+ * Spread canvases evenly across clients.
+ */
+public class LeastLoadedPlacement : GLib.Object, PlacementPolicy {
+    public unowned Wl.Client? place(Canvas canvas, HashTable<unowned Wl.Client, uint> load) {
+        return PlacementPolicy.least_loaded(load);
+    }
+}
+
+/**
+ * Keep canvases of the same origin in the same client, so that they share its caches and processes.
+ *
+ * A new origin goes to the least loaded client.
+ */
+public class OriginPlacement : GLib.Object, PlacementPolicy {
+    private HashTable<string, unowned Wl.Client> origins;
+
+    public OriginPlacement() {
+        origins = new HashTable<string, unowned Wl.Client>(str_hash, str_equal);
+    }
+
+    public unowned Wl.Client? place(Canvas canvas, HashTable<unowned Wl.Client, uint> load) {
+        string origin = get_origin(canvas.url);
+        unowned Wl.Client? client = origins[origin];
+        if (client == null || !(client in load)) {
+            client = PlacementPolicy.least_loaded(load);
+            if (client != null) {
+                origins[origin] = client;
+            }
+        }
+        return client;
+    }
+
+    public void client_removed(Wl.Client client) {
+        origins.foreach_remove((origin, candidate) => candidate == client);
+    }
+
+    /**
+     * Return the scheme, the host and the port of a URL.
+     */
+    public static string get_origin(string url) {
+        int start = url.index_of("://");
+        if (start < 0) {
+            return url;
+        }
+        int end = url.index_of_char('/', start + 3);
+        return end < 0 ? url : url.substring(0, end);
+    }
+}
+
+} // namespace Dodo
@@ -0,0 +1,143 @@
+namespace Dodo {
+
+/**
+ * Presentation feedback objects of a view, from the request to the presented or discarded event.
+ *
+ * A feedback object is pending until the next commit of the surface, committed until the canvas renders the commit,
+ * and rendered until the frame clock reports when the frame was shown. Times of GDK frame clock are in the
+ * CLOCK_MONOTONIC domain of `GLib.get_monotonic_time`, like those of wp_presentation.
+ */
+public class PresentationQueue {
+    // Give up on reported times after this number of frames and send the predicted time instead.
+    private const int64 MAX_FRAMES_BEHIND = 3;
+    private List<PresentationEntry> entries = new List<PresentationEntry>();
+
+    /**
+     * Add a new feedback object for the next commit.
+     */
+    public void add(DodoProto.PresentationFeedback resource) {
+        var entry = new PresentationEntry(resource);
+        resource.set_implementation(null, this, PresentationQueue.on_resource_destroyed);
+        entries.append(entry);
+    }
+
+    /**
+     * The surface has been committed: its new content replaces the content nobody has seen yet.
+     */
+    public void commit() {
+        foreach (unowned PresentationEntry entry in entries.copy()) {
+            if (entry.state == PresentationState.COMMITTED) {
+                entry.resource.send_discarded();
+                entry.resource.destroy();
+            }
+        }
+        foreach (unowned PresentationEntry entry in entries) {
+            if (entry.state == PresentationState.PENDING) {
+                entry.state = PresentationState.COMMITTED;
+            }
+        }
+    }
+
+    /**
+     * The committed content has been drawn in a frame.
+     *
+     * @param frame_counter The frame counter of the frame clock.
+     */
+    public void render(int64 frame_counter) {
+        foreach (unowned PresentationEntry entry in entries) {
+            if (entry.state == PresentationState.COMMITTED) {
+                entry.state = PresentationState.RENDERED;
+                entry.frame_counter = frame_counter;
+            }
+        }
+    }
+
+    /**
+     * Send presented events for frames the frame clock knows the presentation time of.
+     */
+    public void update(Gdk.FrameClock clock) {
+        int64 current = clock.get_frame_counter();
+        foreach (unowned PresentationEntry entry in entries.copy()) {
+            if (entry.state != PresentationState.RENDERED || entry.frame_counter >= current) {
+                continue;
+            }
+
+            unowned Gdk.FrameTimings? timings = clock.get_timings(entry.frame_counter);
+            if (timings != null && timings.get_complete() && timings.get_presentation_time() != 0) {
+                send_presented(
+                    entry, timings.get_presentation_time(), timings.get_refresh_interval(),
+                    DodoProto.PresentationKind.VSYNC | DodoProto.PresentationKind.HW_COMPLETION
+                );
+            } else if (timings == null || current - entry.frame_counter > MAX_FRAMES_BEHIND) {
+                // The window system doesn't report presentation times, e.g. without a compositor.
+                int64 refresh_interval;
+                int64 presentation_time;
+                clock.get_refresh_info(clock.get_frame_time(), out refresh_interval, out presentation_time);
+                if (timings != null && timings.get_predicted_presentation_time() != 0) {
+                    presentation_time = timings.get_predicted_presentation_time();
+                }
+                send_presented(entry, presentation_time, refresh_interval, 0);
+            }
+        }
+    }
+
+    /**
+     * Discard all feedback objects, e.g. when the view is hidden or loses its surface.
+     */
+    public void discard_all() {
+        foreach (unowned PresentationEntry entry in entries.copy()) {
+            entry.resource.send_discarded();
+            entry.resource.destroy();
+        }
+    }
+
+    /**
+     * Whether there are rendered frames waiting for their presentation time.
+     */
+    public bool has_rendered() {
+        foreach (unowned PresentationEntry entry in entries) {
+            if (entry.state == PresentationState.RENDERED) {
+                return true;
+            }
+        }
+        return false;
+    }
+
+    private void send_presented(PresentationEntry entry, int64 time_usec, int64 refresh_usec, uint flags) {
+        uint64 sec = (uint64) (time_usec / 1000000);
+        uint64 seq = (uint64) entry.frame_counter;
+        entry.resource.send_presented(
+            (uint) (sec >> 32), (uint) sec, (uint) (time_usec % 1000000 * 1000), (uint) (refresh_usec * 1000),
+            (uint) (seq >> 32), (uint) seq, flags
+        );
+        entry.resource.destroy();
+    }
+
+    private static void on_resource_destroyed(Wl.Resource? resource) {
+        unowned PresentationQueue self = (PresentationQueue) resource.get_user_data();
+        foreach (unowned PresentationEntry entry in self.entries) {
+            if (entry.resource == resource) {
+                self.entries.remove(entry);
+                break;
+            }
+        }
+    }
+}
+
+private enum PresentationState {
+    PENDING,
+    COMMITTED,
+    RENDERED;
+}
+
+private class PresentationEntry {
+    public unowned DodoProto.PresentationFeedback resource;
+    public PresentationState state = PresentationState.PENDING;
+    public int64 frame_counter = 0;
+
+    public PresentationEntry(DodoProto.PresentationFeedback resource) {
+        this.resource = resource;
+    }
+}
+
+} // namespace Dodo
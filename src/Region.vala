@@ -0,0 +1,82 @@
+namespace Dodo {
+
+/**
+ * A region made of a short list of rectangles.
+ *
+ * Rectangles which overlap or touch are merged into their bounding box. If there are too many rectangles,
+ * the region collapses to its extents.
+ */
+public class Region {
+    private const int MAX_RECTS = 16;
+    public Rect[] rects = {};
+
+    public Region() {
+    }
+
+    public bool is_empty() {
+        return rects.length == 0;
+    }
+
+    public void clear() {
+        rects = {};
+    }
+
+    public void add(int x, int y, int width, int height) {
+        if (width <= 0 || height <= 0) {
+            return;
+        }
+
+        var rect = Rect(x, y, width, height);
+        bool merged = true;
+        // A merged rectangle may touch rectangles it didn't touch before.
+        while (merged) {
+            merged = false;
+            Rect[] others = {};
+            foreach (var other in rects) {
+                if (rect.touches(other)) {
+                    rect.expand(other.x, other.y, other.w, other.h);
+                    merged = true;
+                } else {
+                    others += other;
+                }
+            }
+            rects = others;
+        }
+
+        rects += rect;
+        if (rects.length > MAX_RECTS) {
+            rects = {get_extents()};
+        }
+    }
+
+    public void add_region(Region region) {
+        foreach (var rect in region.rects) {
+            add(rect.x, rect.y, rect.w, rect.h);
+        }
+    }
+
+    /** Clip the region to the given rectangle. */
+    public void intersect(int x, int y, int width, int height) {
+        Rect[] result = {};
+        foreach (var rect in rects) {
+            int x1 = int.max(rect.x, x);
+            int y1 = int.max(rect.y, y);
+            int x2 = int.min(rect.x + rect.w, x + width);
+            int y2 = int.min(rect.y + rect.h, y + height);
+            if (x2 > x1 && y2 > y1) {
+                result += Rect(x1, y1, x2 - x1, y2 - y1);
+            }
+        }
+        rects = result;
+    }
+
+    public Rect get_extents() {
+        var extents = Rect(-1, -1, -1, -1);
+        foreach (var rect in rects) {
+            extents.expand(rect.x, rect.y, rect.w, rect.h);
+        }
+        return extents;
+    }
+}
+
+} // namespace Dodo
@@ -0,0 +1,54 @@
+namespace Dodo {
+
+/**
+ * A wl_region resource.
+ *
+ * Rectangles are kept as the client added them. Subtraction is approximated by dropping rectangles which overlap
+ * the subtracted one, so the region is never larger than the client asked for. That is enough for opaque regions,
+ * which are only an optimization hint.
+ */
+public class RegionResource : GLib.Object {
+    private static Wl.RegionInterface impl = {
+        RegionResource.destroy,
+        RegionResource.add,
+        RegionResource.subtract
+    };
+    public Rect[] rects = {};
+
+    public RegionResource(Wl.Client client, int version, uint id) {
+        unowned Wl.Region wl_region = Wl.Region.create(client, ref Wl.region_interface, version, id);
+        wl_region.set_implementation(&RegionResource.impl, this, RegionResource.on_wl_region_destroyed);
+        ref(); // Do not destroy until wl_region is destroyed
+    }
+
+    public static unowned RegionResource from_resource(Wl.Resource resource) {
+        return (RegionResource) resource.get_user_data();
+    }
+
+    private static void on_wl_region_destroyed(Wl.Resource? resource) {
+        from_resource(resource).unref();
+    }
+
+    private static void destroy(Wl.Client client, Wl.Region wl_region) {
+        wl_region.destroy();
+    }
+
+    private static void add(Wl.Client client, Wl.Region wl_region, int x, int y, int width, int height) {
+        if (width > 0 && height > 0) {
+            from_resource(wl_region).rects += Rect(x, y, width, height);
+        }
+    }
+
+    private static void subtract(Wl.Client client, Wl.Region wl_region, int x, int y, int width, int height) {
+        unowned RegionResource self = from_resource(wl_region);
+        Rect[] result = {};
+        foreach (var rect in self.rects) {
+            if (rect.x >= x + width || x >= rect.x + rect.w || rect.y >= y + height || y >= rect.y + rect.h) {
+                result += rect;
+            }
+        }
+        self.rects = result;
+    }
+}
+
+} // namespace Dodo
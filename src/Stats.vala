@@ -0,0 +1,147 @@
+namespace Dodo {
+
+/**
+ * Summary of a histogram, times in milliseconds.
+ */
+public struct StatsSummary {
+    public uint count;
+    public double mean;
+    public double p50;
+    public double p95;
+    public double max;
+}
+
+/**
+ * Histogram of durations with fixed buckets.
+ */
+public class Histogram {
+    // Upper bounds of buckets in milliseconds, the last bucket is unbounded.
+    private const double[] BUCKETS = {
+        0.1, 0.2, 0.5, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 8.0, 10.0, 12.0, 16.0, 20.0, 25.0, 33.0, 50.0, 75.0, 100.0,
+        150.0, 250.0, 500.0, 1000.0
+    };
+    private uint[] counts;
+    public uint count = 0;
+    public double total = 0.0;
+    public double max = 0.0;
+
+    public Histogram() {
+        counts = new uint[BUCKETS.length + 1];
+    }
+
+    /**
+     * Record a duration.
+     *
+     * @param ms Duration in milliseconds.
+     */
+    public void add(double ms) {
+        int index = 0;
+        while (index < BUCKETS.length && ms > BUCKETS[index]) {
+            index++;
+        }
+        counts[index]++;
+        count++;
+        total += ms;
+        if (ms > max) {
+            max = ms;
+        }
+    }
+
+    public void reset() {
+        counts = new uint[BUCKETS.length + 1];
+        count = 0;
+        total = max = 0.0;
+    }
+
+    public double mean() {
+        return count > 0 ? total / count : 0.0;
+    }
+
+    /**
+     * Estimate a percentile.
+     *
+     * @param percent The percentile, e.g. 95.
+     * @return The upper bound of the bucket with the percentile, but at most the maximal duration.
+     */
+    public double percentile(double percent) {
+        if (count == 0) {
+            return 0.0;
+        }
+
+        double rank = percent / 100.0 * count;
+        uint seen = 0;
+        for (int index = 0; index < counts.length; index++) {
+            seen += counts[index];
+            if (seen >= rank && counts[index] > 0) {
+                return index < BUCKETS.length ? double.min(BUCKETS[index], max) : max;
+            }
+        }
+        return max;
+    }
+
+    public StatsSummary summary() {
+        return {count, mean(), percentile(50), percentile(95), max};
+    }
+}
+
+/**
+ * Histograms of durations of frame stages.
+ *
+ * Stages measured by the client are kept as summaries it has reported.
+ */
+public class FrameStats {
+    public const int N_STAGES = DodoProto.StatsStage.DRAW + 1;
+    private Histogram[] histograms;
+    private StatsSummary[] remote;
+
+    public FrameStats() {
+        histograms = new Histogram[N_STAGES];
+        for (int i = 0; i < N_STAGES; i++) {
+            histograms[i] = new Histogram();
+        }
+        remote = new StatsSummary[N_STAGES];
+    }
+
+    /**
+     * Record the duration of a stage.
+     *
+     * @param stage The stage.
+     * @param start The start of the stage as returned by {@link GLib.get_monotonic_time}.
+     */
+    public void add_since(DodoProto.StatsStage stage, int64 start) {
+        histograms[stage].add((GLib.get_monotonic_time() - start) / 1000.0);
+    }
+
+    public unowned Histogram get_histogram(DodoProto.StatsStage stage) {
+        return histograms[stage];
+    }
+
+    public void set_remote(DodoProto.StatsStage stage, StatsSummary summary) {
+        remote[stage] = summary;
+    }
+
+    /**
+     * Get the summary of a stage.
+     *
+     * Local measurements take precedence over the summaries reported by the client.
+     *
+     * @return false if the stage has not been measured.
+     */
+    public bool get_summary(DodoProto.StatsStage stage, out StatsSummary summary) {
+        if (histograms[stage].count > 0) {
+            summary = histograms[stage].summary();
+            return true;
+        }
+        summary = remote[stage];
+        return summary.count > 0;
+    }
+
+    public void reset() {
+        for (int i = 0; i < N_STAGES; i++) {
+            histograms[i].reset();
+        }
+        remote = new StatsSummary[N_STAGES];
+    }
+}
+
+} // namespace Dodo
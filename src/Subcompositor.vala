@@ -0,0 +1,52 @@
+namespace Dodo {
+
+/**
+ * The wl_subcompositor global, which gives surfaces the subsurface role.
+ */
+public class Subcompositor : GLib.Object {
+    private const int SUBCOMPOSITOR_VERSION = 1;
+    private static Wl.SubcompositorInterface impl = {
+        Subcompositor.destroy,
+        Subcompositor.get_subsurface
+    };
+    public Wl.Global glob;
+
+    public Subcompositor(Display display) {
+        glob = new Wl.Global(
+            display.wl_display, ref Wl.subcompositor_interface, SUBCOMPOSITOR_VERSION, this, Subcompositor.bind
+        );
+    }
+
+    private static void bind(Wl.Client client, void *data, uint version, uint id) {
+        debug("%s: Bind subcompositor version=%u, id=%u.", Utils.client_info(client), version, id);
+        unowned Wl.Subcompositor wl_subcompositor = Wl.Subcompositor.create(
+            client, ref Wl.subcompositor_interface, (int) version, id
+        );
+        wl_subcompositor.set_implementation(&Subcompositor.impl, data, null);
+    }
+
+    private static void destroy(Wl.Client client, Wl.Resource resource) {
+        resource.destroy();
+    }
+
+    private static void get_subsurface(
+        Wl.Client client, Wl.Resource resource, uint id, Wl.Surface wl_surface, Wl.Surface wl_parent
+    ) {
+        unowned Surface surface = Surface.from_resource(wl_surface);
+        unowned Surface parent = Surface.from_resource(wl_parent);
+        debug("%s: Get subsurface id=%u, surface=%u, parent=%u.", Utils.client_info(client), id, surface.id, parent.id);
+        if (surface.subsurface != null) {
+            resource.post_error(Wl.SubcompositorError.BAD_SURFACE, "The surface is already a subsurface.");
+            return;
+        }
+        for (unowned Surface? ancestor = parent; ancestor != null; ancestor = ancestor.get_parent()) {
+            if (ancestor == surface) {
+                resource.post_error(Wl.SubcompositorError.BAD_SURFACE, "The surface is an ancestor of the parent.");
+                return;
+            }
+        }
+        new Subsurface(client, resource.get_version(), id, surface, parent);
+    }
+}
+
+} // namespace Dodo
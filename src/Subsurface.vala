@@ -0,0 +1,134 @@
+namespace Dodo {
+
+/**
+ * A wl_subsurface resource: the role of a surface drawn at a position relative to its parent surface.
+ *
+ * The position and the stacking order take effect with the next commit of the parent. In the synchronized mode
+ * (default), commits of the surface are cached and applied with the next commit of the parent as well.
+ * In the desynchronized mode, e.g. for a video layer, the surface is updated on its own commits.
+ */
+public class Subsurface : GLib.Object {
+    private static Wl.SubsurfaceInterface impl = {
+        Subsurface.destroy,
+        Subsurface.set_position,
+        Subsurface.place_above,
+        Subsurface.place_below,
+        Subsurface.set_sync,
+        Subsurface.set_desync
+    };
+    /** The surface with this role, null when it has been destroyed. */
+    public unowned Surface? surface;
+    /** The parent surface, null when it has been destroyed. */
+    public unowned Surface? parent;
+    /** The x position of the surface in the parent surface coordinates. */
+    public int x = 0;
+    /** The y position of the surface in the parent surface coordinates. */
+    public int y = 0;
+    public bool sync = true;
+    private int pending_x = 0;
+    private int pending_y = 0;
+
+    public Subsurface(Wl.Client client, int version, uint id, Surface surface, Surface parent) {
+        this.surface = surface;
+        this.parent = parent;
+        unowned Wl.Subsurface wl_subsurface = Wl.Subsurface.create(client, ref Wl.subsurface_interface, version, id);
+        wl_subsurface.set_implementation(&Subsurface.impl, this, Subsurface.on_wl_subsurface_destroyed);
+        ref(); // Do not destroy until wl_subsurface is destroyed
+        surface.subsurface = this;
+        parent.add_child(surface);
+    }
+
+    public static unowned Subsurface from_resource(Wl.Resource resource) {
+        return (Subsurface) resource.get_user_data();
+    }
+
+    /**
+     * Apply the pending position, called when the parent is committed.
+     *
+     * @return Whether the position has changed.
+     */
+    public bool apply_position() {
+        if (x == pending_x && y == pending_y) {
+            return false;
+        }
+        x = pending_x;
+        y = pending_y;
+        return true;
+    }
+
+    /**
+     * Whether commits of the surface are applied with its parent, either in the synchronized mode or
+     * because an ancestor is synchronized.
+     */
+    public bool is_synchronized() {
+        if (sync) {
+            return true;
+        }
+        return parent != null && parent.subsurface != null && parent.subsurface.is_synchronized();
+    }
+
+    /**
+     * Remove the surface from its parent, e.g. when the role or one of the surfaces is destroyed.
+     */
+    public void unlink() {
+        if (surface != null) {
+            surface.subsurface = null;
+        }
+        if (parent != null && surface != null) {
+            parent.remove_child(surface);
+        }
+        surface = null;
+        parent = null;
+    }
+
+    private static void on_wl_subsurface_destroyed(Wl.Resource? resource) {
+        unowned Subsurface self = from_resource(resource);
+        self.unlink();
+        self.unref();
+    }
+
+    private static void destroy(Wl.Client client, Wl.Subsurface wl_subsurface) {
+        wl_subsurface.destroy();
+    }
+
+    private static void set_position(Wl.Client client, Wl.Subsurface wl_subsurface, int x, int y) {
+        unowned Subsurface self = from_resource(wl_subsurface);
+        self.pending_x = x;
+        self.pending_y = y;
+    }
+
+    private static void place_above(Wl.Client client, Wl.Subsurface wl_subsurface, Wl.Surface sibling) {
+        place(wl_subsurface, sibling, true);
+    }
+
+    private static void place_below(Wl.Client client, Wl.Subsurface wl_subsurface, Wl.Surface sibling) {
+        place(wl_subsurface, sibling, false);
+    }
+
+    private static void place(Wl.Subsurface wl_subsurface, Wl.Surface sibling, bool above) {
+        unowned Subsurface self = from_resource(wl_subsurface);
+        if (self.surface == null || self.parent == null) {
+            return;
+        }
+        if (!self.parent.place_child(self.surface, Surface.from_resource(sibling), above)) {
+            wl_subsurface.post_error(
+                Wl.SubsurfaceError.BAD_SURFACE, "The reference surface is neither a sibling nor the parent."
+            );
+        }
+    }
+
+    private static void set_sync(Wl.Client client, Wl.Subsurface wl_subsurface) {
+        from_resource(wl_subsurface).sync = true;
+    }
+
+    private static void set_desync(Wl.Client client, Wl.Subsurface wl_subsurface) {
+        unowned Subsurface self = from_resource(wl_subsurface);
+        self.sync = false;
+        if (self.surface != null && !self.is_synchronized()) {
+            // The cached state is applied right away.
+            self.surface.apply_cached_state();
+        }
+    }
+}
+
+} // namespace Dodo
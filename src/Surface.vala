@@ -25,32 +25,65 @@ public class Surface : GLib.Object {
     /** The y position of a buffer top left corner in surface coordinates. */
     private int y;
     public Buffer? buffer;
+    public FrameStats? stats = null;
     private unowned Gdk.GLContext? gl_context = null;
-    private unowned Wl.Client client;
+    public unowned Wl.Client client;
     private unowned Display display;
-    private HashTable<unowned Wl.Buffer, unowned Buffer> buffers;
+    /** The subsurface role, null for a surface without a parent. */
+    public unowned Subsurface? subsurface = null;
+    /** Commits of a synchronized subsurface waiting for the parent, null if there are none. */
+    private SurfaceState? cached = null;
+    /** Committed stacking order of the surface and its subsurfaces, bottom first. */
+    public List<unowned Surface> stack = new List<unowned Surface>();
+    private List<unowned Surface> pending_stack = new List<unowned Surface>();
+    private bool stack_changed = false;
 
     public Surface(Display display, Wl.Client client, int version, uint id) {
         this.id = id;
         this.display = display;
         this.client = client;
-        buffers = new HashTable<unowned Wl.Buffer, unowned Buffer>(direct_hash, direct_equal);
         debug("%s: New surface version=%d, id=%u.", Utils.client_info(client), version, id);
         assert(1 <= version <= SURFACE_VERSION);
         unowned Wl.Surface wl_surface = Wl.Surface.create(client, ref Wl.surface_interface, version, id);
         wl_surface.set_implementation(&Surface.impl, this, Surface.on_wl_surface_destroyed);
         ref(); // Do not destroy until wl_surface is destroyed
+        stack.append(this);
+        pending_stack.append(this);
     }
 
     public signal void state_committed();
     public signal void destroyed();
+    /**
+     * A subsurface has been updated or the layout of subsurfaces has changed.
+     *
+     * @param damage The damage in buffer coordinates of this surface, or null if the whole surface
+     *     has to be redrawn.
+     */
+    public signal void subsurfaces_changed(Region? damage);
 
     private static void on_wl_surface_destroyed(Wl.Resource? resource) {
         unowned Surface self = (Surface) resource.get_user_data();
+        if (self.subsurface != null) {
+            self.subsurface.unlink();
+        }
+        foreach (unowned Surface child in self.stack.copy()) {
+            if (child != self && child.subsurface != null) {
+                child.subsurface.parent = null;
+            }
+        }
+        foreach (unowned Surface child in self.pending_stack.copy()) {
+            if (child != self && child.subsurface != null) {
+                child.subsurface.parent = null;
+            }
+        }
+        SurfaceState? cached = (owned) self.cached;
+        cached = null;
         self.pending.reset_buffer();
         self.committed.reset_buffer();
-        self.buffer.drop();
-        self.buffer = null;
+        if (self.buffer != null) {
+            self.buffer.drop();
+            self.buffer = null;
+        }
         self.destroyed();
         self.unref();
     }
@@ -73,9 +106,9 @@ public class Surface : GLib.Object {
             return;
         }
 
-        // TODO: Proper manipulation with pixman
-        Rect* damage = &self.pending.damage;
-        damage.expand(x, y, width, height);
+        // Surface coordinates to buffer coordinates
+        int scale = self.committed.scale;
+        self.pending.damage.add(x * scale, y * scale, width * scale, height * scale);
         self.pending.update |= Update.DAMAGE;
     }
 
@@ -87,7 +120,25 @@ public class Surface : GLib.Object {
         self.pending.update |= Update.FRAME;
     }
 
-    private static void set_opaque_region(Wl.Client client, Wl.Surface wl_surface, Wl.Resource region){
+    private static void set_opaque_region(Wl.Client client, Wl.Surface wl_surface, Wl.Resource? region){
+        unowned Surface self = Surface.from_resource(wl_surface);
+        // The region is copied, the client may destroy it right away.
+        self.pending.opaque = region != null ? RegionResource.from_resource(region).rects : new Rect[0];
+        self.pending.update |= Update.OPAQUE;
+    }
+
+    /**
+     * Move content within the buffer with the next commit, before damage is uploaded.
+     *
+     * @param rect The destination in buffer coordinates.
+     * @param dx The horizontal offset from the source to the destination.
+     * @param dy The vertical offset from the source to the destination.
+     */
+    public void set_pending_scroll(Rect rect, int dx, int dy) {
+        pending.scroll_rect = rect;
+        pending.scroll_dx = dx;
+        pending.scroll_dy = dy;
+        pending.update |= Update.SCROLL;
     }
 
     private static void set_input_region(Wl.Client client, Wl.Surface wl_surface, Wl.Resource region){
@@ -95,11 +146,143 @@ public class Surface : GLib.Object {
 
     private static void commit(Wl.Client client, Wl.Surface wl_surface) {
         unowned Surface self = Surface.from_resource(wl_surface);
-        self.pending.commit(self.committed);
-        self.x += self.committed.dx;
-        self.y += self.committed.dy;
-        self.update_buffer();
-        self.state_committed();
+        if (self.subsurface != null && self.subsurface.is_synchronized()) {
+            // Applied with the next commit of the parent.
+            if (self.cached == null) {
+                self.cached = new SurfaceState();
+                self.cached.scale = self.committed.scale;
+            }
+            self.pending.commit(self.cached, true);
+        } else if (self.cached != null) {
+            self.pending.commit(self.cached, true);
+            self.apply_cached_state();
+        } else {
+            self.apply_state(self.pending);
+        }
+    }
+
+    /**
+     * Apply cached commits of a subsurface, when its parent is committed or it is switched to the desynchronized
+     * mode.
+     */
+    public void apply_cached_state() {
+        if (cached != null) {
+            SurfaceState state = (owned) cached;
+            apply_state(state);
+        }
+    }
+
+    private void apply_state(SurfaceState state) {
+        bool was_mapped = buffer != null;
+        int old_width = get_width();
+        int old_height = get_height();
+        state.commit(committed);
+        x += committed.dx;
+        y += committed.dy;
+        update_buffer();
+
+        bool relayout = false;
+        if (stack_changed) {
+            stack = pending_stack.copy();
+            stack_changed = false;
+            relayout = true;
+        }
+        foreach (unowned Surface child in stack) {
+            if (child != this) {
+                relayout = child.subsurface.apply_position() || relayout;
+                child.apply_cached_state();
+            }
+        }
+
+        state_committed();
+        if (relayout) {
+            subsurfaces_changed(null);
+        }
+
+        if (subsurface != null) {
+            if (was_mapped != (buffer != null) || old_width != get_width() || old_height != get_height()) {
+                propagate_damage(null);
+            } else if (get_committed_damage() != null) {
+                propagate_damage(get_committed_damage());
+            } else if (relayout) {
+                propagate_damage(null);
+            }
+        }
+    }
+
+    /**
+     * Tell ancestors about a change of this surface.
+     *
+     * @param damage The damage in buffer coordinates of this surface, null to redraw the whole surface.
+     */
+    private void propagate_damage(Region? damage) {
+        unowned Surface? parent = get_parent();
+        if (parent == null) {
+            return;
+        }
+
+        Region? parent_damage = null;
+        if (damage != null && buffer != null && parent.buffer != null) {
+            // Buffer rows are bottom-up, the position of a subsurface is top-down.
+            int scale = committed.scale;
+            int parent_scale = parent.committed.scale;
+            int left = subsurface.x * scale;
+            int bottom = (parent.get_height() - subsurface.y - get_height()) * scale;
+            parent_damage = new Region();
+            foreach (var rect in damage.rects) {
+                int x1 = (left + rect.x) * parent_scale / scale;
+                int y1 = (bottom + rect.y) * parent_scale / scale;
+                int x2 = ((left + rect.x + rect.w) * parent_scale + scale - 1) / scale;
+                int y2 = ((bottom + rect.y + rect.h) * parent_scale + scale - 1) / scale;
+                parent_damage.add(x1, y1, x2 - x1, y2 - y1);
+            }
+            parent_damage.intersect(0, 0, parent.buffer.width, parent.buffer.height);
+        }
+        parent.subsurfaces_changed(parent_damage);
+        parent.propagate_damage(parent_damage);
+    }
+
+    public unowned Surface? get_parent() {
+        return subsurface != null ? subsurface.parent : null;
+    }
+
+    /**
+     * Add a subsurface on the top of the stack.
+     */
+    public void add_child(Surface child) {
+        pending_stack.append(child);
+        stack_changed = true;
+        if (gl_context != null) {
+            child.set_gl_context(gl_context);
+        }
+    }
+
+    /**
+     * Remove a subsurface right away, without waiting for a commit.
+     */
+    public void remove_child(Surface child) {
+        pending_stack.remove(child);
+        if (stack.index(child) >= 0) {
+            stack.remove(child);
+            subsurfaces_changed(null);
+            propagate_damage(null);
+        }
+    }
+
+    /**
+     * Move a subsurface above or below a sibling or this surface with the next commit.
+     *
+     * @return false if the sibling is neither a subsurface nor this surface.
+     */
+    public bool place_child(Surface child, Surface sibling, bool above) {
+        if (child == sibling || pending_stack.index(sibling) < 0) {
+            return false;
+        }
+        pending_stack.remove(child);
+        int position = pending_stack.index(sibling);
+        pending_stack.insert(child, above ? position + 1 : position);
+        stack_changed = true;
+        return true;
     }
 
     private static void set_buffer_transform(Wl.Client client, Wl.Surface wl_surface, int transform) {
@@ -117,10 +300,16 @@ public class Surface : GLib.Object {
     }
 
     private static void damage_buffer(Wl.Client client, Wl.Surface wl_surface, int x, int y, int width, int height) {
-        Surface.damage(client, wl_surface, x, y, width, height);
+        unowned Surface self = Surface.from_resource(wl_surface);
+        if (width < 0 || height < 0) {
+            return;
+        }
+
+        self.pending.damage.add(x, y, width, height);
+        self.pending.update |= Update.DAMAGE;
     }
 
-    private static unowned Surface from_resource(Wl.Resource resource) {
+    public static unowned Surface from_resource(Wl.Resource resource) {
         return (Surface) resource.get_user_data();
     }
 
@@ -129,9 +318,13 @@ public class Surface : GLib.Object {
             return;
         }
 
-        this.buffer = null;
         unowned Wl.Buffer? wl_buffer = committed.buffer;
         if (wl_buffer == null) {
+            // Null buffer unmaps the surface.
+            if (buffer != null) {
+                buffer.drop();
+                buffer = null;
+            }
             return;
         }
 
@@ -141,36 +334,100 @@ public class Surface : GLib.Object {
             return;
         }
 
-        bool released;
-        GLuint texture;
-        int width;
-        int height;
-        gl_context.make_current();
-        if (!Buffer.import(wl_buffer, out texture, out released, out width, out height)) {
-            critical("Failed to upload buffer");
-            if (!released) {
-                wl_buffer.send_release();
-            }
-            display.dispatch();
-            return;
-        }
-        Buffer? buffer = buffers[wl_buffer];
         if (buffer == null) {
-            buffer = new Buffer(display, wl_buffer, gl_context, texture, released, width, height);
-            buffers[wl_buffer] = buffer;
-            buffer.destroyed.connect(on_buffer_destroyed);
-        } else {
-            buffer.update(texture, released, width, height);
+            buffer = new Buffer(gl_context);
+        }
+        int64 start = GLib.get_monotonic_time();
+        Rect scrolled = Rect(0, 0, 0, 0);
+        if ((committed.update & Update.SCROLL) != 0) {
+            scrolled = buffer.scroll(committed.scroll_rect, committed.scroll_dx, committed.scroll_dy);
+        }
+        if (!buffer.import(wl_buffer, committed.damage)) {
+            critical("Failed to upload buffer");
+        } else if (stats != null) {
+            stats.add_since(DodoProto.StatsStage.UPLOAD, start);
         }
-        display.dispatch();
-        this.buffer = buffer;
+        // The moved content has to be redrawn, although it hasn't been uploaded.
+        committed.damage.add(scrolled.x, scrolled.y, scrolled.w, scrolled.h);
     }
 
     public void set_gl_context(Gdk.GLContext? gl_context) {
         if (this.gl_context != null && buffer != null) {
-            buffer.destroy_texture();
+            // The texture belongs to the old context. The next commit uploads the whole buffer.
+            buffer.drop();
+            buffer = null;
         }
         this.gl_context = gl_context;
+        foreach (unowned Surface child in pending_stack) {
+            if (child != this) {
+                child.set_gl_context(gl_context);
+            }
+        }
+    }
+
+    /**
+     * The scale of the committed buffer.
+     */
+    public int get_scale() {
+        return committed.scale;
+    }
+
+    /**
+     * The width of the surface in surface coordinates, zero without a buffer.
+     */
+    public int get_width() {
+        return buffer != null ? buffer.width / committed.scale : 0;
+    }
+
+    /**
+     * The height of the surface in surface coordinates, zero without a buffer.
+     */
+    public int get_height() {
+        return buffer != null ? buffer.height / committed.scale : 0;
+    }
+
+    /**
+     * Whether the last commit has attached a buffer or damaged the surface, unlike e.g. a commit which only applies
+     * positions of subsurfaces.
+     */
+    public bool has_new_content() {
+        return (committed.update & (Update.BUFFER | Update.DAMAGE)) != 0;
+    }
+
+    /**
+     * Return the damage of the last commit in buffer coordinates, or null if it didn't attach a new buffer.
+     */
+    public unowned Region? get_committed_damage() {
+        return (committed.update & Update.BUFFER) != 0 && buffer != null ? committed.damage : null;
+    }
+
+    /**
+     * Whether the client has declared the whole surface opaque.
+     */
+    public bool is_opaque() {
+        if (buffer == null) {
+            return false;
+        }
+        int width = buffer.width / committed.scale;
+        int height = buffer.height / committed.scale;
+        foreach (var rect in committed.opaque) {
+            if (rect.x <= 0 && rect.y <= 0 && rect.x + rect.w >= width && rect.y + rect.h >= height) {
+                return true;
+            }
+        }
+        return false;
+    }
+
+    public bool has_frame_callbacks() {
+        if (committed.frames != null) {
+            return true;
+        }
+        foreach (unowned Surface child in stack) {
+            if (child != this && child.has_frame_callbacks()) {
+                return true;
+            }
+        }
+        return false;
     }
 
     public void queue_render_frame() {
@@ -181,7 +438,11 @@ public class Surface : GLib.Object {
             resource.send_done(time_msec);
             resource.destroy();
         }
-        display.dispatch();
+        foreach (unowned Surface child in stack) {
+            if (child != this) {
+                child.queue_render_frame();
+            }
+        }
     }
 
     private static void on_frame_callback_destroyed(Wl.Resource? resource) {
@@ -189,11 +450,9 @@ public class Surface : GLib.Object {
         unowned Wl.Callback callback_resource = (Wl.Callback) resource;
         self.pending.steal_frame_callback(callback_resource);
         self.committed.steal_frame_callback(callback_resource);
-    }
-
-    private void on_buffer_destroyed(Buffer buffer, Wl.Buffer wl_buffer) {
-        buffer.destroyed.disconnect(on_buffer_destroyed);
-        buffers.remove(wl_buffer);       
+        if (self.cached != null) {
+            self.cached.steal_frame_callback(callback_resource);
+        }
     }
 }
 
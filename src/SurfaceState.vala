@@ -1,19 +1,26 @@
 namespace Dodo {
 
 public class SurfaceState {
-    public Rect damage;
+    /** Damage in buffer coordinates. */
+    public Region damage;
     public Update update;
     /** The x position of a buffer top left corner in surface coordinates relative to the current coordinates. */
     public int dx;
     /** The y position of a buffer top left corner in surface coordinates relative to the current coordinates. */
     public int dy;
     public int scale;
+    /** Opaque rectangles in surface coordinates. */
+    public Rect[] opaque = {};
+    /** The destination of content moved within the buffer, in buffer coordinates. */
+    public Rect scroll_rect = Rect(0, 0, 0, 0);
+    public int scroll_dx = 0;
+    public int scroll_dy = 0;
     public unowned Wl.Buffer? buffer;
     public SList<unowned Wl.Callback?> frames;
     private Listener buffer_destroyed_listener;
 
     public SurfaceState() {
-        damage.reset();
+        damage = new Region();
         dx = dy = 0;
         buffer = null;
         scale = 1;
@@ -42,30 +49,68 @@ public class SurfaceState {
         }
     }
 
-    public void commit(SurfaceState target) {
+    /**
+     * Move the state to the target state.
+     *
+     * @param target The state to update.
+     * @param accumulate Whether to add damage, offsets and frame callbacks to those of the target, e.g. to cache
+     *     commits of a synchronized subsurface until its parent is committed.
+     */
+    public void commit(SurfaceState target, bool accumulate = false) {
         if ((this.update & Update.BUFFER) != 0) {
             target.set_buffer(this.buffer);
             this.reset_buffer();
-            target.dx = this.dx;
-            target.dy = this.dy;
+            if (accumulate) {
+                target.dx += this.dx;
+                target.dy += this.dy;
+            } else {
+                target.dx = this.dx;
+                target.dy = this.dy;
+            }
             this.dx = this.dy = 0;
         }
 
-        if ((this.update & Update.DAMAGE) != 0) {
-            target.damage = this.damage;
-            this.damage.reset();
+        if (accumulate) {
+            target.damage.add_region(this.damage);
+            this.damage.clear();
+        } else if ((this.update & Update.DAMAGE) != 0) {
+            Region committed_damage = this.damage;
+            this.damage = target.damage;
+            this.damage.clear();
+            target.damage = committed_damage;
+        } else {
+            target.damage.clear();
         }
 
         if ((this.update & Update.SCALE) != 0) {
             target.scale = scale;
         }
 
+        if ((this.update & Update.OPAQUE) != 0) {
+            target.opaque = this.opaque;
+        }
+
+        if ((this.update & Update.SCROLL) != 0) {
+            target.scroll_rect = this.scroll_rect;
+            target.scroll_dx = this.scroll_dx;
+            target.scroll_dy = this.scroll_dy;
+        }
+
         if ((this.update & Update.FRAME) != 0) {
-            target.destroy_frame_callbacks();
+            if (accumulate) {
+                // Newest first, like pending callbacks.
+                this.frames.concat((owned) target.frames);
+            } else {
+                target.destroy_frame_callbacks();
+            }
             target.frames = (owned) this.frames;
         }
 
-        target.update = this.update;
+        if (accumulate) {
+            target.update |= this.update;
+        } else {
+            target.update = this.update;
+        }
         this.update = Update.NONE;
     }
 
@@ -105,27 +150,36 @@ public struct Rect {
         x = y = w = h = -1;
     }
 
+    public bool is_empty() {
+        return w <= 0 || h <= 0;
+    }
+
+    /** Whether the rectangles overlap or share an edge. */
+    public bool touches(Rect other) {
+        return !is_empty() && !other.is_empty()
+            && x <= other.x + other.w && other.x <= x + w
+            && y <= other.y + other.h && other.y <= y + h;
+    }
+
+    /** Expand the rectangle to the union with another one. */
     public void expand(int x, int y, int w, int h) {
-        if (this.x < 0) {
-            this.x = x;
-        } else {
-            this.x = int.min(this.x, x);
+        if (w <= 0 || h <= 0) {
+            return;
         }
-        if (this.y < 0) {
+        if (is_empty()) {
+            this.x = x;
             this.y = y;
-        } else {
-            this.y = int.min(this.y, y);
-        }
-        if (this.w < 0) {
             this.w = w;
-        } else {
-            this.w = int.max(this.w, w);
-        }
-        if (this.h < 0) {
             this.h = h;
-        } else {
-            this.h = int.max(this.h, h);
+            return;
         }
+
+        int x2 = int.max(this.x + this.w, x + w);
+        int y2 = int.max(this.y + this.h, y + h);
+        this.x = int.min(this.x, x);
+        this.y = int.min(this.y, y);
+        this.w = x2 - this.x;
+        this.h = y2 - this.y;
     }
 }
 
@@ -136,7 +190,9 @@ public enum Update {
     DAMAGE,
     BUFFER,
     SCALE,
-    FRAME;
+    FRAME,
+    OPAQUE,
+    SCROLL;
 }
 
 } // namespace Dodo
@@ -2,8 +2,55 @@ using GL;
 
 namespace Dodo.Textures {
 
-public GLuint load_from_pixels(void* data, uint fmt, int width, int height, int stride) {
-    // FIXME: fmt & stride
+/**
+ * Get OpenGL pixel format of a wl_shm format.
+ *
+ * @return false if the format is not supported.
+ */
+public bool get_gl_format(uint fmt, out GLenum internal_format, out GLenum format, out GLenum type, out int bytes_per_pixel) {
+    switch ((Wl.ShmFormat) fmt) {
+    case Wl.ShmFormat.ARGB8888:
+    case Wl.ShmFormat.XRGB8888:
+        internal_format = GL_RGBA;
+        format = GL_BGRA;
+        type = GL_UNSIGNED_BYTE;
+        bytes_per_pixel = 4;
+        return true;
+    case Wl.ShmFormat.RGB565:
+        internal_format = GL_RGB;
+        format = GL_RGB;
+        type = GL_UNSIGNED_SHORT_5_6_5;
+        bytes_per_pixel = 2;
+        return true;
+    default:
+        internal_format = format = type = 0;
+        bytes_per_pixel = 0;
+        return false;
+    }
+}
+
+/**
+ * Whether a wl_shm format has no alpha channel, so that textures of it don't need blending.
+ */
+public bool is_opaque(uint fmt) {
+    return fmt == Wl.ShmFormat.XRGB8888 || fmt == Wl.ShmFormat.RGB565;
+}
+
+/**
+ * Create a texture with uninitialized storage.
+ *
+ * @return The texture or 0 if the format is not supported.
+ */
+public GLuint create(uint fmt, int width, int height) {
+    GLenum internal_format;
+    GLenum format;
+    GLenum type;
+    int bytes_per_pixel;
+    if (!get_gl_format(fmt, out internal_format, out format, out type, out bytes_per_pixel)) {
+        warning("Unsupported shm format: %u.", fmt);
+        return 0;
+    }
+
     GLuint gl_textures[1];
     glGenTextures(1, gl_textures);
     GLuint texture = gl_textures[0];
@@ -12,7 +59,55 @@ public GLuint load_from_pixels(void* data, uint fmt, int width, int height, int
     glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_R, GL_REPEAT);
     glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR);
     glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR);
-    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, width, height, 0, GL_BGRA, GL_UNSIGNED_BYTE, data);
+    if (fmt == Wl.ShmFormat.XRGB8888) {
+        // The X byte is undefined, it must not be sampled as alpha.
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_SWIZZLE_A, GL_ONE);
+    }
+    glTexImage2D(GL_TEXTURE_2D, 0, (GLint) internal_format, width, height, 0, format, type, null);
+    return texture;
+}
+
+/**
+ * Upload pixels to a texture created by {@link create}.
+ *
+ * @param damage Regions to upload, or null to upload all pixels.
+ * @return false if the format is not supported.
+ */
+public bool upload(GLuint texture, void* data, uint fmt, int width, int height, int stride, Region? damage) {
+    GLenum internal_format;
+    GLenum format;
+    GLenum type;
+    int bytes_per_pixel;
+    if (!get_gl_format(fmt, out internal_format, out format, out type, out bytes_per_pixel)) {
+        warning("Unsupported shm format: %u.", fmt);
+        return false;
+    }
+
+    glActiveTexture(GL_TEXTURE1);
+    glBindTexture(GL_TEXTURE_2D, texture);
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 1);
+    glPixelStorei(GL_UNPACK_ROW_LENGTH, stride / bytes_per_pixel);
+    if (damage == null) {
+        glTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, width, height, format, type, data);
+    } else {
+        foreach (var rect in damage.rects) {
+            glPixelStorei(GL_UNPACK_SKIP_PIXELS, rect.x);
+            glPixelStorei(GL_UNPACK_SKIP_ROWS, rect.y);
+            glTexSubImage2D(GL_TEXTURE_2D, 0, rect.x, rect.y, rect.w, rect.h, format, type, data);
+        }
+        glPixelStorei(GL_UNPACK_SKIP_PIXELS, 0);
+        glPixelStorei(GL_UNPACK_SKIP_ROWS, 0);
+    }
+    glPixelStorei(GL_UNPACK_ROW_LENGTH, 0);
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 4);
+    return true;
+}
+
+public GLuint load_from_pixels(void* data, uint fmt, int width, int height, int stride) {
+    GLuint texture = create(fmt, width, height);
+    if (texture != 0) {
+        upload(texture, data, fmt, width, height, stride, null);
+    }
     return texture;
 }
 
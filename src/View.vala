@@ -119,7 +119,7 @@ public class View : Gtk.EventBox {
     }
 
     private bool on_motion_notify_event(Gdk.EventMotion event) {
-        canvas.send_mouse_event(DodoProto.EventType.MOUSE_MOVE, (DodoProto.MouseButton) 0, Keyboard.serialize_modifiers(event.state), event.x, event.y, event.x, event.y, event.x_root, event.y_root);
+        canvas.queue_mouse_motion(Keyboard.serialize_modifiers(event.state), event.x, event.y, event.x, event.y, event.x_root, event.y_root);
         return false;
     }
 
@@ -0,0 +1,37 @@
+import ctypes
+import zlib
+
+from dodo.damage import DamageTracker, Rect
+
+WIDTH = 1920
+STRIDE = WIDTH * 4
+
+
+def create_frame(height: int = 1) -> ctypes.Array:
+    return (ctypes.c_ubyte * (STRIDE * height))(*(bytes(range(256)) * (STRIDE * height // 256)))
+
+
+def test_paired_changes_in_a_row_are_damaged():
+    # Changes of two byte pairs in opposite directions that leave adler32 of the row unchanged.
+    frame = create_frame()
+    before = bytes(frame)
+    frame[100] += 1
+    frame[101] -= 1
+    frame[4000] -= 1
+    frame[4001] += 1
+    assert zlib.adler32(before) == zlib.adler32(bytes(frame))
+
+    tracker = DamageTracker(tile_size=64)
+    address = ctypes.addressof(frame)
+    frame[:] = before
+    assert tracker.update(address, WIDTH, 1, STRIDE) == [Rect(0, 0, WIDTH, 1)]
+    assert tracker.update(address, WIDTH, 1, STRIDE) == []
+
+    frame[100] += 1
+    frame[101] -= 1
+    frame[4000] -= 1
+    frame[4001] += 1
+    damage = tracker.update(address, WIDTH, 1, STRIDE)
+    # Bytes 100 and 4000 are pixels 25 and 1000.
+    assert any(rect.x <= 25 < rect.x + rect.width for rect in damage)
+    assert any(rect.x <= 1000 < rect.x + rect.width for rect in damage)